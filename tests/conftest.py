@@ -196,6 +196,7 @@ Band 2:
     # Patch in interface module
     monkeypatch.setattr(interface, "validate_interface", mock_validate_interface)
     monkeypatch.setattr(interface, "validate_interface_ap_mode", mock_validate_interface_ap_mode)
+    monkeypatch.setattr(interface, "execute_iw", mock_execute_iw)
     
     # Patch in manager module (where they're imported)
     monkeypatch.setattr(manager, "validate_interface_exists", lambda iface: None)
@@ -74,11 +74,11 @@ class TestStatusEndpoint:
         
         # Mock manager with no active networks
         def mock_manager(*args, **kwargs):
-            mgr = get_manager()
+            mgr = get_manager(*args, **kwargs)
             mgr.active = {}  # No active networks = standby
             return mgr
         
-        monkeypatch.setattr('wilab.api.routes.status.get_manager', mock_manager)
+        monkeypatch.setattr('wilab.api.dependencies.get_manager', mock_manager)
         
         resp = client.get('/api/v1/status', headers={'Authorization': valid_token})
         data = resp.json()
@@ -275,6 +275,47 @@ class TestAppMetadata:
         assert app.title == "Wi-Lab"
 
 
+class TestFrontendCaching:
+    """Tests for static frontend cache headers."""
+
+    @pytest.fixture
+    def frontend_client(self, tmp_path, monkeypatch):
+        import wilab.api as api_module
+        (tmp_path / "index.html").write_text("<html></html>")
+        (tmp_path / "main-2KJ7QWXE.js").write_text("console.log('x');")
+        (tmp_path / "favicon.ico").write_bytes(b"\x00")
+        monkeypatch.setattr(api_module, "_candidate_frontend_paths", lambda: [tmp_path])
+        load_config()
+        return TestClient(create_app())
+
+    def test_hashed_asset_is_immutable(self, frontend_client):
+        resp = frontend_client.get('/main-2KJ7QWXE.js')
+        assert resp.status_code == 200
+        assert resp.headers['cache-control'] == "public, max-age=31536000, immutable"
+
+    def test_index_is_not_cached(self, frontend_client):
+        resp = frontend_client.get('/')
+        assert resp.status_code == 200
+        assert resp.headers['cache-control'] == "no-cache"
+
+    def test_unhashed_asset_is_revalidated(self, frontend_client):
+        resp = frontend_client.get('/favicon.ico')
+        assert resp.headers['cache-control'] == "no-cache"
+
+    def test_spa_fallback_serves_index(self, frontend_client):
+        resp = frontend_client.get('/some/client/route')
+        assert resp.status_code == 200
+        assert resp.text == "<html></html>"
+        assert resp.headers['cache-control'] == "no-cache"
+
+    def test_rewritten_file_is_served_with_new_size(self, frontend_client, tmp_path):
+        assert frontend_client.get('/').text == "<html></html>"
+        (tmp_path / "index.html").write_text("<html><body>new</body></html>")
+        resp = frontend_client.get('/')
+        assert resp.text == "<html><body>new</body></html>"
+        assert resp.headers['content-length'] == str(len(resp.text))
+
+
 class TestAuthentication:
     """Tests for authentication and authorization."""
     
@@ -943,6 +984,44 @@ class TestInternetControlEndpoints:
         # Should fail with either 404 or 500 depending on implementation
         assert resp.status_code in [404, 422, 500]
 
+    def test_enable_internet_already_enabled_skips_nat(self, client, valid_token, reservation_id, monkeypatch):
+        """Test enabling internet twice does not touch NAT the second time."""
+        cfg = load_config()
+        manager = NetworkManager(cfg)
+        nat_calls = []
+
+        monkeypatch.setattr(manager.dhcp_server, 'start', lambda *a, **k: {'gateway': '192.168.10.1'})
+        monkeypatch.setattr(manager.hostapd_manager, 'start', lambda *a, **k: {})
+        monkeypatch.setattr(manager.nat_manager, 'enable_nat', lambda *a, **k: nat_calls.append(a))
+        monkeypatch.setattr(manager.isolation_manager, 'add_network', lambda *a, **k: None)
+        monkeypatch.setattr(manager, '_read_current_txpower', lambda _iface: 20.0)
+        monkeypatch.setattr(dependencies, '_manager', manager, raising=False)
+
+        start_resp = client.post(
+            f'/api/v1/interface/{reservation_id}/network',
+            headers={'Authorization': valid_token},
+            json={
+                'ssid': 'TestAP',
+                'channel': 6,
+                'encryption': 'wpa2',
+                'password': 'testpass123',
+                'band': '2.4ghz',
+                'tx_power_level': 4,
+                'internet_enabled': True,
+            }
+        )
+        assert start_resp.status_code == 200
+        assert len(nat_calls) == 1
+
+        monkeypatch.setattr(manager, 'enable_internet', lambda *a: pytest.fail('enable_internet called'))
+        resp = client.post(
+            f'/api/v1/interface/{reservation_id}/internet/enable',
+            headers={'Authorization': valid_token}
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {'detail': 'Network wls16 internet enabled successfully'}
+        assert len(nat_calls) == 1
+
 
 class TestReservationRequiredForOperations:
     """Tests that network operations require a valid reservation token."""
@@ -1043,6 +1122,12 @@ class TestStatusReservationInfo:
         assert isinstance(remaining, int)
         assert remaining > 3500  # 3600s reservation, allow small margin
 
+    def test_debug_managed_interfaces_show_reservation_id(self, client, valid_token, reservation_id):
+        """Debug API reports the active reservation_id per managed interface."""
+        resp = client.get('/api/v1/debug', headers={'Authorization': valid_token})
+        managed = {m['interface']: m for m in resp.json()['interfaces']['managed']}
+        assert managed['wls16']['reservation_id'] == reservation_id
+
 
 class TestGetNetworkExpiryAlwaysPresent:
     """Tests that Get Network always exposes expires_at/expires_in (Task 6)."""
@@ -1277,3 +1362,106 @@ class TestUnlimitedReservationAPI:
         data = resp.json()
         reserved_net = [n for n in data['networks'] if n['reservation_remaining_seconds'] is None]
         assert len(reserved_net) >= 1
+
+
+class TestBlockingOffload:
+    """Tests for running blocking manager calls off the event loop."""
+
+    def test_run_blocking_uses_worker_thread(self):
+        import asyncio
+        import threading
+
+        main_thread = threading.get_ident()
+        result = asyncio.run(dependencies.run_blocking(threading.get_ident))
+        assert result != main_thread
+
+    def test_run_blocking_forwards_arguments(self):
+        import asyncio
+
+        def add(a, b, scale=1):
+            return (a + b) * scale
+
+        assert asyncio.run(dependencies.run_blocking(add, 1, 2, scale=3)) == 9
+
+
+def _api_routes(routes):
+    """Yield every APIRoute, descending into included routers."""
+    from fastapi.routing import APIRoute
+
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route
+        elif hasattr(route, 'original_router'):
+            yield from _api_routes(route.original_router.routes)
+
+
+class TestAsyncDependencies:
+    """Tests that route dependencies resolve on the event loop."""
+
+    def test_api_dependencies_are_async(self):
+        import inspect
+
+        def walk(dependant):
+            for dep in dependant.dependencies:
+                yield dep.call
+                yield from walk(dep)
+
+        routes = list(_api_routes(create_app().routes))
+        assert routes
+        sync_deps = set()
+        for route in routes:
+            for call in walk(route.dependant):
+                target = call if inspect.isfunction(call) else type(call).__call__
+                if not inspect.iscoroutinefunction(target):
+                    sync_deps.add(getattr(call, '__name__', repr(call)))
+        assert sync_deps == set()
+
+
+class TestRouteRegistration:
+    """Tests for API router wiring."""
+
+    def test_no_duplicate_operations(self):
+        """Each endpoint is registered exactly once."""
+        from collections import Counter
+
+        app = create_app()
+        endpoints = Counter(
+            (route.endpoint, method)
+            for route in _api_routes(app.routes)
+            for method in route.methods
+        )
+        assert endpoints
+        assert [op for op, count in endpoints.items() if count > 1] == []
+
+        operation_ids = Counter(
+            op["operationId"]
+            for methods in app.openapi()["paths"].values()
+            for op in methods.values()
+        )
+        assert [oid for oid, count in operation_ids.items() if count > 1] == []
+
+
+class TestFastJSONResponse:
+    """Tests for the orjson-backed response class."""
+
+    def test_render_matches_json(self):
+        import json
+
+        from wilab.api.responses import FastJSONResponse
+
+        content = {"status": "ok", "networks": [{"interface": "wls16", "active": True}], "n": None}
+        assert json.loads(FastJSONResponse(content).body) == content
+
+    def test_render_falls_back_without_orjson(self, monkeypatch):
+        import json
+
+        from wilab.api import responses
+
+        monkeypatch.setattr(responses, "orjson", None)
+        body = responses.FastJSONResponse({"a": 1}).body
+        assert json.loads(body) == {"a": 1}
+
+    def test_status_returns_json(self, client, valid_token):
+        resp = client.get('/api/v1/status', headers={'Authorization': valid_token})
+        assert resp.status_code == 200
+        assert resp.headers['content-type'] == 'application/json'
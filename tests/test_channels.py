@@ -190,6 +190,21 @@ class TestChannelManagerResolve:
         assert ch12.disabled is True
         assert ch12.max_power_dbm == 0.0
 
+    def test_find_channel_in_either_band(self):
+        mgr = ChannelManager()
+        info = mgr.get_channels("wls16")
+        assert info.find(1) is next(c for c in info.channels_24ghz if c.channel == 1)
+        assert info.find(36) is next(c for c in info.channels_5ghz if c.channel == 36)
+        assert info.find(999) is None
+
+    def test_channels_queried_on_interface_phy(self, monkeypatch):
+        from wilab.wifi import channels
+        calls = []
+        monkeypatch.setattr(channels, "get_wiphy", lambda iface: "phy3")
+        monkeypatch.setattr(channels, "execute_iw", lambda args: calls.append(args) or "")
+        ChannelManager().get_channels("wls16")
+        assert calls == [["phy3", "channels"]]
+
     def test_cache_returns_same_object(self):
         mgr = ChannelManager()
         first = mgr.get_channels("wls16")
@@ -1,8 +1,11 @@
+import asyncio
+
 import pytest
 from unittest.mock import patch, MagicMock
 from wilab.network.commands import (
-    CommandError, execute_command, execute_iptables,
-    execute_ip, execute_sysctl, execute_pkill
+    CommandError, execute_command, execute_command_async, execute_iptables,
+    execute_iptables_restore, execute_ip, execute_ip_async, execute_ip_batch, execute_sysctl,
+    execute_sysctl_async, execute_pkill, terminate_process, write_file_atomic
 )
 
 
@@ -23,6 +26,46 @@ class TestCommandExecution:
             execute_command(['echo', 'hello'], timeout=1.0)
             assert mock_run.call_args.kwargs['timeout'] == 5.0
     
+    def test_binary_resolved_once(self, monkeypatch):
+        """Test the command is exec'd by absolute path, looked up on PATH once."""
+        from wilab.network import commands as commands_module
+        monkeypatch.setattr(commands_module, '_binary_paths', {})
+        lookups = []
+        
+        def fake_which(name):
+            lookups.append(name)
+            return f'/usr/sbin/{name}'
+        monkeypatch.setattr(commands_module.shutil, 'which', fake_which)
+        
+        with patch('wilab.network.commands.subprocess.run') as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stdout='', stderr='')
+            execute_command(['iw', 'dev'])
+            execute_command(['iw', 'reg', 'get'])
+            assert mock_run.call_args[0][0] == ['/usr/sbin/iw', 'reg', 'get']
+        assert lookups == ['iw']
+    
+    def test_missing_binary_not_cached(self, monkeypatch):
+        """Test a command missing from PATH is still reported and looked up again."""
+        from wilab.network import commands as commands_module
+        monkeypatch.setattr(commands_module, '_binary_paths', {})
+        
+        with pytest.raises(CommandError, match='Command not found: wilab-no-such-tool'):
+            execute_command(['wilab-no-such-tool'])
+        assert commands_module._binary_paths == {}
+    
+    def test_find_binary_caches_hits_only(self, monkeypatch):
+        """Test find_binary shares the spawn cache and re-checks missing tools."""
+        from wilab.network import commands as commands_module
+        monkeypatch.setattr(commands_module, '_binary_paths', {})
+        monkeypatch.setattr(commands_module.shutil, 'which', lambda name: None)
+        assert commands_module.find_binary('hostapd') is None
+        
+        monkeypatch.setattr(commands_module.shutil, 'which', lambda name: f'/usr/sbin/{name}')
+        assert commands_module.find_binary('hostapd') == '/usr/sbin/hostapd'
+        monkeypatch.setattr(commands_module.shutil, 'which', lambda name: None)
+        assert commands_module.find_binary('hostapd') == '/usr/sbin/hostapd'
+        assert commands_module._resolve_binary('hostapd') == '/usr/sbin/hostapd'
+    
     def test_execute_command_success(self):
         """Test successful command execution."""
         result = execute_command(['echo', 'hello'])
@@ -57,6 +100,39 @@ class TestCommandExecution:
         assert result is not None
 
 
+class TestAsyncCommandExecution:
+    """Tests for the event-loop friendly command runner."""
+
+    def test_execute_command_async_success(self):
+        """Test stdout is returned as text."""
+        result = asyncio.run(execute_command_async(['echo', 'hello']))
+        assert 'hello' in result
+
+    def test_execute_command_async_stdin(self):
+        """Test input is piped to the command."""
+        result = asyncio.run(execute_command_async(['cat'], input='piped'))
+        assert result == 'piped'
+
+    def test_execute_command_async_failure(self):
+        """Test non-zero exit raises unless check=False."""
+        with pytest.raises(CommandError):
+            asyncio.run(execute_command_async(['false']))
+        assert asyncio.run(execute_command_async(['false'], check=False)) == ''
+
+    def test_execute_command_async_not_found(self):
+        """Test missing binary raises CommandError."""
+        with pytest.raises(CommandError, match="not found"):
+            asyncio.run(execute_command_async(['nonexistent-command-xyz']))
+
+    def test_execute_ip_async_prepends_ip(self):
+        """Test ip async wrapper builds the ip command."""
+        async def fake(cmd, **kwargs):
+            return ' '.join(cmd)
+
+        with patch('wilab.network.commands.execute_command_async', side_effect=fake):
+            assert asyncio.run(execute_ip_async(['addr', 'show'])) == 'ip addr show'
+
+
 class TestIptablesWrapper:
     """Tests for iptables command wrapper."""
     
@@ -67,8 +143,33 @@ class TestIptablesWrapper:
             mock.return_value = ''
             execute_iptables(['-L', '-n'])
             mock.assert_called_once()
-            # Check that 'iptables' was prepended
-            assert mock.call_args[0][0][0] == 'iptables'
+            # Check that 'iptables' and the lock wait were prepended
+            assert mock.call_args[0][0][:2] == ['iptables', '-w']
+
+
+class TestIptablesRestoreWrapper:
+    """Tests for iptables-restore batch wrapper."""
+    
+    def test_execute_iptables_restore_builds_tables(self):
+        """Test rules are grouped per table and piped on stdin."""
+        with patch('wilab.network.commands.execute_command') as mock:
+            mock.return_value = ''
+            execute_iptables_restore({
+                "nat": ["-A POSTROUTING -o eth0 -j MASQUERADE"],
+                "filter": ["-A FORWARD -i wlan0 -j ACCEPT"],
+            })
+            mock.assert_called_once()
+            assert mock.call_args[0][0] == ['iptables-restore', '--noflush', '-w']
+            assert mock.call_args.kwargs['input'] == (
+                "*nat\n-A POSTROUTING -o eth0 -j MASQUERADE\nCOMMIT\n"
+                "*filter\n-A FORWARD -i wlan0 -j ACCEPT\nCOMMIT\n"
+            )
+    
+    def test_execute_iptables_restore_skips_empty(self):
+        """Test empty tables do not spawn iptables-restore."""
+        with patch('wilab.network.commands.execute_command') as mock:
+            execute_iptables_restore({"nat": [], "filter": []})
+            mock.assert_not_called()
 
 
 class TestIpWrapper:
@@ -91,14 +192,39 @@ class TestIpWrapper:
             assert call_args[0] == 'ip'
             assert 'addr' in call_args
             assert 'add' in call_args
+    
+    def test_execute_ip_batch(self):
+        """Test several ip commands share one ip -batch process."""
+        with patch('wilab.network.commands.execute_command') as mock:
+            mock.return_value = ''
+            execute_ip_batch(['link set wlan0 up', 'addr flush dev wlan0'])
+            mock.assert_called_once()
+            assert mock.call_args[0][0] == ['ip', '-force', '-batch', '-']
+            assert mock.call_args.kwargs['input'] == "link set wlan0 up\naddr flush dev wlan0\n"
+    
+    def test_execute_ip_batch_empty(self):
+        """Test an empty batch does not spawn ip."""
+        with patch('wilab.network.commands.execute_command') as mock:
+            assert execute_ip_batch([]) == ""
+            mock.assert_not_called()
 
 
 class TestSysctlWrapper:
     """Tests for sysctl command wrapper."""
     
-    def test_sysctl_read(self):
-        """Test reading sysctl value."""
-        with patch('wilab.network.commands.execute_command') as mock:
+    def test_sysctl_read_from_proc(self, tmp_path):
+        """Test reading sysctl value straight from /proc/sys."""
+        (tmp_path / 'net' / 'ipv4').mkdir(parents=True)
+        (tmp_path / 'net' / 'ipv4' / 'ip_forward').write_text('1\n')
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command') as mock:
+            assert execute_sysctl('net.ipv4.ip_forward') == '1\n'
+            mock.assert_not_called()
+    
+    def test_sysctl_read(self, tmp_path):
+        """Test reading sysctl value falls back to the sysctl binary."""
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command') as mock:
             mock.return_value = '1\n'
             execute_sysctl('net.ipv4.ip_forward')
             mock.assert_called_once()
@@ -106,15 +232,97 @@ class TestSysctlWrapper:
             assert 'sysctl' in call_args
             assert '-n' in call_args
     
-    def test_sysctl_write(self):
-        """Test writing sysctl value."""
-        with patch('wilab.network.commands.execute_command') as mock:
+    def test_sysctl_write_to_proc(self, tmp_path):
+        """Test writing sysctl value straight to /proc/sys."""
+        (tmp_path / 'net' / 'ipv4').mkdir(parents=True)
+        (tmp_path / 'net' / 'ipv4' / 'ip_forward').write_text('0\n')
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command') as mock:
+            assert execute_sysctl('net.ipv4.ip_forward', '1') == 'net.ipv4.ip_forward = 1\n'
+            mock.assert_not_called()
+        assert (tmp_path / 'net' / 'ipv4' / 'ip_forward').read_text() == '1\n'
+    
+    def test_sysctl_write(self, tmp_path):
+        """Test writing sysctl value falls back to the sysctl binary."""
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command') as mock:
             mock.return_value = 'net.ipv4.ip_forward = 1\n'
             execute_sysctl('net.ipv4.ip_forward', '1')
             mock.assert_called_once()
             call_args = mock.call_args[0][0]
             assert 'sysctl' in call_args
             assert '-w' in call_args
+    
+    def test_sysctl_async_read_from_proc(self, tmp_path):
+        """Test the async read uses /proc/sys without spawning sysctl."""
+        (tmp_path / 'net' / 'ipv4').mkdir(parents=True)
+        (tmp_path / 'net' / 'ipv4' / 'ip_forward').write_text('1\n')
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command_async') as mock:
+            assert asyncio.run(execute_sysctl_async('net.ipv4.ip_forward')) == '1\n'
+            mock.assert_not_called()
+    
+    def test_sysctl_async_read_fallback(self, tmp_path):
+        """Test the async read falls back to the sysctl binary."""
+        async def fake(cmd, **kwargs):
+            return ' '.join(cmd)
+        with patch('wilab.network.commands.PROC_SYS_DIR', str(tmp_path)), \
+                patch('wilab.network.commands.execute_command_async', side_effect=fake):
+            result = asyncio.run(execute_sysctl_async('net.ipv4.ip_forward'))
+        assert result == 'sysctl -n net.ipv4.ip_forward'
+
+
+class TestAtomicConfigWrite:
+    """Tests for atomic config file writes."""
+    
+    def test_write_replaces_file(self, tmp_path):
+        """Test the target ends up with the new content and no temp file remains."""
+        target = tmp_path / 'ap-01.conf'
+        target.write_text('old\n')
+        
+        write_file_atomic(str(target), 'new\n')
+        
+        assert target.read_text() == 'new\n'
+        assert [p.name for p in tmp_path.iterdir()] == ['ap-01.conf']
+        assert target.stat().st_mode & 0o777 == 0o600
+    
+    def test_data_flushed_before_rename(self, tmp_path, monkeypatch):
+        """Test the data is flushed with fdatasync before the file is renamed."""
+        from wilab.network import commands as commands_module
+        target = tmp_path / 'ap-01.conf'
+        events = []
+        real_fdatasync, real_replace = commands_module.os.fdatasync, commands_module.os.replace
+        
+        def record_fdatasync(fd):
+            events.append('fdatasync')
+            real_fdatasync(fd)
+        
+        def record_replace(src, dst):
+            events.append('replace')
+            real_replace(src, dst)
+        
+        monkeypatch.setattr(commands_module.os, 'fdatasync', record_fdatasync)
+        monkeypatch.setattr(commands_module.os, 'replace', record_replace)
+        
+        write_file_atomic(str(target), 'new\n')
+        
+        assert events == ['fdatasync', 'replace']
+    
+    def test_failed_write_keeps_old_file(self, tmp_path, monkeypatch):
+        """Test a failure before the rename leaves the old file and cleans up."""
+        from wilab.network import commands as commands_module
+        target = tmp_path / 'ap-01.conf'
+        target.write_text('old\n')
+        
+        def fail_replace(src, dst):
+            raise OSError("disk full")
+        monkeypatch.setattr(commands_module.os, 'replace', fail_replace)
+        
+        with pytest.raises(OSError):
+            commands_module.write_file_atomic(str(target), 'new\n')
+        
+        assert target.read_text() == 'old\n'
+        assert [p.name for p in tmp_path.iterdir()] == ['ap-01.conf']
 
 
 class TestPkillWrapper:
@@ -140,6 +348,37 @@ class TestPkillWrapper:
             assert 'KILL' in call_args or '-f' in call_args
 
 
+class TestTerminateProcess:
+    """Tests for pidfd-based process termination."""
+    
+    def test_terminate_running_process(self):
+        """Test a running process is signalled and its exit observed."""
+        import subprocess
+        proc = subprocess.Popen(['sleep', '30'])
+        try:
+            assert terminate_process(proc.pid) is True
+            assert proc.wait(timeout=2) != 0
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+    
+    def test_terminate_missing_process(self):
+        """Test a pid that no longer exists counts as exited."""
+        with patch('wilab.network.commands.os.pidfd_open', side_effect=ProcessLookupError()), \
+             patch('wilab.network.commands.execute_command') as mock:
+            assert terminate_process(999999) is True
+            mock.assert_not_called()
+    
+    def test_terminate_falls_back_to_kill(self):
+        """Test the kill binary is used when pidfds are unavailable."""
+        import errno
+        with patch('wilab.network.commands.os.pidfd_open', side_effect=OSError(errno.ENOSYS, 'nosys')), \
+             patch('wilab.network.commands.execute_command') as mock:
+            assert terminate_process(1234) is False
+            mock.assert_called_once_with(['kill', '1234'], check=False)
+
+
 class TestCommandError:
     """Tests for CommandError exception."""
     
@@ -45,6 +45,31 @@ class TestConfigLoading:
             load_config('/nonexistent/path/config.yaml')
         assert "Configuration file not found" in str(exc_info.value)
 
+    def test_config_reports_all_invalid_interfaces(self, tmp_path, monkeypatch):
+        """Test every failing interface is reported in a single SystemExit."""
+        from wilab.wifi import interface
+        cfg_file = tmp_path / 'config.yaml'
+        cfg_file.write_text(
+            "auth_token: t\n"
+            "dhcp_base_network: 192.168.120.0/24\n"
+            "networks:\n"
+            "  - {interface: wlan0, display_name: a}\n"
+            "  - {interface: wlan1, display_name: b}\n"
+            "  - {interface: wlan2, display_name: c}\n"
+        )
+
+        def fake_validate(iface):
+            if iface != 'wlan1':
+                raise interface.InterfaceError(f"{iface} missing")
+
+        monkeypatch.setattr(interface, 'validate_interface', fake_validate)
+        with pytest.raises(SystemExit) as exc_info:
+            load_config(str(cfg_file))
+        message = str(exc_info.value)
+        assert "wlan0 missing" in message
+        assert "wlan2 missing" in message
+        assert "wlan1" not in message
+
 
 class TestNetworkEntryValidation:
     """Tests for NetworkEntry validation."""
@@ -100,6 +125,17 @@ class TestConfigIntegration:
         from ipaddress import IPv4Network
         IPv4Network(cfg.dhcp_base_network, strict=False)  # Should not raise
 
+    def test_dhcp_base_network_canonicalized(self):
+        """Test host bits are cleared and non-/24 networks are rejected."""
+        from pydantic import ValidationError
+        nets = [{'interface': 'wlan0', 'display_name': 'a'}]
+        cfg = AppConfig(auth_token='t', dhcp_base_network='192.168.120.7/24', networks=nets)
+        assert cfg.dhcp_base_network == '192.168.120.0/24'
+        with pytest.raises(ValidationError, match="must be a /24"):
+            AppConfig(auth_token='t', dhcp_base_network='192.168.0.0/16', networks=nets)
+        with pytest.raises(ValidationError, match="Invalid dhcp_base_network"):
+            AppConfig(auth_token='t', dhcp_base_network='not-a-network', networks=nets)
+
 
 class TestMinTimeoutConstraint:
     """Tests for min_timeout hardcoded floor."""
@@ -26,15 +26,16 @@ class TestSubnetParsing:
     def test_parse_subnet_valid(self):
         """Test parsing valid subnet."""
         dhcp = DhcpServer()
-        network, gateway, dhcp_range = dhcp._parse_subnet('192.168.10.0/24')
+        network, gateway, dhcp_range, prefix_len = dhcp._parse_subnet('192.168.10.0/24')
         assert network == '192.168.10.0'
         assert gateway == '192.168.10.1'
         assert dhcp_range == '192.168.10.10,192.168.10.250'
+        assert prefix_len == 24
     
     def test_parse_subnet_different_class(self):
         """Test parsing different class subnet."""
         dhcp = DhcpServer()
-        network, gateway, dhcp_range = dhcp._parse_subnet('10.0.0.0/8')
+        network, gateway, dhcp_range, _prefix_len = dhcp._parse_subnet('10.0.0.0/8')
         assert network == '10.0.0.0'
         assert gateway == '10.0.0.1'
         assert '10.0.0.10' in dhcp_range
@@ -50,6 +51,12 @@ class TestSubnetParsing:
         dhcp = DhcpServer()
         with pytest.raises(DhcpServerError, match="Invalid subnet"):
             dhcp._parse_subnet('999.999.999.999/24')
+    
+    def test_parse_subnet_memoized(self):
+        """Test repeated parses of a subnet reuse the cached result."""
+        first = DhcpServer()._parse_subnet('192.168.40.0/24')
+        second = DhcpServer()._parse_subnet('192.168.40.0/24')
+        assert first is second
 
 
 class TestConfigGeneration:
@@ -92,6 +99,32 @@ class TestConfigGeneration:
             dns_server='192.168.10.21'
         )
         assert 'dhcp-option=option:router,192.168.10.1' in config
+    
+    def test_generate_config_full_layout(self):
+        """Test the generated config contains every directive in order."""
+        dhcp = DhcpServer()
+        config = dhcp._generate_config(
+            interface='wlan0',
+            gateway='192.168.10.1',
+            dhcp_range='192.168.10.10,192.168.10.250',
+            lease_file='/tmp/test.leases',
+            dns_server='192.168.10.21'
+        )
+        assert config.splitlines() == [
+            '# Wi-Lab dnsmasq config for wlan0',
+            'interface=wlan0',
+            'bind-interfaces',
+            'listen-address=192.168.10.1',
+            'dhcp-range=192.168.10.10,192.168.10.250,255.255.255.0,12h',
+            'dhcp-option=option:router,192.168.10.1',
+            'dhcp-leasefile=/tmp/test.leases',
+            'dhcp-option=option:dns-server,192.168.10.21',
+            'port=0',
+            'no-resolv',
+            'no-poll',
+            'log-dhcp',
+        ]
+        assert config.endswith('\n')
 
 
 class TestSubnetInfo:
@@ -147,6 +180,137 @@ class TestDhcpServerStart:
         assert result == dhcp._instances['ap-01']
 
 
+    
+    def test_config_test_skipped_for_known_config(self, monkeypatch, tmp_path):
+        """Test `dnsmasq --test` runs once per distinct config across restarts."""
+        from wilab.network import dhcp as dhcp_module
+        monkeypatch.setattr(dhcp_module, "DNSMASQ_CONFIG_DIR", str(tmp_path))
+        monkeypatch.setattr(dhcp_module, "DNSMASQ_PID_DIR", str(tmp_path))
+        monkeypatch.setattr(dhcp_module, "_dnsmasq_available", lambda: True)
+        monkeypatch.setattr(dhcp_module, "terminate_process", lambda pid: True)
+        commands = []
+        monkeypatch.setattr(dhcp_module, "execute_command", lambda cmd, **kw: commands.append(cmd) or "")
+        
+        dhcp = DhcpServer()
+        monkeypatch.setattr(dhcp, "_configure_interface", lambda *a: None)
+        for _ in range(2):
+            dhcp.start(net_id='ap-01', interface='wlan0',
+                       subnet='192.168.10.0/24', dns_server='192.168.10.21')
+            dhcp.stop('ap-01')
+        
+        tests = [c for c in commands if '--test' in c]
+        starts = [c for c in commands if '--test' not in c]
+        assert len(tests) == 1
+        assert len(starts) == 2
+
+    
+    def test_interface_setup_overlaps_config_write(self, monkeypatch, tmp_path):
+        """Test the interface is configured while the config file is written."""
+        import threading
+
+        from wilab.network import dhcp as dhcp_module
+        monkeypatch.setattr(dhcp_module, "DNSMASQ_CONFIG_DIR", str(tmp_path))
+        monkeypatch.setattr(dhcp_module, "DNSMASQ_PID_DIR", str(tmp_path))
+        monkeypatch.setattr(dhcp_module, "_dnsmasq_available", lambda: True)
+        monkeypatch.setattr(dhcp_module, "execute_command", lambda cmd, **kw: "")
+        
+        config_written = threading.Event()
+        configured = []
+        
+        def fake_write(path, content):
+            config_written.set()
+        
+        def fake_configure(interface, ip_address, prefix_len):
+            # Only completes if the config write happens meanwhile
+            configured.append(config_written.wait(timeout=2))
+        
+        monkeypatch.setattr(dhcp_module, "write_file_atomic", fake_write)
+        dhcp = DhcpServer()
+        monkeypatch.setattr(dhcp, "_configure_interface", fake_configure)
+        
+        dhcp.start(net_id='ap-01', interface='wlan0',
+                   subnet='192.168.10.0/24', dns_server='192.168.10.21')
+        
+        assert configured == [True]
+    
+    def test_interface_setup_waited_for_on_write_failure(self, monkeypatch, tmp_path):
+        """Test a failed config write still waits for and reports the interface setup."""
+        from wilab.network import dhcp as dhcp_module
+        monkeypatch.setattr(dhcp_module, "DNSMASQ_CONFIG_DIR", str(tmp_path))
+        
+        def fail_write(path, content):
+            raise OSError("disk full")
+        
+        def fail_configure(interface, ip_address, prefix_len):
+            raise DhcpServerError("address busy")
+        
+        monkeypatch.setattr(dhcp_module, "write_file_atomic", fail_write)
+        dhcp = DhcpServer()
+        monkeypatch.setattr(dhcp, "_configure_interface", fail_configure)
+        
+        with pytest.raises(DhcpServerError, match="address busy") as exc_info:
+            dhcp.start(net_id='ap-01', interface='wlan0',
+                       subnet='192.168.10.0/24', dns_server='192.168.10.21')
+        assert isinstance(exc_info.value.__cause__.__context__, OSError)
+
+
+class TestDnsmasqAvailability:
+    """Tests for the dnsmasq installation check."""
+    
+    @pytest.fixture(autouse=True)
+    def empty_binary_cache(self, monkeypatch):
+        from wilab.network import commands as commands_module
+        monkeypatch.setattr(commands_module, "_binary_paths", {})
+    
+    def test_path_lookup_avoids_spawn(self, monkeypatch):
+        """Test a dnsmasq found on PATH needs no process spawn and is remembered."""
+        from wilab.network import commands as commands_module
+        from wilab.network import dhcp as dhcp_module
+        monkeypatch.setattr(commands_module.shutil, "which", lambda name: "/usr/sbin/dnsmasq")
+        calls = []
+        monkeypatch.setattr(dhcp_module, "execute_command", lambda cmd, **kw: calls.append(cmd))
+        
+        assert dhcp_module._dnsmasq_available() is True
+        monkeypatch.setattr(commands_module.shutil, "which", lambda name: None)
+        assert dhcp_module._dnsmasq_available() is True
+        assert calls == []
+    
+    def test_missing_binary_rechecked(self, monkeypatch):
+        """Test a missing dnsmasq is not cached, so a later install is picked up."""
+        from wilab.network import commands as commands_module
+        from wilab.network import dhcp as dhcp_module
+        monkeypatch.setattr(commands_module.shutil, "which", lambda name: None)
+        assert dhcp_module._dnsmasq_available() is False
+        
+        monkeypatch.setattr(commands_module.shutil, "which", lambda name: "/usr/sbin/dnsmasq")
+        assert dhcp_module._dnsmasq_available() is True
+
+
+class TestConfigureInterface:
+    """Tests for interface address setup."""
+    
+    def test_configure_interface_single_batch(self, monkeypatch):
+        """Test link up, flush and address assignment run as one ip batch."""
+        batches = []
+        monkeypatch.setattr("wilab.network.dhcp.execute_ip_batch", lambda cmds: batches.append(cmds) or "")
+        
+        DhcpServer()._configure_interface('wlan0', '192.168.10.1', 24)
+        
+        assert batches == [[
+            'link set wlan0 up',
+            'addr flush dev wlan0',
+            'addr add 192.168.10.1/24 dev wlan0',
+        ]]
+    
+    def test_configure_interface_error_not_raised(self, monkeypatch):
+        """Test a failing batch is logged, not raised."""
+        def fail(cmds):
+            raise CommandError("Command failed -:3")
+        monkeypatch.setattr("wilab.network.dhcp.execute_ip_batch", fail)
+        
+        DhcpServer()._configure_interface('wlan0', '192.168.10.1', 24)
+
+
 class TestDhcpServerStop:
     """Tests for stopping DHCP server."""
     
@@ -159,6 +323,94 @@ class TestDhcpServerStop:
         """Test stopping all when none active."""
         dhcp = DhcpServer()
         dhcp.stop_all()  # Should not raise
+    
+    def test_stop_all_finishes_when_stop_fails(self, monkeypatch):
+        """Test stop_all terminates even if an instance cannot be cleaned up."""
+        dhcp = DhcpServer()
+        dhcp._instances['ap-01'] = {'config_file': '/tmp/a.conf'}
+        dhcp._instances['ap-02'] = {'config_file': '/tmp/b.conf'}
+        stopped = []
+        monkeypatch.setattr(dhcp, 'stop', lambda net_id: stopped.append(net_id))
+        
+        dhcp.stop_all()
+        
+        assert stopped == ['ap-01', 'ap-02']
+        assert dhcp._instances == {}
+    
+    def test_stop_terminates_pid_from_file(self, monkeypatch, tmp_path):
+        """Test stop signals the dnsmasq pid read from the pid file."""
+        pid_file = tmp_path / 'dnsmasq.pid'
+        pid_file.write_text('4321\n')
+        config_file = tmp_path / 'dnsmasq.conf'
+        config_file.write_text('')
+        
+        dhcp = DhcpServer()
+        dhcp._instances['ap-01'] = {
+            'config_file': str(config_file),
+            'pid_file': str(pid_file),
+        }
+        terminated = []
+        monkeypatch.setattr("wilab.network.dhcp.terminate_process", lambda pid: terminated.append(pid) or True)
+        
+        dhcp.stop('ap-01')
+        
+        assert terminated == [4321]
+        assert not pid_file.exists()
+        assert not config_file.exists()
+        assert 'ap-01' not in dhcp._instances
+
+    
+    def test_stop_empty_pid_file(self, monkeypatch, tmp_path):
+        """Test an empty pid file signals nothing."""
+        pid_file = tmp_path / 'dnsmasq.pid'
+        pid_file.write_bytes(b'')
+        dhcp = DhcpServer()
+        dhcp._instances['ap-01'] = {
+            'config_file': str(tmp_path / 'dnsmasq.conf'),
+            'pid_file': str(pid_file),
+        }
+        terminated = []
+        monkeypatch.setattr("wilab.network.dhcp.terminate_process", lambda pid: terminated.append(pid) or True)
+        
+        dhcp.stop('ap-01')
+        
+        assert terminated == []
+        assert not pid_file.exists()
+    
+    def test_stop_without_files(self, tmp_path):
+        """Test stop tolerates pid and config files that are already gone."""
+        dhcp = DhcpServer()
+        dhcp._instances['ap-01'] = {
+            'config_file': str(tmp_path / 'missing.conf'),
+            'pid_file': str(tmp_path / 'missing.pid'),
+        }
+        dhcp.stop('ap-01')
+        assert 'ap-01' not in dhcp._instances
+
+
+class TestDhcpStatus:
+    """Tests for dnsmasq status reporting."""
+    
+    def test_status_scans_pid_dir_once(self, monkeypatch, tmp_path):
+        """Test pid files are checked against a single directory listing."""
+        (tmp_path / 'dnsmasq-ap-01.pid').write_text('1\n')
+        dhcp = DhcpServer()
+        dhcp._instances['ap-01'] = {'interface': 'wlan0', 'pid_file': str(tmp_path / 'dnsmasq-ap-01.pid')}
+        dhcp._instances['ap-02'] = {'interface': 'wlan1', 'pid_file': str(tmp_path / 'dnsmasq-ap-02.pid')}
+        
+        real_scandir = os.scandir
+        scans = []
+        
+        def counting_scandir(path):
+            scans.append(path)
+            return real_scandir(path)
+        
+        monkeypatch.setattr('wilab.network.dhcp.os.scandir', counting_scandir)
+        status = dhcp.status()
+        
+        assert scans == [str(tmp_path)]
+        assert status['running'] is True
+        assert [i['pid_file_exists'] for i in status['instances']] == [True, False]
 
 
 class TestDhcpIntegration:
@@ -176,7 +428,7 @@ class TestDhcpIntegration:
         ]
         
         for subnet in subnets:
-            network, gateway, dhcp_range = dhcp._parse_subnet(subnet)
+            network, gateway, dhcp_range, _prefix_len = dhcp._parse_subnet(subnet)
             # Verify gateway is second IP in network
             net = IPv4Network(subnet, strict=False)
             assert gateway == str(net[1])
@@ -1,10 +1,18 @@
 """Tests for network isolation functionality."""
 
+import pytest
+
 from wilab.network.isolation import IsolationManager
 from wilab.network.commands import CommandError
 from unittest.mock import patch
 
 
+@pytest.fixture(autouse=True)
+def no_ipset(monkeypatch):
+    """Exercise the pairwise rule backend unless a test enables ipset."""
+    monkeypatch.setattr('wilab.network.isolation.shutil.which', lambda name: None)
+
+
 class TestIsolationManagerInit:
     """Tests for IsolationManager initialization."""
     
@@ -23,58 +31,80 @@ class TestAddNetwork:
     """Tests for adding network isolation rules."""
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_add_first_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_first_network(self, mock_restore, mock_iptables):
         """Test adding isolation rules for first network."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         
         # No iptables calls for first network (no other networks to isolate from)
+        assert mock_restore.call_count == 0
         assert mock_iptables.call_count == 0
         assert '192.168.10.0/24' in manager._active_subnets
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_add_second_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_second_network(self, mock_restore, mock_iptables):
         """Test adding isolation rules for second network."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
         
-        # Should create 2 rules: 10->11 and 11->10
-        assert mock_iptables.call_count == 2
-        
-        # Verify blocking calls
-        calls = mock_iptables.call_args_list
-        assert any('-s' in str(call) and '192.168.10.0/24' in str(call) and '192.168.11.0/24' in str(call) 
-                   for call in calls)
-        assert any('-s' in str(call) and '192.168.11.0/24' in str(call) and '192.168.10.0/24' in str(call) 
-                   for call in calls)
+        # Should create 2 rules (11->10 and 10->11) in one batch
+        assert mock_restore.call_count == 1
+        assert mock_iptables.call_count == 0
+        rules = mock_restore.call_args[0][0]["filter"]
+        assert rules == [
+            "-A FORWARD -s 192.168.11.0/24 -d 192.168.10.0/24 -j DROP -m comment --comment wilab-isolation",
+            "-A FORWARD -s 192.168.10.0/24 -d 192.168.11.0/24 -j DROP -m comment --comment wilab-isolation",
+        ]
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_add_third_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_third_network(self, mock_restore, mock_iptables):
         """Test adding isolation rules for third network."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
-        mock_iptables.reset_mock()
+        mock_restore.reset_mock()
         
         manager.add_network('192.168.12.0/24')
         
-        # Should create 4 rules: 12->10, 10->12, 12->11, 11->12
-        assert mock_iptables.call_count == 4
+        # Should create 4 rules: 12->10, 10->12, 12->11, 11->12 in one batch
+        assert mock_restore.call_count == 1
+        assert len(mock_restore.call_args[0][0]["filter"]) == 4
+        assert mock_iptables.call_count == 0
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_add_duplicate_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_duplicate_network(self, mock_restore, mock_iptables):
         """Test adding same network twice doesn't create duplicate rules."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.10.0/24')
         
         # No rules for duplicate
+        assert mock_restore.call_count == 0
         assert mock_iptables.call_count == 0
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_add_network_iptables_error(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_network_falls_back_to_single_rules(self, mock_restore, mock_iptables):
+        """Test that a failed batch is retried one rule at a time."""
+        mock_restore.side_effect = CommandError("iptables-restore not found", 127)
+        
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        manager.add_network('192.168.11.0/24')
+        
+        assert mock_restore.call_count == 1
+        assert mock_iptables.call_count == 2
+    
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_network_iptables_error(self, mock_restore, mock_iptables):
         """Test that iptables errors don't crash the manager."""
+        mock_restore.side_effect = CommandError("iptables-restore failed", 1)
         mock_iptables.side_effect = CommandError("iptables failed", 1)
         
         manager = IsolationManager()
@@ -84,47 +114,79 @@ class TestAddNetwork:
         # Should handle error gracefully and still track networks
         assert '192.168.10.0/24' in manager._active_subnets
         assert '192.168.11.0/24' in manager._active_subnets
+    
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_add_network_skips_non_wifi_subnets(self, mock_restore, mock_iptables):
+        """Test that subnets outside 192.168.x.0/24 are never blocked."""
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        manager.add_network('10.0.0.0/24')
+        
+        assert mock_restore.call_count == 0
+        assert mock_iptables.call_count == 0
+        assert manager.get_active_subnets() == ['10.0.0.0/24', '192.168.10.0/24']
+        
+        # Later WiFi subnets are only paired with WiFi subnets
+        manager.add_network('192.168.11.0/24')
+        rules = mock_restore.call_args[0][0]["filter"]
+        assert len(rules) == 2
+        assert not any('10.0.0.0/24' in rule for rule in rules)
+        
+        mock_restore.reset_mock()
+        manager.remove_network('10.0.0.0/24')
+        assert mock_restore.call_count == 0
+        assert '10.0.0.0/24' not in manager._active_subnets
 
 
 class TestRemoveNetwork:
     """Tests for removing network isolation rules."""
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_remove_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_remove_network(self, mock_restore, mock_iptables):
         """Test removing isolation rules for a network."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
-        mock_iptables.reset_mock()
+        mock_restore.reset_mock()
         
         manager.remove_network('192.168.10.0/24')
         
-        # Should remove 2 rules: 10->11 and 11->10
-        assert mock_iptables.call_count == 2
+        # Should remove 2 rules (10->11 and 11->10) in one batch
+        assert mock_restore.call_count == 1
+        assert len(mock_restore.call_args[0][0]["filter"]) == 2
+        assert mock_iptables.call_count == 0
         assert '192.168.10.0/24' not in manager._active_subnets
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_remove_nonexistent_network(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_remove_nonexistent_network(self, mock_restore, mock_iptables):
         """Test removing network that wasn't added."""
         manager = IsolationManager()
         manager.remove_network('192.168.10.0/24')
         
         # Should not call iptables
+        assert mock_restore.call_count == 0
         assert mock_iptables.call_count == 0
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_remove_network_iptables_error(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_remove_network_iptables_error(self, mock_restore, mock_iptables):
         """Test that iptables errors during removal are handled gracefully."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
-        mock_iptables.reset_mock()
+        mock_restore.reset_mock()
         
         # Make iptables fail
+        mock_restore.side_effect = CommandError("Rule not found", 1)
         mock_iptables.side_effect = CommandError("Rule not found", 1)
         
         manager.remove_network('192.168.10.0/24')
         
+        # Batch failure falls back to per-rule deletes
+        assert mock_iptables.call_count == 2
         # Should still remove from tracking
         assert '192.168.10.0/24' not in manager._active_subnets
 
@@ -133,13 +195,14 @@ class TestFlushAll:
     """Tests for flushing all isolation rules."""
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_flush_all(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_flush_all(self, mock_restore, mock_iptables):
         """Test flushing all isolation rules."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
         manager.add_network('192.168.12.0/24')
-        mock_iptables.reset_mock()
+        mock_restore.reset_mock()
         
         manager.flush_all()
         
@@ -152,8 +215,10 @@ class TestIptablesRuleFormat:
     """Tests for correct iptables rule formatting."""
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_block_rule_format(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_block_rule_format(self, mock_restore, mock_iptables):
         """Test that blocking rules have correct iptables format."""
+        mock_restore.side_effect = CommandError("iptables-restore not found", 127)
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
@@ -161,6 +226,7 @@ class TestIptablesRuleFormat:
         # Verify rule format: iptables -A FORWARD -s <src> -d <dst> -j DROP
         # (Note: Changed from -I FORWARD 1 to -A FORWARD for safety)
         calls = mock_iptables.call_args_list
+        assert calls
         for call in calls:
             args = call[0][0]  # First positional argument (list of args)
             assert '-A' in args  # Append, not insert
@@ -171,22 +237,170 @@ class TestIptablesRuleFormat:
             assert 'DROP' in args
     
     @patch('wilab.network.isolation.execute_iptables')
-    def test_unblock_rule_format(self, mock_iptables):
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    def test_unblock_rule_format(self, mock_restore, mock_iptables):
         """Test that unblocking rules have correct iptables format."""
         manager = IsolationManager()
         manager.add_network('192.168.10.0/24')
         manager.add_network('192.168.11.0/24')
-        mock_iptables.reset_mock()
+        mock_restore.reset_mock()
         
         manager.remove_network('192.168.10.0/24')
         
-        # Verify rule format: iptables -D FORWARD -s <src> -d <dst> -j DROP
-        calls = mock_iptables.call_args_list
-        for call in calls:
-            args = call[0][0]  # First positional argument (list of args)
-            assert '-D' in args
-            assert 'FORWARD' in args
+        # Verify rule format: -D FORWARD -s <src> -d <dst> -j DROP
+        for rule in mock_restore.call_args[0][0]["filter"]:
+            args = rule.split()
+            assert args[:2] == ['-D', 'FORWARD']
             assert '-s' in args
             assert '-d' in args
             assert '-j' in args
             assert 'DROP' in args
+
+
+class TestIpsetIsolation:
+    """Tests for the ipset isolation backend."""
+    
+    @pytest.fixture(autouse=True)
+    def with_ipset(self, monkeypatch):
+        monkeypatch.setattr('wilab.network.isolation.shutil.which', lambda name: '/usr/sbin/ipset')
+    
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_command')
+    def test_setup_once_then_set_updates(self, mock_command, mock_iptables, mock_restore):
+        """Test the set and shared rules are created once and networks add one rule each."""
+        def fake_iptables(args):
+            if args[0] == '-C':
+                raise CommandError("no rule", 1)
+            return ""
+        mock_iptables.side_effect = fake_iptables
+        
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        manager.add_network('192.168.11.0/24')
+        manager.add_network('192.168.12.0/24')
+        manager.remove_network('192.168.11.0/24')
+        
+        assert mock_command.call_args_list[0][0][0] == [
+            'ipset', 'create', 'wilab_subnets', 'hash:net', '-exist'
+        ]
+        assert [c[0][0] for c in mock_command.call_args_list[1:]] == [
+            ['ipset', 'add', 'wilab_subnets', '192.168.10.0/24', '-exist'],
+            ['ipset', 'add', 'wilab_subnets', '192.168.11.0/24', '-exist'],
+            ['ipset', 'add', 'wilab_subnets', '192.168.12.0/24', '-exist'],
+            ['ipset', 'del', 'wilab_subnets', '192.168.11.0/24', '-exist'],
+        ]
+        calls = [c[0][0] for c in mock_iptables.call_args_list if c[0][0][0] != '-C']
+        # Chain, its DROP and the FORWARD jump once; then one rule per subnet
+        assert calls[0] == ['-N', 'WILAB-ISO']
+        assert calls[1][:4] == ['-A', 'WILAB-ISO', '-j', 'DROP']
+        assert calls[2][:2] == ['-A', 'FORWARD']
+        assert calls[2].count('--match-set') == 2
+        assert [(c[0], c[3]) for c in calls[3:]] == [
+            ('-I', '192.168.10.0/24'),
+            ('-I', '192.168.11.0/24'),
+            ('-I', '192.168.12.0/24'),
+            ('-D', '192.168.11.0/24'),
+        ]
+        assert mock_restore.call_count == 0
+        assert manager.get_active_subnets() == ['192.168.10.0/24', '192.168.12.0/24']
+    
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_command')
+    def test_existing_rule_not_duplicated(self, mock_command, mock_iptables):
+        """Test rules left by a previous run are not appended again."""
+        def fake_iptables(args):
+            if args[0] == '-N':
+                raise CommandError("chain exists", 1)
+            return ""
+        mock_iptables.side_effect = fake_iptables
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        
+        actions = [c[0][0][0] for c in mock_iptables.call_args_list]
+        assert actions == ['-N', '-C', '-C', '-C']
+    
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_command')
+    def test_same_subnet_traffic_returned(self, mock_command, mock_iptables):
+        """Test traffic within a subnet is exempted before the subnet joins the set."""
+        order = []
+        mock_iptables.side_effect = lambda args: order.append(args) or ""
+        mock_command.side_effect = lambda args: order.append(args) or ""
+        manager = IsolationManager()
+        order.clear()
+        manager._ipset_enabled = True
+        manager.add_network('192.168.10.0/24')
+        
+        ret = next(a for a in order if a[0] == '-C')[1:]
+        assert ret[:7] == ['WILAB-ISO', '-s', '192.168.10.0/24', '-d', '192.168.10.0/24', '-j', 'RETURN']
+        assert order[-1] == ['ipset', 'add', 'wilab_subnets', '192.168.10.0/24', '-exist']
+    
+    @patch('wilab.network.isolation.execute_iptables_restore')
+    @patch('wilab.network.isolation.execute_iptables')
+    @patch('wilab.network.isolation.execute_command')
+    def test_setup_failure_falls_back_to_pairwise(self, mock_command, mock_iptables, mock_restore):
+        """Test a failing ipset setup switches to pairwise rules."""
+        mock_command.side_effect = CommandError("ipset: kernel module missing", 1)
+        
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        manager.add_network('192.168.11.0/24')
+        
+        assert mock_command.call_count == 1
+        assert mock_restore.call_count == 1
+        assert len(mock_restore.call_args[0][0]["filter"]) == 2
+    
+    def test_last_removal_leaves_no_wilab_rules(self, monkeypatch):
+        """Test removing the last subnet tears down the jump, chain and set."""
+        from wilab.network import isolation, safety
+        chains = {'FORWARD': []}
+        ipsets = set()
+        
+        def fake_iptables(args):
+            action, chain, rule = args[0], args[1], ' '.join(args[2:])
+            if action == '-N':
+                if chain in chains:
+                    raise CommandError("chain exists", 1)
+                chains[chain] = []
+            elif action == '-C' and rule not in chains[chain]:
+                raise CommandError("no rule", 1)
+            elif action == '-A':
+                chains[chain].append(rule)
+            elif action == '-I':
+                chains[chain].insert(0, rule)
+            elif action == '-D':
+                chains[chain].remove(rule)
+            elif action == '-F':
+                chains[chain].clear()
+            elif action == '-X':
+                del chains[chain]
+            return ""
+        
+        def fake_command(cmd):
+            if cmd[0] == 'ipset':
+                if cmd[1] == 'create':
+                    ipsets.add(cmd[2])
+                elif cmd[1] == 'destroy':
+                    ipsets.discard(cmd[2])
+                return ""
+            lines = ['*filter']
+            for chain, rules in chains.items():
+                lines += [f"-A {chain} {rule}" for rule in rules]
+            return '\n'.join(lines + ['COMMIT'])
+        
+        monkeypatch.setattr(isolation, 'execute_iptables', fake_iptables)
+        monkeypatch.setattr(isolation, 'execute_command', fake_command)
+        monkeypatch.setattr(safety, 'execute_command', fake_command)
+        
+        manager = IsolationManager()
+        manager.add_network('192.168.10.0/24')
+        manager.add_network('192.168.11.0/24')
+        assert len(safety.list_wilab_rules()['forward']) == 4
+        manager.remove_network('192.168.10.0/24')
+        manager.remove_network('192.168.11.0/24')
+        
+        assert safety.list_wilab_rules() == {"nat": [], "forward": []}
+        assert chains == {'FORWARD': []}
+        assert ipsets == set()
+        assert manager._ipset_enabled is None
@@ -5,6 +5,12 @@ from wilab.network.nat import NatManager
 from wilab.network.commands import CommandError
 
 
+@pytest.fixture(autouse=True)
+def no_proc_route(monkeypatch, tmp_path):
+    """Hide the host routing table so discovery goes through the mocked `ip route`."""
+    monkeypatch.setattr("wilab.network.nat.PROC_NET_ROUTE", str(tmp_path / "missing-route"))
+
+
 class TestNatManagerInit:
     """Tests for NAT manager initialization."""
     
@@ -82,6 +88,44 @@ class TestUpstreamDiscovery:
             nat._discover_upstream_interface()
 
 
+class TestProcRouteDiscovery:
+    """Tests for reading the default route from /proc/net/route."""
+    
+    ROUTE_TABLE = (
+        "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+        "wlan9\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+        "eth0\t00000000\t0100000A\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+        "eth0\t0000000A\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n"
+    )
+    
+    def test_lowest_metric_default_route_without_spawn(self, monkeypatch, tmp_path):
+        """Test the default route is read from /proc without running `ip`."""
+        route_file = tmp_path / "route"
+        route_file.write_text(self.ROUTE_TABLE)
+        monkeypatch.setattr("wilab.network.nat.PROC_NET_ROUTE", str(route_file))
+        
+        def fail(cmd):
+            raise AssertionError("ip route should not be spawned")
+        monkeypatch.setattr("wilab.network.nat.execute_command", fail)
+        
+        nat = NatManager(upstream_interface="auto")
+        assert nat._discover_upstream_interface() == "eth0"
+        assert nat._resolved_upstream == "eth0"
+    
+    def test_no_default_route_falls_back(self, monkeypatch, tmp_path):
+        """Test a table without a default route falls back to `ip route`."""
+        route_file = tmp_path / "route"
+        route_file.write_text(self.ROUTE_TABLE.splitlines(keepends=True)[0])
+        monkeypatch.setattr("wilab.network.nat.PROC_NET_ROUTE", str(route_file))
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            lambda cmd: "default via 10.0.0.1 dev eth1"
+        )
+        
+        nat = NatManager(upstream_interface="auto")
+        assert nat._discover_upstream_interface() == "eth1"
+
+
 class TestGetUpstreamInterface:
     """Tests for getting upstream interface."""
     
@@ -148,19 +192,48 @@ class TestIpForwarding:
         assert called_with == [("net.ipv4.ip_forward", "0")]
 
 
+# Table dumps after Wi-Lab has set up its chains, as printed by `iptables -S`
+FILTER_WITH_CHAINS = (
+    "-P INPUT ACCEPT\n"
+    "-P FORWARD ACCEPT\n"
+    "-P OUTPUT ACCEPT\n"
+    "-N WILAB-FWD\n"
+    "-A FORWARD -j WILAB-FWD\n"
+)
+NAT_WITH_CHAINS = (
+    "-P PREROUTING ACCEPT\n"
+    "-P POSTROUTING ACCEPT\n"
+    "-N WILAB-NAT\n"
+    "-A POSTROUTING -j WILAB-NAT\n"
+)
+
+
+def mock_table_dumps(filter_dump, nat_dump, calls=None):
+    """Return an execute_command mock serving `iptables -t <table> -S` dumps."""
+    def mock_execute_command(cmd):
+        if calls is not None:
+            calls.append(cmd)
+        return nat_dump if "nat" in cmd else filter_dump
+    return mock_execute_command
+
+
 class TestEnableNat:
     """Tests for enabling NAT."""
     
     def test_enable_nat_success(self, monkeypatch):
-        """Test enabling NAT with all rules."""
+        """Test enabling NAT installs all rules in one batch."""
         nat = NatManager(upstream_interface="eth0")
         
-        iptables_calls = []
+        restore_calls = []
         sysctl_calls = []
         
         monkeypatch.setattr(
-            "wilab.network.nat.execute_iptables",
-            lambda args: iptables_calls.append(args)
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(FILTER_WITH_CHAINS, NAT_WITH_CHAINS)
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
         )
         def mock_sysctl(key, value=None):
             sysctl_calls.append((key, value))
@@ -172,53 +245,162 @@ class TestEnableNat:
         # Check IP forwarding was enabled
         assert sysctl_calls == [("net.ipv4.ip_forward", "1")]
         
-        # Check iptables rules (accept 3 or 4 if protection rule added)
-        assert len(iptables_calls) >= 3
-        
-        # Verify MASQUERADE rule exists (may not be first if protection rule added)
-        masquerade_rule = [
-            "-t", "nat", "-A", "POSTROUTING",
-            "-o", "eth0", "-j", "MASQUERADE",
-            "-m", "comment", "--comment", "wilab-nat-test-net"
+        # All rules go through a single iptables-restore run
+        assert len(restore_calls) == 1
+        tables = restore_calls[0]
+        assert tables["nat"] == [
+            "-A WILAB-NAT -o eth0 -j MASQUERADE -m comment --comment wilab-nat-test-net"
         ]
-        assert masquerade_rule in iptables_calls
+        assert tables["filter"] == [
+            "-A WILAB-FWD -i wlan0 -o eth0 -j ACCEPT -m comment --comment wilab-forward-test-net",
+            (
+                "-A WILAB-FWD -i eth0 -o wlan0 -m state --state RELATED,ESTABLISHED -j ACCEPT "
+                "-m comment --comment wilab-forward-test-net"
+            ),
+        ]
+    
+    def test_enable_nat_creates_chains_and_jumps(self, monkeypatch):
+        """Test the Wi-Lab chains and their jumps are created on first use."""
+        nat = NatManager(upstream_interface="eth0")
         
-        # Verify forward rules exist
-        forward_in = [
-            "-A", "FORWARD", "-i", "wlan0", "-o", "eth0", "-j", "ACCEPT",
-            "-m", "comment", "--comment", "wilab-forward-test-net"
+        restore_calls = []
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps("-P FORWARD ACCEPT\n", "-P POSTROUTING ACCEPT\n")
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: "")
+        
+        nat.enable_nat("wlan0", "test-net")
+        
+        tables = restore_calls[0]
+        assert tables["nat"][:2] == [":WILAB-NAT - [0:0]", "-I POSTROUTING 1 -j WILAB-NAT"]
+        assert tables["filter"][:2] == [":WILAB-FWD - [0:0]", "-I FORWARD 1 -j WILAB-FWD"]
+        assert len(tables["filter"]) == 4
+    
+    def test_enable_nat_unlisted_table_skips_chain_setup(self, monkeypatch):
+        """Test chains are not redeclared (and so flushed) when listing fails."""
+        nat = NatManager(upstream_interface="eth0")
+        
+        restore_calls = []
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            lambda cmd: (_ for _ in ()).throw(CommandError("no permission"))
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: "")
+        
+        nat.enable_nat("wlan0", "test-net")
+        
+        assert not any(":WILAB" in rule for rule in restore_calls[0]["filter"] + restore_calls[0]["nat"])
+    
+    def test_enable_nat_skips_existing_rules(self, monkeypatch):
+        """Test that rules already present are not installed again."""
+        nat = NatManager(upstream_interface="eth0")
+        
+        restore_calls = []
+        filter_dump = FILTER_WITH_CHAINS + (
+            "-A WILAB-FWD -i wlan0 -o eth0 -m comment --comment wilab-forward-test-net -j ACCEPT\n"
+            "-A WILAB-FWD -i eth0 -o wlan0 -m state --state RELATED,ESTABLISHED "
+            "-m comment --comment wilab-forward-test-net -j ACCEPT\n"
+        )
+        nat_dump = NAT_WITH_CHAINS + (
+            "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net -j MASQUERADE\n"
+        )
+        commands = []
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(filter_dump, nat_dump, commands)
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: "")
+        
+        nat.enable_nat("wlan0", "test-net")
+        
+        assert restore_calls == []
+        # One listing per table, no per-rule -C probes
+        assert commands == [
+            ["iptables", "-w", "-t", "filter", "-S"],
+            ["iptables", "-w", "-t", "nat", "-S"],
         ]
-        forward_out = [
-            "-A", "FORWARD", "-i", "eth0", "-o", "wlan0",
-            "-m", "state", "--state", "RELATED,ESTABLISHED", "-j", "ACCEPT",
-            "-m", "comment", "--comment", "wilab-forward-test-net"
+    
+    def test_enable_nat_adds_only_missing_direction(self, monkeypatch):
+        """Test rules sharing a comment are told apart by their interfaces."""
+        nat = NatManager(upstream_interface="eth0")
+        
+        restore_calls = []
+        filter_dump = FILTER_WITH_CHAINS + (
+            "-A WILAB-FWD -i wlan0 -o eth0 -m comment "
+            "--comment wilab-forward-test-net -j ACCEPT\n"
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(filter_dump, NAT_WITH_CHAINS)
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: "")
+        
+        nat.enable_nat("wlan0", "test-net")
+        
+        assert len(restore_calls[0]["nat"]) == 1
+        assert restore_calls[0]["filter"] == [
+            (
+                "-A WILAB-FWD -i eth0 -o wlan0 -m state --state RELATED,ESTABLISHED -j ACCEPT "
+                "-m comment --comment wilab-forward-test-net"
+            ),
         ]
-        assert forward_in in iptables_calls
-        assert forward_out in iptables_calls
+    
+    def test_enable_nat_protects_existing_when_policy_drop(self, monkeypatch):
+        """Test the protection rule is pinned first when FORWARD policy is DROP."""
+        nat = NatManager(upstream_interface="eth0")
+        
+        restore_calls = []
+        filter_dump = FILTER_WITH_CHAINS.replace("-P FORWARD ACCEPT", "-P FORWARD DROP")
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(filter_dump, NAT_WITH_CHAINS)
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: "")
+        
+        nat.enable_nat("wlan0", "test-net")
+        
+        assert restore_calls[0]["filter"][0].startswith("-I WILAB-FWD 1 -m conntrack")
     
     def test_enable_nat_auto_upstream(self, monkeypatch):
         """Test enabling NAT with auto upstream discovery."""
         nat = NatManager(upstream_interface="auto")
         
-        iptables_calls = []
+        restore_calls = []
         
-        # Mock upstream discovery - distinguish between ip route and iptables -C commands
+        # Mock upstream discovery - distinguish between ip route and iptables listings
         def mock_execute_command(cmd):
-            if isinstance(cmd, list) and len(cmd) > 1:
-                if cmd[1] == "route" or "route" in cmd:
-                    return "default via 10.0.0.1 dev eth1"
-                elif "-C" in cmd:
-                    # Rule check always returns "not found" (exception)
-                    raise Exception("Rule not found")
-            return "default via 10.0.0.1 dev eth1"
+            if cmd[0] == "ip":
+                return "default via 10.0.0.1 dev eth1"
+            return NAT_WITH_CHAINS if "nat" in cmd else FILTER_WITH_CHAINS
         
         monkeypatch.setattr(
             "wilab.network.nat.execute_command",
             mock_execute_command
         )
         monkeypatch.setattr(
-            "wilab.network.nat.execute_iptables",
-            lambda args: iptables_calls.append(args)
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
         )
         def mock_sysctl(key, value=None):
             return ""
@@ -227,21 +409,21 @@ class TestEnableNat:
         nat.enable_nat("wlan0", "test-net")
         
         # Check that eth1 was used
-        assert any("eth1" in str(call) for call in iptables_calls)
+        assert any("eth1" in str(call) for call in restore_calls)
     
     def test_enable_nat_iptables_failure(self, monkeypatch):
-        """Test error when iptables command fails."""
+        """Test error when iptables-restore fails."""
         nat = NatManager(upstream_interface="eth0")
         
-        call_count = 0
-        def mock_iptables(args):
-            nonlocal call_count
-            call_count += 1
-            if call_count == 1:
-                raise CommandError("iptables failed")
+        def mock_restore(tables):
+            raise CommandError("iptables-restore failed")
         
-        monkeypatch.setattr("wilab.network.nat.execute_iptables", mock_iptables)
-        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda args: None)
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(FILTER_WITH_CHAINS, NAT_WITH_CHAINS)
+        )
+        monkeypatch.setattr("wilab.network.nat.execute_iptables_restore", mock_restore)
+        monkeypatch.setattr("wilab.network.nat.execute_sysctl", lambda key, value=None: None)
         
         with pytest.raises(RuntimeError, match="Cannot enable NAT"):
             nat.enable_nat("wlan0", "test-net")
@@ -250,52 +432,78 @@ class TestEnableNat:
 class TestDisableNat:
     """Tests for disabling NAT."""
     
+    NAT_DUMP = NAT_WITH_CHAINS + (
+        "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net -j MASQUERADE\n"
+        "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net -j MASQUERADE\n"
+        "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net-2 -j MASQUERADE\n"
+    )
+    FORWARD_DUMP = FILTER_WITH_CHAINS + (
+        "-A FORWARD -s 10.0.0.0/8 -j DROP\n"
+        # Left in the built-in chain by an older version
+        "-A FORWARD -i wlan0 -o eth0 -m comment --comment wilab-forward-test-net -j ACCEPT\n"
+        "-A WILAB-FWD -i wlan0 -o eth0 -m comment --comment wilab-forward-test-net -j ACCEPT\n"
+        "-A WILAB-FWD -i eth0 -o wlan0 -m state --state RELATED,ESTABLISHED "
+        "-m comment --comment wilab-forward-test-net -j ACCEPT\n"
+    )
+    
     def test_disable_nat_success(self, monkeypatch):
-        """Test disabling NAT removes all rules."""
+        """Test disabling NAT removes all tagged rules in one batch."""
         nat = NatManager(upstream_interface="eth0")
         
-        iptables_calls = []
+        restore_calls = []
         monkeypatch.setattr(
-            "wilab.network.nat.execute_iptables",
-            lambda args: iptables_calls.append(args)
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(self.FORWARD_DUMP, self.NAT_DUMP)
+        )
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
         )
         
         nat.disable_nat("wlan0", "test-net")
         
-        # The implementation may issue multiple deletes to remove duplicates;
-        # assert that required rule deletions were attempted at least once.
-        def contains(items, call):
-            return all(item in call for item in items)
-
-        # MASQUERADE delete on POSTROUTING for upstream eth0 with net_id comment
-        assert any(
-            call[:4] == ["-t", "nat", "-D", "POSTROUTING"]
-            and contains(["-o", "eth0", "MASQUERADE", "wilab-nat-test-net"], call)
-            for call in iptables_calls
-        )
-
-        # FORWARD delete: wlan0 -> eth0 ACCEPT with net_id comment
-        assert any(
-            call[:2] == ["-D", "FORWARD"]
-            and contains(["-i", "wlan0", "-o", "eth0", "ACCEPT", "wilab-forward-test-net"], call)
-            for call in iptables_calls
+        assert len(restore_calls) == 1
+        tables = restore_calls[0]
+        # Duplicates and legacy rules are removed too; other networks' rules are left alone
+        assert tables["nat"] == [
+            "-D WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net -j MASQUERADE",
+            "-D WILAB-NAT -o eth0 -m comment --comment wilab-nat-test-net -j MASQUERADE",
+        ]
+        assert tables["filter"] == [
+            "-D FORWARD -i wlan0 -o eth0 -m comment --comment wilab-forward-test-net -j ACCEPT",
+            "-D WILAB-FWD -i wlan0 -o eth0 -m comment --comment wilab-forward-test-net -j ACCEPT",
+            (
+                "-D WILAB-FWD -i eth0 -o wlan0 -m state --state RELATED,ESTABLISHED "
+                "-m comment --comment wilab-forward-test-net -j ACCEPT"
+            ),
+        ]
+    
+    def test_disable_nat_nonexistent_rules(self, monkeypatch):
+        """Test that disabling NAT is a no-op when no tagged rules exist."""
+        nat = NatManager(upstream_interface="eth0")
+        
+        restore_calls = []
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_command",
+            mock_table_dumps(FILTER_WITH_CHAINS, NAT_WITH_CHAINS)
         )
-
-        # FORWARD delete: eth0 -> wlan0 RELATED,ESTABLISHED ACCEPT with net_id comment
-        assert any(
-            call[:2] == ["-D", "FORWARD"]
-            and contains(["-i", "eth0", "-o", "wlan0", "--state", "RELATED,ESTABLISHED", "ACCEPT", "wilab-forward-test-net"], call)
-            for call in iptables_calls
+        monkeypatch.setattr(
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
         )
+        
+        # Should not raise
+        nat.disable_nat("wlan0", "test-net")
+        assert restore_calls == []
     
-    def test_disable_nat_nonexistent_rules(self, monkeypatch):
-        """Test that disabling NAT doesn't fail if rules don't exist."""
+    def test_disable_nat_iptables_failure(self, monkeypatch):
+        """Test that iptables errors while disabling NAT are not raised."""
         nat = NatManager(upstream_interface="eth0")
         
-        def mock_iptables(args):
-            raise CommandError("iptables: Bad rule (does a matching rule exist in that chain?)")
+        def mock_fail(cmd):
+            raise CommandError("iptables: Permission denied")
         
-        monkeypatch.setattr("wilab.network.nat.execute_iptables", mock_iptables)
+        monkeypatch.setattr("wilab.network.nat.execute_command", mock_fail)
         
         # Should not raise
         nat.disable_nat("wlan0", "test-net")
@@ -305,17 +513,68 @@ class TestFlushRules:
     """Tests for flushing all rules."""
     
     def test_flush_all_rules(self, monkeypatch):
-        """Test flushing all NAT and FORWARD rules."""
+        """Test flushing empties only the Wi-Lab chains."""
         nat = NatManager()
         
-        iptables_calls = []
+        restore_calls = []
         monkeypatch.setattr(
-            "wilab.network.nat.execute_iptables",
-            lambda args: iptables_calls.append(args)
+            "wilab.network.nat.execute_iptables_restore",
+            lambda tables: restore_calls.append(tables)
         )
         
         nat.flush_all_rules()
         
-        assert len(iptables_calls) == 2
-        assert iptables_calls[0] == ["-t", "nat", "-F"]
-        assert iptables_calls[1] == ["-F", "FORWARD"]
+        assert restore_calls == [{"nat": ["-F WILAB-NAT"], "filter": ["-F WILAB-FWD"]}]
+
+
+class TestListWilabRules:
+    """Tests for the startup scan for leftover Wi-Lab rules."""
+    
+    SAVE_DUMP = (
+        "# Generated by iptables-save\n"
+        "*nat\n"
+        ":POSTROUTING ACCEPT [0:0]\n"
+        ":WILAB-NAT - [0:0]\n"
+        "-A POSTROUTING -j WILAB-NAT\n"
+        "-A POSTROUTING -o docker0 -j MASQUERADE\n"
+        "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-ap-01 -j MASQUERADE\n"
+        "COMMIT\n"
+        "*filter\n"
+        ":FORWARD ACCEPT [0:0]\n"
+        ":WILAB-FWD - [0:0]\n"
+        "-A FORWARD -j WILAB-FWD\n"
+        "-A FORWARD -s 192.168.10.0/24 -d 192.168.11.0/24 -m comment --comment wilab-isolation -j DROP\n"
+        "-A WILAB-FWD -i wlan0 -o eth0 -m comment --comment wilab-forward-ap-01 -j ACCEPT\n"
+        "COMMIT\n"
+    )
+    
+    def test_single_dump_covers_wilab_chains(self, monkeypatch):
+        """Test both tables come from one iptables-save run, including WILAB chains."""
+        from wilab.network import safety
+        calls = []
+        
+        def mock_execute_command(cmd):
+            calls.append(cmd)
+            return self.SAVE_DUMP
+        monkeypatch.setattr(safety, "execute_command", mock_execute_command)
+        
+        rules = safety.list_wilab_rules()
+        
+        assert calls == [["iptables-save"]]
+        assert rules["nat"] == [
+            "-A WILAB-NAT -o eth0 -m comment --comment wilab-nat-ap-01 -j MASQUERADE"
+        ]
+        assert rules["forward"] == [
+            "-A FORWARD -s 192.168.10.0/24 -d 192.168.11.0/24 -m comment --comment wilab-isolation -j DROP",
+            "-A WILAB-FWD -i wlan0 -o eth0 -m comment --comment wilab-forward-ap-01 -j ACCEPT",
+        ]
+    
+    def test_dump_failure_returns_empty(self, monkeypatch):
+        """Test a failing iptables-save yields empty lists instead of raising."""
+        from wilab.network import safety
+        monkeypatch.setattr(
+            safety, "execute_command",
+            lambda cmd: (_ for _ in ()).throw(CommandError("not permitted"))
+        )
+        
+        assert safety.list_wilab_rules() == {"nat": [], "forward": []}
@@ -1,9 +1,15 @@
+import os
 import pytest
 import time
+from typing import ClassVar, Dict
 from wilab.config import load_config, NetworkEntry
 from wilab.wifi.manager import NetworkManager, TxPowerMismatchError
 from wilab.models import NetworkCreateRequest
 from wilab.network.commands import CommandError
+from wilab.wifi import hostapd
+from wilab.wifi.hostapd import HostapdManager
+from wilab.wifi import interface
+from wilab.wifi.interface import InterfaceError, validate_interface_ap_mode
 
 
 class TestNetworkManagerInit:
@@ -82,6 +88,24 @@ class TestSubnetResolution:
         assert first == '192.168.120.0/24'
         assert second == '192.168.121.0/24'
 
+    def test_subnet_and_gateway_cached(self, monkeypatch):
+        """Subnet and .1 gateway are derived once per device_id."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        assert mgr._get_subnet_and_gateway('wls16') == ('192.168.120.0/24', '192.168.120.1')
+        monkeypatch.setattr(cfg, 'dhcp_base_network', '10.0.0.0/24')
+        assert mgr._get_subnet('wls16') == '192.168.120.0/24'
+
+    def test_reindex_after_networks_change(self):
+        """Networks added after construction resolve once re-indexed."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        cfg.networks.append(NetworkEntry(interface='wlan1', display_name='extra'))
+        with pytest.raises(ValueError, match="Unknown device_id"):
+            mgr._get_subnet('wlan1')
+        mgr._index_networks()
+        assert mgr._get_subnet('wlan1') == '192.168.121.0/24'
+
 
 class TestNetworkLifecycle:
     """Tests for network start/stop lifecycle."""
@@ -134,6 +158,70 @@ class TestNetworkLifecycle:
         assert status.band == '2.4ghz'
         assert status.subnet == '192.168.120.0/24'
         assert status.internet_enabled is True  # Default from config
+
+    def test_concurrent_start_of_same_device_refused(self, monkeypatch):
+        """Test a second start of a device still starting is refused, not raced."""
+        import threading
+        mgr = NetworkManager(load_config())
+        entered, release = threading.Event(), threading.Event()
+        
+        def blocking_dhcp_start(*args, **kwargs):
+            entered.set()
+            release.wait(timeout=2)
+            return {}
+        
+        monkeypatch.setattr(mgr.dhcp_server, 'start', blocking_dhcp_start)
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+        req = NetworkCreateRequest(ssid='TestAP', channel=6, encryption='open',
+                                   band='2.4ghz', tx_power_level=4)
+        
+        first = threading.Thread(target=mgr.start_network, args=('wls16', req))
+        first.start()
+        assert entered.wait(timeout=2)
+        try:
+            with pytest.raises(ValueError, match="already active"):
+                mgr.start_network('wls16', req)
+        finally:
+            release.set()
+            first.join(timeout=2)
+        assert mgr.active['wls16'].active is True
+        assert mgr._starting == set()
+    
+    def test_firewall_updates_hold_firewall_lock(self, monkeypatch):
+        """Test NAT and isolation updates on start run under the firewall lock."""
+        mgr = NetworkManager(load_config())
+        held = []
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.nat_manager, 'enable_nat',
+                            lambda *a: held.append(mgr._firewall_lock.locked()))
+        monkeypatch.setattr(mgr.isolation_manager, 'add_network',
+                            lambda *a: held.append(mgr._firewall_lock.locked()))
+        req = NetworkCreateRequest(ssid='TestAP', channel=6, encryption='open',
+                                   band='2.4ghz', tx_power_level=4, internet_enabled=True)
+        
+        mgr.start_network('wls16', req)
+        
+        assert held == [True, True]
+    
+    def test_start_network_assigns_gateway_in_one_call(self, monkeypatch):
+        """Test the gateway IP is set with a single idempotent `ip addr replace`."""
+        from wilab.network import commands
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+
+        ip_calls = []
+        monkeypatch.setattr(commands, 'execute_ip', lambda args: ip_calls.append(args) or '')
+
+        req = NetworkCreateRequest(
+            ssid='TestAP', channel=6, encryption='open', band='2.4ghz',
+            tx_power_level=4
+        )
+        mgr.start_network('wls16', req)
+
+        assert ip_calls == [['addr', 'replace', '192.168.120.1/24', 'dev', 'wls16']]
     
     def test_start_network_with_internet_disabled(self, monkeypatch):
         """Test starting network with internet disabled."""
@@ -188,6 +276,56 @@ class TestNetworkLifecycle:
         assert status.expires_in > 7100
         assert status.expires_in < 7300
     
+    def test_expiry_thread_stops_network_at_deadline(self, monkeypatch):
+        """The expiry thread wakes for a newly scheduled deadline and stops the network."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {'gateway': '192.168.10.1'})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+
+        req = NetworkCreateRequest(
+            ssid='TestAP',
+            channel=6,
+            encryption='wpa2',
+            password='testpass123',
+            band='2.4ghz',
+            tx_power_level=4,
+        )
+        mgr.start_network('wls16', req, expires_at_timestamp=time.time() + 0.3)
+        assert 'wls16' in mgr.active
+
+        deadline = time.time() + 3
+        while 'wls16' in mgr.active and time.time() < deadline:
+            time.sleep(0.05)
+        assert 'wls16' not in mgr.active
+        assert mgr._expiry_heap == []
+
+    def test_stale_expiry_entry_ignored(self, monkeypatch):
+        """A heap entry left by an earlier run does not stop the restarted network."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {'gateway': '192.168.10.1'})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+        stopped = []
+        monkeypatch.setattr(mgr, 'stop_network', stopped.append)
+
+        req = NetworkCreateRequest(
+            ssid='TestAP',
+            channel=6,
+            encryption='wpa2',
+            password='testpass123',
+            band='2.4ghz',
+            tx_power_level=4,
+        )
+        mgr.start_network('wls16', req, expires_at_timestamp=time.time() + 3600)
+        mgr._schedule_expiry('wls16', time.time() - 1)  # entry of a previous run
+
+        deadline = time.time() + 1
+        while mgr._expiry_heap and mgr._expiry_heap[0][0] < time.time() and time.time() < deadline:
+            time.sleep(0.05)
+        assert stopped == []
+        assert 'wls16' in mgr.active
+
     def test_stop_network(self, monkeypatch):
         """Test stopping a network."""
         cfg = load_config()
@@ -407,6 +545,102 @@ class TestClientList:
             assert hasattr(clients[0], 'ip')
 
 
+class TestLeaseFileCache:
+    """Tests for dnsmasq lease file parsing and caching."""
+
+    LEASES = (
+        "4102444800 AA:BB:CC:DD:EE:FF 192.168.120.10 client1 *\n"
+        "1000 11:22:33:44:55:66 192.168.120.11 client2 *\n"
+        "duid 00:01:00:01:2a:2b:2c:2d:00:11:22:33:44:55\n"
+    )
+
+    def test_read_leases_parses_all_entries(self, tmp_path):
+        """Every lease line is parsed, MACs lowercased, duid line skipped."""
+        lease_file = tmp_path / "leases.db"
+        lease_file.write_text(self.LEASES)
+        mgr = NetworkManager(load_config())
+        assert mgr._read_leases(str(lease_file)) == {
+            'aa:bb:cc:dd:ee:ff': ('192.168.120.10', 4102444800),
+            '11:22:33:44:55:66': ('192.168.120.11', 1000),
+        }
+
+    def test_read_leases_missing_file(self, tmp_path):
+        """A missing lease file yields no leases."""
+        mgr = NetworkManager(load_config())
+        assert mgr._read_leases(str(tmp_path / "absent.db")) == {}
+
+    def test_unchanged_file_is_not_reparsed(self, tmp_path, monkeypatch):
+        """Same mtime and size reuse the parsed leases without reading the file."""
+        lease_file = tmp_path / "leases.db"
+        lease_file.write_text(self.LEASES)
+        mgr = NetworkManager(load_config())
+        first = mgr._read_leases(str(lease_file))
+
+        import builtins
+        def fail_open(*args, **kwargs):
+            raise AssertionError("lease file re-read")
+        monkeypatch.setattr(builtins, 'open', fail_open)
+        assert mgr._read_leases(str(lease_file)) is first
+
+    def test_changed_file_is_reparsed(self, tmp_path):
+        """A rewritten lease file is parsed again."""
+        lease_file = tmp_path / "leases.db"
+        lease_file.write_text(self.LEASES)
+        mgr = NetworkManager(load_config())
+        mgr._read_leases(str(lease_file))
+        lease_file.write_text("4102444800 de:ad:be:ef:00:01 192.168.120.20 new *\n")
+        assert mgr._read_leases(str(lease_file)) == {
+            'de:ad:be:ef:00:01': ('192.168.120.20', 4102444800),
+        }
+
+    def test_list_clients_skips_expired_leases(self, tmp_path, monkeypatch):
+        """Only associated stations with an unexpired lease are reported."""
+        lease_file = tmp_path / "leases.db"
+        lease_file.write_text(self.LEASES)
+        mgr = NetworkManager(load_config())
+        mgr.dhcp_server._instances['wls16'] = {'lease_file': str(lease_file)}
+        monkeypatch.setattr(
+            'wilab.wifi.manager.execute_iw',
+            lambda args: "Station aa:bb:cc:dd:ee:ff (on wls16)\nStation 11:22:33:44:55:66 (on wls16)\n",
+        )
+        monkeypatch.setattr('wilab.wifi.manager.list_station_macs', lambda iface: None)
+        clients = mgr.list_clients('wls16')
+        assert [(c.mac, c.ip) for c in clients] == [('aa:bb:cc:dd:ee:ff', '192.168.120.10')]
+
+    def test_list_clients_uses_debugfs_stations(self, tmp_path, monkeypatch):
+        """Stations listed in debugfs are used without running iw."""
+        lease_file = tmp_path / "leases.db"
+        lease_file.write_text(self.LEASES)
+        mgr = NetworkManager(load_config())
+        mgr.dhcp_server._instances['wls16'] = {'lease_file': str(lease_file)}
+        monkeypatch.setattr('wilab.wifi.manager.list_station_macs', lambda iface: ['aa:bb:cc:dd:ee:ff'])
+
+        def fail_iw(args):
+            raise AssertionError("iw station dump was run")
+        monkeypatch.setattr('wilab.wifi.manager.execute_iw', fail_iw)
+
+        clients = mgr.list_clients('wls16')
+        assert [(c.mac, c.ip) for c in clients] == [('aa:bb:cc:dd:ee:ff', '192.168.120.10')]
+
+
+class TestStationDumpParsing:
+    """Tests for parsing associated stations from iw station dump."""
+
+    def test_station_macs_extracted(self):
+        """Only Station header lines yield MACs, lowercased, in order."""
+        from wilab.wifi.manager import _STATION_RE
+        output = (
+            "Station AA:BB:CC:DD:EE:FF (on wls16)\n"
+            "\tinactive time:\t100 ms\n"
+            "\tsignal:  \t-40 dBm\n"
+            "Station 11:22:33:44:55:66 (on wls16)\n"
+            "\trx bytes:\t1234\n"
+        )
+        assert [m.lower() for m in _STATION_RE.findall(output)] == [
+            'aa:bb:cc:dd:ee:ff', '11:22:33:44:55:66'
+        ]
+
+
 class TestNetworkSummary:
     """Tests for network summary information."""
 
@@ -457,6 +691,65 @@ class TestNetworkSummary:
         assert summary['clients_connected'] == 0
         assert summary['clients'] == []
 
+    def test_status_probe_reused_within_ttl(self, monkeypatch):
+        """Repeated status polls within the TTL do not re-run live probes."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.nat_manager, 'enable_nat', lambda *_args, **_kwargs: None)
+
+        calls = []
+        monkeypatch.setattr(mgr, 'list_clients', lambda device_id: calls.append(device_id) or [])
+
+        req = NetworkCreateRequest(
+            ssid='TestAP', channel=6, encryption='open', band='2.4ghz',
+            tx_power_level=4
+        )
+        mgr.start_network('wls16', req)
+        mgr.get_status('wls16')
+        mgr.get_summary('wls16')
+        assert calls == ['wls16']
+
+        mgr._status_refreshed_at['wls16'] -= mgr.STATUS_CACHE_TTL
+        mgr.get_status('wls16')
+        assert calls == ['wls16', 'wls16']
+
+    def test_status_probes_overlap(self, monkeypatch):
+        """The txpower read runs while the station dump is still in flight."""
+        import threading
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda *a, **kw: {})
+        monkeypatch.setattr(mgr.nat_manager, 'enable_nat', lambda *_args, **_kwargs: None)
+
+        txpower_started = threading.Event()
+
+        def fake_read_txpower(interface):
+            txpower_started.set()
+            return 20.0
+
+        def fake_list_clients(device_id):
+            # Only returns once the txpower probe has started in parallel
+            assert txpower_started.wait(timeout=2)
+            return []
+
+        req = NetworkCreateRequest(
+            ssid='TestAP', channel=6, encryption='open', band='2.4ghz',
+            tx_power_level=4
+        )
+        mgr.start_network('wls16', req)
+        monkeypatch.setattr(mgr, '_read_current_txpower', fake_read_txpower)
+        monkeypatch.setattr(mgr, 'list_clients', fake_list_clients)
+        monkeypatch.setattr(
+            mgr, '_get_channel_capabilities', lambda iface, ch: {"max_dbm": 20.0}
+        )
+
+        st = mgr.get_status('wls16')
+        assert st.tx_power.reported_dbm == 20.0
+        assert st.tx_power.reported_level == 4
+
 
 class TestShutdownAll:
     """Tests for shutting down all networks."""
@@ -491,6 +784,42 @@ class TestShutdownAll:
         mgr.shutdown_all()
         assert len(mgr.active) == 0
 
+    def test_shutdown_all_stops_networks_concurrently(self, monkeypatch):
+        """Every active network is stopped, overlapping the per-network waits."""
+        import threading
+        cfg = load_config()
+        cfg.networks.append(NetworkEntry(interface='wlan1', display_name='extra'))
+        mgr = NetworkManager(cfg)
+        mgr.active = {'wls16': object(), 'wlan1': object()}
+
+        barrier = threading.Barrier(2, timeout=2)
+        stopped = []
+
+        def fake_stop(device_id):
+            barrier.wait()  # only passes if both stops run at the same time
+            stopped.append(device_id)
+
+        monkeypatch.setattr(mgr, 'stop_network', fake_stop)
+        mgr.shutdown_all()
+        assert sorted(stopped) == ['wlan1', 'wls16']
+
+    def test_shutdown_all_continues_after_failure(self, monkeypatch):
+        """A failing stop is logged and does not prevent the others."""
+        cfg = load_config()
+        cfg.networks.append(NetworkEntry(interface='wlan1', display_name='extra'))
+        mgr = NetworkManager(cfg)
+        mgr.active = {'wls16': object(), 'wlan1': object()}
+        stopped = []
+
+        def fake_stop(device_id):
+            if device_id == 'wls16':
+                raise RuntimeError("boom")
+            stopped.append(device_id)
+
+        monkeypatch.setattr(mgr, 'stop_network', fake_stop)
+        mgr.shutdown_all()
+        assert stopped == ['wlan1']
+
 
 class TestTxPower:
     """Tests for TX power level handling."""
@@ -617,3 +946,596 @@ class TestTxPower:
             mgr.set_tx_power_level('wls16', 2)
 
         assert mgr.active['wls16'].tx_power_level == 4
+
+    def test_set_tx_power_level_does_not_revive_stopped_network(self, monkeypatch):
+        """A network stopped while TX power is being verified stays stopped."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda **kwargs: {'gateway': '192.168.120.1'})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda **kwargs: {})
+        monkeypatch.setattr(mgr.nat_manager, 'enable_nat', lambda *a, **k: None)
+        monkeypatch.setattr(mgr.isolation_manager, 'add_network', lambda *a, **k: None)
+        monkeypatch.setattr(mgr, '_set_tx_power', lambda *a, **k: {})
+
+        req = NetworkCreateRequest(
+            ssid='TestAP', channel=6, encryption='open', band='2.4ghz', tx_power_level=4
+        )
+        mgr.start_network('wls16', req)
+
+        def stop_during_verify(*args, **kwargs):
+            mgr.stop_network('wls16')
+            return {}
+
+        monkeypatch.setattr(mgr, '_set_tx_power', stop_during_verify)
+        mgr.set_tx_power_level('wls16', 2)
+        assert 'wls16' not in mgr.active
+
+    def test_level_table(self):
+        """Levels split max power in quarters, at least 1 dBm and never decreasing."""
+        mgr = NetworkManager(load_config())
+        assert mgr._compute_level_dbm(20.0) == (0.0, 5.0, 10.0, 15.0, 20.0)
+        assert mgr._compute_level_dbm(2.0) == (0.0, 1.0, 1.0, 1.5, 2.0)
+        levels = mgr._compute_level_dbm(20.0)
+        assert mgr._levels_dict(levels) == {1: 5.0, 2: 10.0, 3: 15.0, 4: 20.0}
+        assert mgr._reported_level_from_dbm(levels, 11.0) == 2
+        assert mgr._reported_level_from_dbm(levels, None) is None
+
+    def test_verify_change_returns_once_reported(self, monkeypatch):
+        """Verification stops polling as soon as the requested level is reported."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr('wilab.wifi.manager.time.sleep', lambda s: None)
+        monkeypatch.setattr(mgr, '_get_channel_capabilities', lambda iface, ch: {'max_dbm': 20.0})
+        monkeypatch.setattr('wilab.wifi.manager.execute_iw', lambda args: '')
+        readings = iter([20.0, 10.0, 10.0])
+        reads = []
+
+        def fake_read(interface):
+            reads.append(interface)
+            return next(readings)
+
+        monkeypatch.setattr(mgr, '_read_current_txpower', fake_read)
+        info = mgr._set_tx_power('wls16', 2, 6, verify_change=True)
+        assert len(reads) == 2
+        assert info['tx_power']['reported_dbm'] == 10.0
+        assert info['tx_power']['reported_level'] == 2
+
+    def test_verify_change_mismatch_after_timeout(self, monkeypatch):
+        """A level never reported within the timeout raises TxPowerMismatchError."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+        monkeypatch.setattr(mgr, 'TX_POWER_VERIFY_TIMEOUT', 0.05)
+        monkeypatch.setattr(mgr, 'TX_POWER_VERIFY_INTERVAL', 0.01)
+        monkeypatch.setattr(mgr, '_get_channel_capabilities', lambda iface, ch: {'max_dbm': 20.0})
+        monkeypatch.setattr('wilab.wifi.manager.execute_iw', lambda args: '')
+        monkeypatch.setattr(mgr, '_read_current_txpower', lambda interface: 20.0)
+
+        with pytest.raises(TxPowerMismatchError):
+            mgr._set_tx_power('wls16', 2, 6, verify_change=True)
+
+    def test_tx_power_paths_skip_status_probes(self, monkeypatch):
+        """Setting or reading TX power does not re-run the client/txpower status probes."""
+        cfg = load_config()
+        mgr = NetworkManager(cfg)
+
+        monkeypatch.setattr(mgr.dhcp_server, 'start', lambda **kwargs: {'gateway': '192.168.120.1'})
+        monkeypatch.setattr(mgr.hostapd_manager, 'start', lambda **kwargs: {})
+        monkeypatch.setattr(mgr.nat_manager, 'enable_nat', lambda *a, **k: None)
+        monkeypatch.setattr(mgr.isolation_manager, 'add_network', lambda *a, **k: None)
+        monkeypatch.setattr(mgr, '_set_tx_power', lambda *a, **k: {})
+        monkeypatch.setattr(
+            mgr, '_get_channel_capabilities', lambda iface, ch: {'max_dbm': 20.0}
+        )
+
+        req = NetworkCreateRequest(
+            ssid='TestAP', channel=6, encryption='open', band='2.4ghz', tx_power_level=4
+        )
+        mgr.start_network('wls16', req)
+
+        probes = []
+        monkeypatch.setattr(mgr, 'list_clients', lambda device_id: probes.append('clients') or [])
+        monkeypatch.setattr(mgr, '_read_current_txpower', lambda iface: probes.append('txpower') or 10.0)
+
+        mgr.set_tx_power_level('wls16', 2)
+        assert probes == []
+
+        info = mgr.get_tx_power_info('wls16')
+        assert probes == ['txpower']
+        assert info['tx_power']['reported_level'] == 2
+
+
+class TestNetworkCreateRequestValidation:
+    """Tests for cross-field validation of NetworkCreateRequest."""
+
+    def _req(self, **overrides):
+        data = {'ssid': 'TestAP', 'channel': 6, 'encryption': 'wpa2', 'password': 'testpass123',
+                'band': '2.4ghz', 'tx_power_level': 4}
+        data.update(overrides)
+        return NetworkCreateRequest(**data)
+
+    def test_valid_request(self):
+        assert self._req().channel == 6
+
+    def test_channel_must_match_band(self):
+        with pytest.raises(ValueError, match="not a valid WiFi channel for band 2.4ghz"):
+            self._req(channel=36)
+        assert self._req(channel=36, band='5ghz').channel == 36
+
+    def test_password_required_for_encrypted(self):
+        with pytest.raises(ValueError, match="Password required for wpa2"):
+            self._req(password=None)
+        assert self._req(encryption='open', password=None).password is None
+
+    def test_password_length_enforced(self):
+        with pytest.raises(ValueError, match="at least 8 characters"):
+            self._req(password='short')
+        with pytest.raises(ValueError, match="Password too long"):
+            self._req(password='x' * 64)
+
+
+class TestResponseModels:
+    """Tests for immutable response value models."""
+
+    def test_value_models_are_frozen(self):
+        from pydantic import ValidationError
+
+        from wilab.models import ClientInfo, NetworkTxPower
+
+        client = ClientInfo(mac='aa:bb:cc:dd:ee:ff', ip='192.168.120.10')
+        with pytest.raises(ValidationError):
+            client.ip = '192.168.120.11'
+        assert len({client, ClientInfo(mac='aa:bb:cc:dd:ee:ff', ip='192.168.120.10')}) == 1
+        with pytest.raises(ValidationError):
+            NetworkTxPower(requested_level=4).requested_level = 1
+
+
+@pytest.fixture
+def hostapd_env(monkeypatch, tmp_path):
+    """Point hostapd dirs at tmp_path and record every command run."""
+    config_dir = tmp_path / "conf"
+    pid_dir = tmp_path / "pids"
+    monkeypatch.setattr(hostapd, "HOSTAPD_CONFIG_DIR", str(config_dir))
+    monkeypatch.setattr(hostapd, "HOSTAPD_PID_DIR", str(pid_dir))
+    monkeypatch.setattr(hostapd.time, "sleep", lambda s: None)
+    from wilab.network import commands as commands_module
+    monkeypatch.setattr(commands_module, "_binary_paths", {})
+    monkeypatch.setattr(commands_module.shutil, "which", lambda name: f"/usr/sbin/{name}")
+    
+    calls = []
+    
+    def mock_execute_command(cmd, **kwargs):
+        calls.append(("cmd", cmd))
+        if cmd[0] == "/usr/sbin/hostapd":
+            with open(cmd[cmd.index("-P") + 1], "w") as f:
+                f.write("4242\n")
+        return ""
+    
+    def mock_ip_batch(commands):
+        calls.append(("ip-batch", commands))
+        return ""
+    
+    def mock_iw(args):
+        calls.append(("iw", args))
+        return ""
+    
+    monkeypatch.setattr(hostapd, "execute_command", mock_execute_command)
+    monkeypatch.setattr(hostapd, "execute_ip_batch", mock_ip_batch)
+    monkeypatch.setattr(hostapd, "execute_iw", mock_iw)
+    monkeypatch.setattr(
+        hostapd, "terminate_process", lambda pid, **kw: calls.append(("terminate", pid))
+    )
+    return calls
+
+
+class TestHostapdInterfacePreparation:
+    """Tests for the interface reset around hostapd start/stop."""
+    
+    def _start(self, mgr):
+        return mgr.start(
+            net_id="ap-01", interface="wlan0", ssid="lab", channel=6,
+            encryption="wpa2", password="secret123", hidden=False, band="2.4ghz",
+        )
+    
+    def test_start_prepares_interface_in_one_ip_run(self, hostapd_env):
+        """Test link down and address flush share a single ip batch."""
+        mgr = HostapdManager()
+        self._start(mgr)
+        
+        assert ("ip-batch", ["link set wlan0 down", "addr flush dev wlan0"]) in hostapd_env
+        assert ("iw", ["dev", "wlan0", "set", "type", "managed"]) in hostapd_env
+        assert not any(kind == "cmd" and cmd[0] == "ip" for kind, cmd in hostapd_env)
+    
+    def test_stop_resets_interface(self, hostapd_env):
+        """Test stop resets the interface with one ip batch plus iw and link up."""
+        mgr = HostapdManager()
+        self._start(mgr)
+        hostapd_env.clear()
+        
+        mgr.stop("ap-01")
+        
+        ip_batches = [c for kind, c in hostapd_env if kind == "ip-batch"]
+        assert ip_batches == [["link set wlan0 down", "addr flush dev wlan0"]]
+        assert ("cmd", ["ip", "link", "set", "wlan0", "up"]) in hostapd_env
+        assert not mgr.is_running("ap-01")
+
+
+class TestHostapdConfigFile:
+    """Tests for hostapd config writes on start."""
+    
+    START_ARGS: ClassVar[Dict[str, object]] = {
+        "net_id": "ap-01", "interface": "wlan0", "ssid": "lab", "channel": 6,
+        "encryption": "wpa2", "password": "secret123", "hidden": False, "band": "2.4ghz",
+    }
+    
+    def test_generate_config_mixed_wpa_layout(self, hostapd_env):
+        """Test the full generated config for a hidden 5 GHz WPA2/WPA3 network."""
+        config = HostapdManager()._generate_config(
+            "wlan0", "lab {net}", 36, "wpa2-wpa3", "p{w}d", True, "5ghz", "DE"
+        )
+        assert config == (
+            "# Wi-Lab hostapd config for wlan0\n"
+            "interface=wlan0\n"
+            "driver=nl80211\n"
+            "ssid=lab {net}\n"
+            "channel=36\n"
+            "hw_mode=a\n"
+            "ignore_broadcast_ssid=1\n"
+            "wpa=2\n"
+            "wpa_passphrase=p{w}d\n"
+            "wpa_key_mgmt=WPA-PSK\n"
+            "rsn_pairwise=CCMP\n"
+            "ieee80211w=2\n"
+            "wpa_key_mgmt=SAE\n"
+            "wpa_key_mgmt=WPA-PSK SAE\n"
+            "ieee80211w=1\n"
+            "country_code=DE\n"
+            "ieee80211n=1\n"
+            "wmm_enabled=1\n"
+        )
+    
+    def test_generate_config_open(self, hostapd_env):
+        """Test an open 2.4 GHz network has no security section."""
+        config = HostapdManager()._generate_config(
+            "wlan0", "lab", 6, "open", None, False, "2.4ghz"
+        )
+        assert "hw_mode=g\n" in config
+        assert "wpa" not in config
+        assert "ignore_broadcast_ssid" not in config
+    
+    def test_generate_config_requires_password(self, hostapd_env):
+        """Test WPA modes refuse to generate a config without a password."""
+        with pytest.raises(hostapd.HostapdError, match="Password required"):
+            HostapdManager()._generate_config(
+                "wlan0", "lab", 6, "wpa3", None, False, "2.4ghz"
+            )
+    
+    def test_config_written_private(self, hostapd_env):
+        """Test the config (which holds the passphrase) is written with mode 0600."""
+        mgr = HostapdManager()
+        info = mgr.start(**self.START_ARGS)
+        
+        with open(info["config_file"]) as f:
+            assert "wpa_passphrase=secret123\n" in f.read()
+        assert os.stat(info["config_file"]).st_mode & 0o777 == 0o600
+    
+    def test_repeated_start_is_noop(self, hostapd_env, monkeypatch):
+        """Test starting a running network again touches neither file nor process."""
+        mgr = HostapdManager()
+        first = mgr.start(**self.START_ARGS)
+        hostapd_env.clear()
+        monkeypatch.setattr(
+            hostapd, "write_file_atomic",
+            lambda path, content: pytest.fail("config rewritten")
+        )
+        monkeypatch.setattr(
+            mgr, "_generate_config", lambda *args: pytest.fail("config regenerated")
+        )
+        
+        assert mgr.start(**self.START_ARGS) is first
+        assert hostapd_env == []
+
+
+class TestHostapdProcessChecks:
+    """Tests for signalling hostapd without spawning kill."""
+    
+    START_ARGS = TestHostapdConfigFile.START_ARGS
+    
+    def test_stop_terminates_pid(self, hostapd_env):
+        """Test stop signals the pid from the pid file directly."""
+        mgr = HostapdManager()
+        mgr.start(**self.START_ARGS)
+        hostapd_env.clear()
+        
+        mgr.stop("ap-01")
+        
+        assert ("terminate", 4242) in hostapd_env
+        assert not any(kind == "cmd" and cmd[0] == "kill" for kind, cmd in hostapd_env)
+    
+    def test_is_running_uses_signal_zero(self, hostapd_env, monkeypatch):
+        """Test liveness is probed with os.kill(pid, 0)."""
+        mgr = HostapdManager()
+        mgr.start(**self.START_ARGS)
+        hostapd_env.clear()
+        signals = []
+        monkeypatch.setattr(hostapd.os, "kill", lambda pid, sig: signals.append((pid, sig)))
+        
+        assert mgr.is_running("ap-01") is True
+        assert signals == [(4242, 0)]
+        assert hostapd_env == []
+    
+    def test_is_running_dead_process(self, hostapd_env, monkeypatch):
+        """Test a pid that no longer exists is reported as not running."""
+        mgr = HostapdManager()
+        mgr.start(**self.START_ARGS)
+        
+        def no_such_process(pid, sig):
+            raise ProcessLookupError()
+        monkeypatch.setattr(hostapd.os, "kill", no_such_process)
+        
+        assert mgr.is_running("ap-01") is False
+    
+    def test_start_waits_for_late_pid_file(self, hostapd_env, monkeypatch):
+        """Test start polls until the daemonized hostapd writes its pid file."""
+        pid_file = os.path.join(hostapd.HOSTAPD_PID_DIR, "hostapd-ap-01.pid")
+        polls = []
+        
+        def fake_sleep(seconds):
+            polls.append(seconds)
+            if len(polls) == 3:
+                with open(pid_file, "w") as f:
+                    f.write("4242\n")
+        
+        def hostapd_without_pid(cmd, **kwargs):
+            hostapd_env.append(("cmd", cmd))
+            return ""
+        
+        monkeypatch.setattr(hostapd.time, "sleep", fake_sleep)
+        monkeypatch.setattr(hostapd, "execute_command", hostapd_without_pid)
+        mgr = HostapdManager()
+        mgr.start(**self.START_ARGS)
+        
+        # Interface settle delay, then short polls instead of a fixed 0.5 s
+        assert polls[0] == 0.2
+        assert polls[1:] == [hostapd.PID_FILE_POLL_INTERVAL] * 2
+        assert [inst["net_id"] for inst in mgr.status()["instances"]] == ["ap-01"]
+    
+    def test_start_fails_without_pid_file(self, hostapd_env, monkeypatch):
+        """Test start gives up once the pid file timeout expires."""
+        monkeypatch.setattr(hostapd, "PID_FILE_TIMEOUT", 0.0)
+        monkeypatch.setattr(hostapd, "execute_command", lambda cmd, **kw: "")
+        mgr = HostapdManager()
+        
+        with pytest.raises(hostapd.HostapdError, match="pid file not created"):
+            mgr.start(**self.START_ARGS)
+
+
+class TestHostapdBinaryLookup:
+    """Tests for the hostapd PATH lookup."""
+    
+    def test_start_without_hostapd(self, hostapd_env, monkeypatch):
+        """Test start fails cleanly when hostapd is not installed."""
+        from wilab.network import commands as commands_module
+        monkeypatch.setattr(commands_module.shutil, "which", lambda name: None)
+        mgr = HostapdManager()
+        
+        with pytest.raises(hostapd.HostapdError, match="hostapd not installed"):
+            mgr.start(**TestHostapdConfigFile.START_ARGS)
+        assert not any(kind == "cmd" for kind, _ in hostapd_env)
+
+
+@pytest.fixture
+def fake_sysfs(monkeypatch, tmp_path):
+    """Fake /sys/class/net with a wireless wlan0 (on phy0) and a wired eth0."""
+    net = tmp_path / "class" / "net"
+    phy = tmp_path / "class" / "ieee80211" / "phy0"
+    phy.mkdir(parents=True)
+    (net / "wlan0").mkdir(parents=True)
+    (net / "wlan0" / "phy80211").symlink_to(phy)
+    (net / "eth0").mkdir()
+    monkeypatch.setattr(interface, "SYS_CLASS_NET", str(net))
+    monkeypatch.setattr(interface, "DEBUGFS_IEEE80211", str(tmp_path / "debug" / "ieee80211"))
+    interface.clear_interface_cache()
+    
+    calls = []
+    
+    def record(cmd, **kwargs):
+        calls.append(cmd)
+        return ""
+    monkeypatch.setattr(interface, "execute_command", record)
+    monkeypatch.setattr(interface, "execute_iw", lambda args: record(["iw", *args]))
+    return calls
+
+
+class TestInterfaceValidation:
+    """Tests for the sysfs-based interface checks."""
+    
+    def test_exists_without_spawn(self, fake_sysfs):
+        """Test existence is a sysfs lookup, not an ip process."""
+        assert interface.validate_interface_exists("eth0") is True
+        with pytest.raises(InterfaceError, match="does not exist"):
+            interface.validate_interface_exists("wlan9")
+        assert fake_sysfs == []
+    
+    def test_wireless_without_spawn(self, fake_sysfs):
+        """Test only devices with a phy80211 link count as wireless."""
+        assert interface.validate_interface_wireless("wlan0") is True
+        with pytest.raises(InterfaceError, match="not wireless-capable"):
+            interface.validate_interface_wireless("eth0")
+        assert fake_sysfs == []
+    
+    def test_path_like_names_rejected(self, fake_sysfs):
+        """Test names that would escape the interface directory are refused."""
+        for name in ("..", "wlan0/phy80211", ""):
+            with pytest.raises(InterfaceError):
+                interface.validate_interface_exists(name)
+    
+    def test_falls_back_without_sysfs(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test ip/iw are used when sysfs is not mounted."""
+        monkeypatch.setattr(interface, "SYS_CLASS_NET", str(tmp_path / "missing"))
+        
+        # The mocked commands print nothing, so both checks come back negative
+        assert interface.validate_interface_exists("wlan0") is False
+        assert interface.validate_interface_wireless("wlan0") is False
+        
+        assert fake_sysfs == [["ip", "link", "show", "wlan0"], ["iw", "wlan0", "info"]]
+
+
+class TestWiphyLookup:
+    """Tests for resolving the wiphy of an interface."""
+    
+    def test_wiphy_from_sysfs(self, fake_sysfs):
+        """Test the wiphy is read from the phy80211 link without iw."""
+        assert interface.get_wiphy("wlan0") == "phy0"
+        assert fake_sysfs == []
+    
+    def test_wiphy_from_iw_without_sysfs(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test iw is asked when sysfs is not mounted."""
+        monkeypatch.setattr(interface, "SYS_CLASS_NET", str(tmp_path / "absent"))
+        monkeypatch.setattr(interface, "execute_iw", lambda args: "Interface wlan0\n\twiphy 2\n")
+        assert interface.get_wiphy("wlan0") == "phy2"
+    
+    def test_wiphy_unknown(self, fake_sysfs):
+        """Test an interface iw reports no wiphy for raises InterfaceError."""
+        with pytest.raises(InterfaceError, match="Cannot determine wiphy"):
+            interface.get_wiphy("eth0")
+
+
+class TestApModeCache:
+    """Tests for remembering confirmed AP-mode support per phy.
+    
+    conftest replaces interface.validate_interface_ap_mode, so these call
+    the real function imported at module load.
+    """
+    
+    IFACE_INFO = "Interface wlan0\n\twiphy 0\n\ttype managed\n"
+    PHY_INFO = "Wiphy phy0\n\tSupported interface modes:\n\t\t * managed\n\t\t * AP\n"
+    
+    def _mock_iw(self, monkeypatch, phy_info):
+        calls = []
+        
+        def mock_iw(args):
+            calls.append(args)
+            return phy_info if args[0].startswith("phy") else self.IFACE_INFO
+        monkeypatch.setattr(interface, "execute_iw", mock_iw)
+        return calls
+    
+    def test_success_cached(self, fake_sysfs, monkeypatch):
+        """Test a confirmed interface is not queried again."""
+        calls = self._mock_iw(monkeypatch, self.PHY_INFO)
+        
+        assert validate_interface_ap_mode("wlan0") is True
+        queried = len(calls)
+        assert validate_interface_ap_mode("wlan0") is True
+        assert len(calls) == queried
+        
+        interface.clear_interface_cache()
+        validate_interface_ap_mode("wlan0")
+        assert len(calls) == 2 * queried
+    
+    def test_failure_not_cached(self, fake_sysfs, monkeypatch):
+        """Test an interface without AP support is re-checked every time."""
+        calls = self._mock_iw(monkeypatch, "Wiphy phy0\n\t\t * managed\n")
+        
+        with pytest.raises(InterfaceError, match="does not support AP mode"):
+            validate_interface_ap_mode("wlan0")
+        queried = len(calls)
+        with pytest.raises(InterfaceError, match="does not support AP mode"):
+            validate_interface_ap_mode("wlan0")
+        assert len(calls) == 2 * queried
+    
+    def test_interfaces_on_same_phy_share_answer(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test a second interface on an already confirmed phy needs no query."""
+        (tmp_path / "class" / "net" / "wlan1").mkdir()
+        (tmp_path / "class" / "net" / "wlan1" / "phy80211").symlink_to(
+            tmp_path / "class" / "ieee80211" / "phy0"
+        )
+        calls = self._mock_iw(monkeypatch, self.PHY_INFO)
+        
+        validate_interface_ap_mode("wlan0")
+        validate_interface_ap_mode("wlan1")
+        
+        assert calls == [["phy0", "info"]]
+    
+    def test_replugged_adapter_rechecked(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test a new wiphy behind the same name invalidates the cached answer."""
+        calls = self._mock_iw(monkeypatch, self.PHY_INFO)
+        validate_interface_ap_mode("wlan0")
+        queried = len(calls)
+        
+        link = tmp_path / "class" / "net" / "wlan0" / "phy80211"
+        phy1 = tmp_path / "class" / "ieee80211" / "phy1"
+        phy1.mkdir()
+        link.unlink()
+        link.symlink_to(phy1)
+        
+        validate_interface_ap_mode("wlan0")
+        assert len(calls) == 2 * queried
+    
+    def test_single_iw_call_with_sysfs(self, fake_sysfs, monkeypatch):
+        """Test the wiphy comes from sysfs, leaving one iw query."""
+        calls = self._mock_iw(monkeypatch, self.PHY_INFO)
+        
+        validate_interface_ap_mode("wlan0")
+        
+        assert calls == [["phy0", "info"]]
+    
+    def test_wiphy_from_iw_without_sysfs(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test the interface info is still parsed when sysfs is unavailable."""
+        monkeypatch.setattr(interface, "SYS_CLASS_NET", str(tmp_path / "missing"))
+        calls = self._mock_iw(monkeypatch, self.PHY_INFO)
+        
+        assert validate_interface_ap_mode("wlan0") is True
+        assert calls == [["wlan0", "info"], ["phy0", "info"]]
+    
+    def test_ap_must_be_a_supported_mode(self, fake_sysfs, monkeypatch):
+        """Test "AP" elsewhere in the phy info (e.g. AP/VLAN, combinations) is not enough."""
+        self._mock_iw(monkeypatch, (
+            "Wiphy phy0\n"
+            "\tSupported interface modes:\n"
+            "\t\t * managed\n"
+            "\t\t * AP/VLAN\n"
+            "\tvalid interface combinations:\n"
+            "\t\t * #{ managed } <= 1, #{ AP } <= 1,\n"
+            "\tDevice supports APSD.\n"
+        ))
+        
+        with pytest.raises(InterfaceError, match="does not support AP mode"):
+            validate_interface_ap_mode("wlan0")
+    
+    def test_wireless_fallback_needs_wiphy_line(self, fake_sysfs, monkeypatch, tmp_path):
+        """Test the sysfs-less wireless check wants "wiphy N", not any "type" word."""
+        monkeypatch.setattr(interface, "SYS_CLASS_NET", str(tmp_path / "missing"))
+        self._mock_iw(monkeypatch, self.PHY_INFO)
+        assert interface.validate_interface_wireless("wlan0") is True
+        
+        monkeypatch.setattr(interface, "execute_iw", lambda args: "link/ether type bridge\n")
+        assert interface.validate_interface_wireless("br0") is False
+
+
+class TestStationListing:
+    """Tests for reading associated stations from mac80211 debugfs."""
+    
+    def test_stations_from_debugfs(self, fake_sysfs, tmp_path):
+        """Test station directories are returned as lowercase MACs."""
+        stations = tmp_path / "debug" / "ieee80211" / "phy0" / "netdev:wlan0" / "stations"
+        (stations / "AA:BB:CC:DD:EE:FF").mkdir(parents=True)
+        (stations / "11:22:33:44:55:66").mkdir()
+        assert sorted(interface.list_station_macs("wlan0")) == [
+            "11:22:33:44:55:66", "aa:bb:cc:dd:ee:ff"
+        ]
+        assert fake_sysfs == []
+    
+    def test_no_stations(self, fake_sysfs, tmp_path):
+        """Test an empty stations directory means no clients, not unavailable."""
+        stations = tmp_path / "debug" / "ieee80211" / "phy0" / "netdev:wlan0" / "stations"
+        stations.mkdir(parents=True)
+        assert interface.list_station_macs("wlan0") == []
+    
+    def test_unavailable_without_debugfs(self, fake_sysfs):
+        """Test None is returned when debugfs is not mounted."""
+        assert interface.list_station_macs("wlan0") is None
+    
+    def test_unavailable_for_non_wireless(self, fake_sysfs):
+        """Test None is returned for an interface without a wiphy."""
+        assert interface.list_station_macs("eth0") is None
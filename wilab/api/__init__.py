@@ -1,6 +1,10 @@
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 import logging
+import os
+import re
+import stat
 import threading
 
 from fastapi import FastAPI, Request
@@ -16,6 +20,43 @@ from ..wifi.channels import set_regulatory_domain
 
 logger = logging.getLogger(__name__)
 
+# Angular's application builder emits content-hashed bundles such as
+# ``main-2KJ7QWXE.js``; a changed file always gets a new name, so browsers
+# can keep them forever without revalidating.
+_HASHED_ASSET_RE = re.compile(r"-[A-Z0-9]{8,}\.(?:js|css|woff2?|ttf|png|svg)$")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_NO_CACHE_CONTROL = "no-cache"
+
+
+def _stat_frontend_file(path: str) -> Optional[os.stat_result]:
+    """Return the stat of a regular file under the frontend dir, or None.
+
+    Stat'ed on every request so a file rewritten in place is never served
+    with a stale size; the result is handed to FileResponse, which then
+    skips its own stat.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
+def _frontend_file_response(file_path: Path) -> Optional[FileResponse]:
+    """Build a FileResponse with cache headers suited to the asset type."""
+    stat_result = _stat_frontend_file(str(file_path))
+    if stat_result is None:
+        return None
+    if _HASHED_ASSET_RE.search(file_path.name):
+        cache_control = _IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = _NO_CACHE_CONTROL
+    return FileResponse(
+        file_path,
+        stat_result=stat_result,
+        headers={"Cache-Control": cache_control},
+    )
+
 
 def _candidate_frontend_paths() -> list[Path]:
     project_root = Path(__file__).resolve().parents[2]
@@ -30,9 +71,10 @@ def _candidate_frontend_paths() -> list[Path]:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: instantiate manager so background expiry runs
+    # Startup: instantiate manager so background expiry runs; keep the
+    # reference so shutdown does not go back through the dependency.
     cfg = get_config()
-    get_manager(cfg)
+    mgr = get_manager(cfg)
 
     # Set regulatory domain before populating channel cache
     set_regulatory_domain(cfg.country_code)
@@ -53,16 +95,16 @@ async def lifespan(app: FastAPI):
     )
     cache_thread.start()
 
-    yield
-
-    cache_thread.join(timeout=10)
-    # Shutdown: gracefully stop any active networks
     try:
-        mgr = get_manager(cfg)
-        mgr.shutdown_all()
-    except Exception:
-        # Ignore shutdown errors to not block app teardown
-        pass
+        yield
+    finally:
+        cache_thread.join(timeout=10)
+        # Shutdown: gracefully stop any active networks
+        try:
+            mgr.shutdown_all()
+        except Exception:
+            # Ignore shutdown errors to not block app teardown
+            pass
 
 
 def create_app() -> FastAPI:
@@ -104,9 +146,9 @@ def create_app() -> FastAPI:
     if frontend_path:
         @app.get("/", include_in_schema=False)
         async def serve_index():
-            index_path = frontend_path / "index.html"
-            if index_path.is_file():
-                return FileResponse(index_path)
+            response = _frontend_file_response(frontend_path / "index.html")
+            if response is not None:
+                return response
             return {"error": "Frontend index.html not found"}
 
         @app.get("/{full_path:path}", include_in_schema=False)
@@ -119,13 +161,13 @@ def create_app() -> FastAPI:
             ):
                 return None
 
-            file_path = frontend_path / full_path
-            if file_path.is_file():
-                return FileResponse(file_path)
+            response = _frontend_file_response(frontend_path / full_path)
+            if response is not None:
+                return response
 
-            index_path = frontend_path / "index.html"
-            if index_path.is_file():
-                return FileResponse(index_path)
+            response = _frontend_file_response(frontend_path / "index.html")
+            if response is not None:
+                return response
             return {"error": "Frontend not found"}
 
         logger.info(f"Frontend static files served from {frontend_path}")
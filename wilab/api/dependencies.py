@@ -1,3 +1,8 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
 from fastapi import Depends, HTTPException, Path
 from ..config import AppConfig, load_config
 from ..wifi.manager import NetworkManager
@@ -12,6 +17,14 @@ _reservation_manager: ReservationManager | None = None
 _channel_manager: ChannelManager | None = None
 _qos_manager: QosManager | None = None
 _qos_profile_manager: QosProfileManager | None = None
+_blocking_executor: ThreadPoolExecutor | None = None
+
+# Upper bound on concurrent blocking manager calls (iw/iptables/hostapd
+# shell-outs). iptables serializes on its own lock, so more threads only
+# add contention.
+BLOCKING_WORKERS = 8
+
+_T = TypeVar("_T")
 
 def get_config() -> AppConfig:
     global _config
@@ -59,9 +72,68 @@ def get_qos_profile_manager() -> QosProfileManager:
     return _qos_profile_manager
 
 
-def resolve_reservation(
+def get_blocking_executor() -> ThreadPoolExecutor:
+    global _blocking_executor
+    if _blocking_executor is None:
+        _blocking_executor = ThreadPoolExecutor(
+            max_workers=BLOCKING_WORKERS, thread_name_prefix="wilab-blocking"
+        )
+    return _blocking_executor
+
+
+async def run_blocking(func: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """Run a blocking manager call on the shared worker pool.
+
+    Manager methods shell out to system tools and may take seconds; running
+    them off the event loop keeps other requests responsive.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_blocking_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+# ---- Async dependency providers ----
+# FastAPI dispatches sync dependencies to the anyio thread pool on every
+# request. Routes depend on these async wrappers instead so resolving the
+# singletons stays on the event loop; the getters above remain the plain
+# sync entry points for startup code.
+
+async def provide_config() -> AppConfig:
+    return get_config()
+
+
+# The manager providers read the singleton directly once it exists instead
+# of depending on provide_config, so each request resolves one dependency
+# rather than two.
+
+async def provide_manager() -> NetworkManager:
+    if _manager is not None:
+        return _manager
+    return get_manager(get_config())
+
+
+async def provide_reservation_manager() -> ReservationManager:
+    if _reservation_manager is not None:
+        return _reservation_manager
+    return get_reservation_manager(get_config())
+
+
+async def provide_channel_manager() -> ChannelManager:
+    return get_channel_manager()
+
+
+async def provide_qos_manager() -> QosManager:
+    return get_qos_manager()
+
+
+async def provide_qos_profile_manager() -> QosProfileManager:
+    return get_qos_profile_manager()
+
+
+async def resolve_reservation(
     reservation_id: str = Path(..., description="Reservation token"),
-    mgr: ReservationManager = Depends(get_reservation_manager),
+    mgr: ReservationManager = Depends(provide_reservation_manager),
 ) -> Reservation:
     """Validate reservation_id and return the active Reservation.
 
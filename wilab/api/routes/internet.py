@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from ...reservation import Reservation
 from ...wifi.manager import NetworkManager
 from ...api.auth import require_token
-from ...api.dependencies import get_manager, resolve_reservation
+from ...api.dependencies import provide_manager, resolve_reservation, run_blocking
 
 router = APIRouter(prefix="/interface", tags=["Internet"])
 
@@ -29,7 +29,7 @@ router = APIRouter(prefix="/interface", tags=["Internet"])
 async def internet_enable(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Enable Internet access for connected WiFi clients via NAT forwarding.
@@ -37,8 +37,11 @@ async def internet_enable(
     Requires a valid reservation token.
     """
     device_id = reservation.device_id
+    if manager.internet_state(device_id) is True:
+        # Already in the requested state: skip the NAT round-trip
+        return {"detail": f"Network {device_id} internet enabled successfully"}
     try:
-        manager.enable_internet(device_id)
+        await run_blocking(manager.enable_internet, device_id)
         return {"detail": f"Network {device_id} internet enabled successfully"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -64,7 +67,7 @@ async def internet_enable(
 async def internet_disable(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Disable Internet access for connected WiFi clients (remove NAT forwarding).
@@ -72,8 +75,11 @@ async def internet_disable(
     Requires a valid reservation token.
     """
     device_id = reservation.device_id
+    if manager.internet_state(device_id) is False:
+        # Already in the requested state: skip the NAT round-trip
+        return {"detail": f"Network {device_id} internet disabled successfully"}
     try:
-        manager.disable_internet(device_id)
+        await run_blocking(manager.disable_internet, device_id)
         return {"detail": f"Network {device_id} internet disabled successfully"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
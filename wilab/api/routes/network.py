@@ -11,7 +11,7 @@ from ...reservation import Reservation
 from ...wifi.manager import NetworkManager
 from ...wifi.channels import ChannelManager
 from ...api.auth import require_token
-from ...api.dependencies import get_manager, get_channel_manager, resolve_reservation
+from ...api.dependencies import provide_manager, provide_channel_manager, resolve_reservation, run_blocking
 
 router = APIRouter(prefix="/interface", tags=["Network"])
 
@@ -70,8 +70,8 @@ async def start_network(
             },
         ],
     ),
-    manager: NetworkManager = Depends(get_manager),
-    channel_mgr: ChannelManager = Depends(get_channel_manager),
+    manager: NetworkManager = Depends(provide_manager),
+    channel_mgr: ChannelManager = Depends(provide_channel_manager),
 ):
     """
     Create and start a WiFi network in AP (access point) mode.
@@ -90,12 +90,14 @@ async def start_network(
 
     # Validate channel against real hardware capabilities
     try:
-        channel_mgr.validate_channel(device_id, req.channel, req.band)
+        await run_blocking(channel_mgr.validate_channel, device_id, req.channel, req.band)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
     try:
-        manager.start_network(device_id, req, expires_at_timestamp=reservation.expires_at)
+        await run_blocking(
+            manager.start_network, device_id, req, expires_at_timestamp=reservation.expires_at
+        )
         return {"detail": f"Network {device_id} created successfully"}
     except ValueError as e:
         error_msg = str(e)
@@ -126,7 +128,7 @@ async def start_network(
 async def stop_network(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Stop an active WiFi network and clean up all resources.
@@ -137,13 +139,13 @@ async def stop_network(
         dict: Confirmation with stopped device_id.
     """
     device_id = reservation.device_id
-    st = manager.get_status(device_id)
+    st = await run_blocking(manager.get_status, device_id)
     if not st:
         raise HTTPException(status_code=404, detail="Unknown device_id")
     if not st.active:
         raise HTTPException(status_code=409, detail=f"Network {device_id} is already inactive")
 
-    manager.stop_network(device_id)
+    await run_blocking(manager.stop_network, device_id)
     return {"detail": f"Network {device_id} stopped successfully"}
 
 
@@ -159,7 +161,7 @@ async def stop_network(
 async def get_network(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Get complete network configuration, status, DHCP info, and connected clients.
@@ -171,7 +173,7 @@ async def get_network(
             DHCP configuration, and list of connected clients.
     """
     device_id = reservation.device_id
-    st = manager.get_status(device_id)
+    st = await run_blocking(manager.get_status, device_id)
     if not st:
         raise HTTPException(status_code=404, detail="Unknown device_id")
     # Always inject reservation-derived expiry so clients see countdown
@@ -215,7 +217,7 @@ class AvailableChannelsResponse(BaseModel):
 async def get_available_channels(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    channel_mgr: ChannelManager = Depends(get_channel_manager),
+    channel_mgr: ChannelManager = Depends(provide_channel_manager),
 ):
     """
     List all WiFi channels supported by the reserved device, split by band.
@@ -226,7 +228,7 @@ async def get_available_channels(
     """
     device_id = reservation.device_id
     try:
-        info = channel_mgr.get_channels(device_id)
+        info = await run_blocking(channel_mgr.get_channels, device_id)
     except (ValueError, Exception) as exc:
         raise HTTPException(
             status_code=500,
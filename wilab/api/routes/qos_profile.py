@@ -16,10 +16,11 @@ from ...reservation import Reservation
 from ...wifi.manager import NetworkManager
 from ...api.auth import require_token
 from ...api.dependencies import (
-    get_manager,
-    get_qos_manager,
-    get_qos_profile_manager,
+    provide_manager,
+    provide_qos_manager,
+    provide_qos_profile_manager,
     resolve_reservation,
+    run_blocking,
 )
 
 # ---------------------------------------------------------------------------
@@ -36,7 +37,7 @@ catalogue_router = APIRouter(prefix="/qos", tags=["QoS Profiles"])
     description="Returns the full catalogue of QoS profiles shipped with wi-lab and any user-added profiles.",
 )
 async def list_profiles(
-    pm: QosProfileManager = Depends(get_qos_profile_manager),
+    pm: QosProfileManager = Depends(provide_qos_profile_manager),
 ):
     return pm.list_profiles()
 
@@ -48,9 +49,9 @@ async def list_profiles(
 reservation_router = APIRouter(prefix="/interface", tags=["QoS Profiles"])
 
 
-def _require_active_network(device_id: str, manager: NetworkManager) -> str:
+async def _require_active_network(device_id: str, manager: NetworkManager) -> str:
     """Return the physical interface name or raise 409."""
-    st = manager.get_status(device_id)
+    st = await run_blocking(manager.get_status, device_id)
     if st is None:
         raise HTTPException(status_code=404, detail="Unknown device_id")
     if not st.active:
@@ -114,12 +115,12 @@ async def start_profile(
     body: QosProfileStartRequest,
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
-    qos: QosManager = Depends(get_qos_manager),
-    pm: QosProfileManager = Depends(get_qos_profile_manager),
+    manager: NetworkManager = Depends(provide_manager),
+    qos: QosManager = Depends(provide_qos_manager),
+    pm: QosProfileManager = Depends(provide_qos_profile_manager),
 ):
     device_id = reservation.device_id
-    interface = _require_active_network(device_id, manager)
+    interface = await _require_active_network(device_id, manager)
 
     # Check for already-active profile
     if pm.is_active(interface):
@@ -163,11 +164,11 @@ async def start_profile(
 async def get_profile_state(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
-    pm: QosProfileManager = Depends(get_qos_profile_manager),
+    manager: NetworkManager = Depends(provide_manager),
+    pm: QosProfileManager = Depends(provide_qos_profile_manager),
 ):
     device_id = reservation.device_id
-    st = manager.get_status(device_id)
+    st = await run_blocking(manager.get_status, device_id)
     if st is None:
         raise HTTPException(status_code=404, detail="Unknown device_id")
     return _build_profile_state(st.interface, pm)
@@ -187,12 +188,12 @@ async def get_profile_state(
 async def stop_profile(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
-    qos: QosManager = Depends(get_qos_manager),
-    pm: QosProfileManager = Depends(get_qos_profile_manager),
+    manager: NetworkManager = Depends(provide_manager),
+    qos: QosManager = Depends(provide_qos_manager),
+    pm: QosProfileManager = Depends(provide_qos_profile_manager),
 ):
     device_id = reservation.device_id
-    st = manager.get_status(device_id)
+    st = await run_blocking(manager.get_status, device_id)
     if st is None:
         raise HTTPException(status_code=404, detail="Unknown device_id")
 
@@ -9,7 +9,7 @@ from fastapi import APIRouter, Depends, HTTPException, Path
 from pydantic import BaseModel, Field, field_validator
 
 from ...api.auth import require_token
-from ...api.dependencies import get_config, get_manager, get_reservation_manager
+from ...api.dependencies import provide_config, provide_manager, provide_reservation_manager, run_blocking
 from ...config import AppConfig
 from ...reservation import ReservationManager, NoDeviceAvailableError
 from ...wifi.manager import NetworkManager
@@ -66,8 +66,8 @@ def _display_name_for(device_id: str, config: AppConfig) -> str:
 )
 async def create_reservation(
     req: ReservationCreateRequest,
-    config: AppConfig = Depends(get_config),
-    mgr: ReservationManager = Depends(get_reservation_manager),
+    config: AppConfig = Depends(provide_config),
+    mgr: ReservationManager = Depends(provide_reservation_manager),
     _auth: bool = Depends(require_token),
 ):
     """Reserve the first available device for the given duration."""
@@ -133,8 +133,8 @@ def _build_response(r, config: AppConfig) -> ReservationResponse:
 )
 async def get_reservation(
     reservation_id: str = Path(...),
-    config: AppConfig = Depends(get_config),
-    mgr: ReservationManager = Depends(get_reservation_manager),
+    config: AppConfig = Depends(provide_config),
+    mgr: ReservationManager = Depends(provide_reservation_manager),
     _auth: bool = Depends(require_token),
 ):
     """Get current reservation status by token."""
@@ -155,8 +155,8 @@ async def get_reservation(
 )
 async def delete_reservation(
     reservation_id: str = Path(...),
-    mgr: ReservationManager = Depends(get_reservation_manager),
-    manager: NetworkManager = Depends(get_manager),
+    mgr: ReservationManager = Depends(provide_reservation_manager),
+    manager: NetworkManager = Depends(provide_manager),
     _auth: bool = Depends(require_token),
 ):
     """Release a reservation and free the device."""
@@ -170,7 +170,7 @@ async def delete_reservation(
     # Best-effort: stop any active network on the released device
     if reservation and reservation.device_id in manager.active:
         try:
-            manager.stop_network(reservation.device_id)
+            await run_blocking(manager.stop_network, reservation.device_id)
             logger.info("Network %s stopped on reservation release", reservation.device_id)
         except Exception:
             logger.exception("Failed to stop network %s on reservation release", reservation.device_id)
@@ -185,8 +185,8 @@ async def delete_reservation(
     },
 )
 async def delete_all_reservations(
-    mgr: ReservationManager = Depends(get_reservation_manager),
-    manager: NetworkManager = Depends(get_manager),
+    mgr: ReservationManager = Depends(provide_reservation_manager),
+    manager: NetworkManager = Depends(provide_manager),
     _auth: bool = Depends(require_token),
 ):
     """Release all active reservations at once."""
@@ -197,7 +197,7 @@ async def delete_all_reservations(
     for device_id in device_ids:
         if device_id in manager.active:
             try:
-                manager.stop_network(device_id)
+                await run_blocking(manager.stop_network, device_id)
                 logger.info("Network %s stopped on bulk reservation release", device_id)
             except Exception:
                 logger.exception("Failed to stop network %s on bulk reservation release", device_id)
@@ -6,9 +6,10 @@ from fastapi import APIRouter, Depends
 
 from ...wifi.manager import NetworkManager
 from ...reservation import ReservationManager
-from ...api.dependencies import get_config, get_manager, get_reservation_manager
+from ...api.dependencies import provide_config, provide_manager, provide_reservation_manager, run_blocking
 from ...api.auth import require_token
-from ...network.commands import execute_command, CommandError
+from ...api.responses import FastJSONResponse
+from ...network.commands import execute_ip_async, CommandError
 from ...version import __version__
 
 router = APIRouter(tags=["System"])
@@ -16,15 +17,16 @@ router = APIRouter(tags=["System"])
 
 @router.get(
     "/status",
+    response_class=FastJSONResponse,
     responses={
         200: {"description": "System status retrieved successfully"},
         401: {"description": "Unauthorized (missing or invalid auth token)"},
     },
 )
 async def system_status(
-    manager: NetworkManager = Depends(get_manager), 
-    config=Depends(get_config),
-    reservation_mgr: ReservationManager = Depends(get_reservation_manager),
+    manager: NetworkManager = Depends(provide_manager), 
+    config=Depends(provide_config),
+    reservation_mgr: ReservationManager = Depends(provide_reservation_manager),
     _: bool = Depends(require_token)
 ):
     """
@@ -55,7 +57,7 @@ async def system_status(
 
     # Check iptables NAT configuration
     try:
-        nat_status = manager.nat_manager.status()
+        nat_status = await run_blocking(manager.nat_manager.status)
         has_nat_rules = bool(
             nat_status.get("nat") and "MASQUERADE" in nat_status.get("nat", "")
         )
@@ -68,8 +70,8 @@ async def system_status(
 
     # Check upstream interface reachability
     try:
-        upstream = manager.nat_manager.get_upstream_interface()
-        ip_output = execute_command(["ip", "addr", "show", upstream])
+        upstream = await run_blocking(manager.nat_manager.get_upstream_interface)
+        ip_output = await execute_ip_async(["addr", "show", upstream])
         has_ip = "inet " in ip_output
         is_up = "state UP" in ip_output or "UP" in ip_output
         health_data["checks"]["upstream_interface"] = {
@@ -109,17 +111,16 @@ async def system_status(
         status_data["status"] = "ok" if all_ok else "degraded"
         status_data["active_networks"] = len(manager.active)
 
-    # Add networks with reservation info, checks, and rest of data
+    # Add networks with reservation info, checks, and rest of data.
+    # One snapshot of the reservations serves every network.
+    reservations = {r.device_id: r for r in reservation_mgr.all_active()}
     networks_info = []
     for n in config.networks:
         entry: dict = {"display_name": n.display_name, "interface": n.interface}
-        if reservation_mgr.is_device_reserved(n.device_id):
+        r = reservations.get(n.device_id)
+        if r is not None:
             entry["reserved"] = True
-            # Find the reservation for this device to report remaining time
-            for r in reservation_mgr.all_active():
-                if r.device_id == n.device_id:
-                    entry["reservation_remaining_seconds"] = r.expires_in  # None for unlimited
-                    break
+            entry["reservation_remaining_seconds"] = r.expires_in  # None for unlimited
         else:
             entry["reserved"] = False
             entry["reservation_remaining_seconds"] = None
@@ -136,15 +137,16 @@ async def system_status(
 
 @router.get(
     "/debug",
+    response_class=FastJSONResponse,
     responses={
         200: {"description": "Debug information retrieved successfully"},
         401: {"description": "Unauthorized (missing or invalid auth token)"},
     },
 )
 async def debug_info(
-    manager: NetworkManager = Depends(get_manager),
-    config=Depends(get_config),
-    reservation_mgr: ReservationManager = Depends(get_reservation_manager),
+    manager: NetworkManager = Depends(provide_manager),
+    config=Depends(provide_config),
+    reservation_mgr: ReservationManager = Depends(provide_reservation_manager),
     _: bool = Depends(require_token),
 ):
     """
@@ -168,7 +170,7 @@ async def debug_info(
     
     # Check iptables NAT
     try:
-        nat_status = manager.nat_manager.status()
+        nat_status = await run_blocking(manager.nat_manager.status)
         nat_configured = bool(
             nat_status.get("nat") and "MASQUERADE" in nat_status.get("nat", "")
         )
@@ -179,8 +181,8 @@ async def debug_info(
     
     # Check upstream interface
     try:
-        upstream = manager.nat_manager.get_upstream_interface()
-        ip_output = execute_command(["ip", "addr", "show", upstream])
+        upstream = await run_blocking(manager.nat_manager.get_upstream_interface)
+        ip_output = await execute_ip_async(["addr", "show", upstream])
         upstream_up = "state UP" in ip_output or "UP" in ip_output
         upstream_has_ip = "inet " in ip_output
         upstream_reachable = upstream_up and upstream_has_ip
@@ -204,7 +206,8 @@ async def debug_info(
         status = "ok" if all_ok else "degraded"
     
     # === GET DETAILED SERVICES INFO ===
-    services = manager.services_status()
+    services = await run_blocking(manager.services_status)
+    reservation_ids = {r.device_id: r.reservation_id for r in reservation_mgr.all_active()}
     
     debug_data = {
         "version": __version__,
@@ -242,11 +245,7 @@ async def debug_info(
                 {
                     "display_name": n.display_name,
                     "interface": n.interface,
-                    "reservation_id": next(
-                        (r.reservation_id for r in reservation_mgr.all_active()
-                         if r.device_id == n.device_id),
-                        None,
-                    ),
+                    "reservation_id": reservation_ids.get(n.device_id),
                 }
                 for n in config.networks
             ],
@@ -6,7 +6,7 @@ from ...models import TxPowerRequest, TxPowerInfo
 from ...reservation import Reservation
 from ...wifi.manager import NetworkManager, TxPowerMismatchError
 from ...api.auth import require_token
-from ...api.dependencies import get_manager, resolve_reservation
+from ...api.dependencies import provide_manager, resolve_reservation, run_blocking
 
 router = APIRouter(prefix="/interface", tags=["TX Power"])
 VALID_TX_POWER_LEVELS = (1, 2, 3, 4)
@@ -25,7 +25,7 @@ VALID_TX_POWER_LEVELS_TEXT = ", ".join(str(level) for level in VALID_TX_POWER_LE
 async def get_tx_power(
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Get current TX power details for an active network.
@@ -33,7 +33,7 @@ async def get_tx_power(
     Requires a valid reservation token.
     """
     try:
-        return manager.get_tx_power_info(reservation.device_id)
+        return await run_blocking(manager.get_tx_power_info, reservation.device_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -54,7 +54,7 @@ async def set_tx_power(
     req: TxPowerRequest,
     _auth: bool = Depends(require_token),
     reservation: Reservation = Depends(resolve_reservation),
-    manager: NetworkManager = Depends(get_manager),
+    manager: NetworkManager = Depends(provide_manager),
 ):
     """
     Set TX power level (1-4) for an active network.
@@ -68,7 +68,7 @@ async def set_tx_power(
         )
 
     try:
-        return manager.set_tx_power_level(reservation.device_id, req.level)
+        return await run_blocking(manager.set_tx_power_level, reservation.device_id, req.level)
     except TxPowerMismatchError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
@@ -1,10 +1,35 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Optional
 from ipaddress import IPv4Network
 import yaml
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # libyaml not available
+    from yaml import SafeLoader as _YamlLoader  # type: ignore[assignment]
 from pydantic import BaseModel, Field, ValidationError, field_validator
 
 
+@lru_cache(maxsize=16)
+def _parse_base_network(cidr: str) -> IPv4Network:
+    """Parse a dhcp_base_network CIDR once; validators share the result."""
+    return IPv4Network(cidr, strict=False)
+
+
+@lru_cache(maxsize=16)
+def _canonical_base_network(cidr: str) -> str:
+    """Validate a dhcp_base_network CIDR and return its canonical form."""
+    # Require valid IPv4 CIDR and /24 prefix for sequential allocation
+    try:
+        net = _parse_base_network(cidr)
+    except ValueError as e:
+        raise ValueError(f"Invalid dhcp_base_network: {e}") from e
+    if net.prefixlen != 24:
+        raise ValueError("dhcp_base_network must be a /24 network")
+    return str(net)
+
+
 class NetworkEntry(BaseModel):
     interface: str
     display_name: str
@@ -50,14 +75,7 @@ class AppConfig(BaseModel):
     @field_validator('dhcp_base_network')
     @classmethod
     def validate_dhcp_base_network(cls, v: str) -> str:
-        # Require valid IPv4 CIDR and /24 prefix for sequential allocation
-        try:
-            net = IPv4Network(v, strict=False)
-        except ValueError as e:
-            raise ValueError(f"Invalid dhcp_base_network: {e}") from e
-        if net.prefixlen != 24:
-            raise ValueError("dhcp_base_network must be a /24 network")
-        return str(net)
+        return _canonical_base_network(v)
 
     @field_validator('networks')
     @classmethod
@@ -66,8 +84,8 @@ class AppConfig(BaseModel):
         if 'dhcp_base_network' not in info.data:
             return v
         
-        base_net = IPv4Network(info.data['dhcp_base_network'], strict=False)
-        base_third_octet = int(str(base_net.network_address).split('.')[2])
+        base_net = _parse_base_network(info.data['dhcp_base_network'])
+        base_third_octet = base_net.network_address.packed[2]
         
         # Calculate max third octet for last network
         max_third = base_third_octet + len(v) - 1
@@ -90,7 +108,7 @@ def load_config(path: Optional[str] = None) -> AppConfig:
     cfg_path = path or os.environ.get('CONFIG_PATH') or os.path.join(os.getcwd(), 'config.yaml')
     try:
         with open(cfg_path, 'r', encoding='utf-8') as f:
-            raw = yaml.safe_load(f) or {}
+            raw = yaml.load(f, Loader=_YamlLoader) or {}
         config = AppConfig(**raw)
         
         # Validate interfaces at config load time
@@ -98,12 +116,21 @@ def load_config(path: Optional[str] = None) -> AppConfig:
         import logging
         logger = logging.getLogger(__name__)
         
-        for net in config.networks:
+        # Each check shells out to ip/iw; run them concurrently and report
+        # every failing interface at once.
+        def _check(net: NetworkEntry) -> Optional[str]:
             try:
                 validate_interface(net.interface)
             except InterfaceError as e:
                 logger.error(f"Interface validation failed for {net.device_id}: {e}")
-                raise SystemExit(f"Configuration error for {net.device_id}: {e}")
+                return f"Configuration error for {net.device_id}: {e}"
+            return None
+
+        if config.networks:
+            with ThreadPoolExecutor(max_workers=min(8, len(config.networks))) as ex:
+                errors = [e for e in ex.map(_check, config.networks) if e]
+            if errors:
+                raise SystemExit("\n".join(errors))
         
         return config
         
@@ -32,57 +32,42 @@ class NetworkCreateRequest(BaseModel):
         }
     )
 
-    @field_validator('channel')
-    @classmethod
-    def validate_channel_for_band(cls, v: int, info) -> int:
-        """Validate channel is appropriate for the band."""
-        if 'band' not in info.data:
-            return v
-        band = info.data['band']
-        if not is_valid_channel_for_band(v, band):
-            raise ValueError(f"Channel {v} is not a valid WiFi channel for band {band}")
-        return v
+    @model_validator(mode='after')
+    def _check_band_and_security(self) -> 'NetworkCreateRequest':
+        """Cross-field checks: channel vs band, password vs encryption."""
+        if not is_valid_channel_for_band(self.channel, self.band):
+            raise ValueError(f"Channel {self.channel} is not a valid WiFi channel for band {self.band}")
+
+        if self.encryption != 'open':
+            if self.password is None:
+                raise ValueError(f"Password required for {self.encryption} encryption")
+            # WPA/WPA2/WPA3 require 8-63 characters
+            if len(self.password) < 8:
+                raise ValueError(
+                    f"{self.encryption} requires password of at least 8 characters (got {len(self.password)})"
+                )
+            if len(self.password) > 63:
+                raise ValueError(f"Password too long (max 63 characters, got {len(self.password)})")
 
-    @field_validator('password')
-    @classmethod
-    def validate_password_length(cls, v: Optional[str], info) -> Optional[str]:
-        """Validate password length for WPA/WPA2/WPA3."""
-        if v is None:
-            return v
-        
-        if 'encryption' not in info.data:
-            return v
-        
-        encryption = info.data['encryption']
-        
-        # WPA/WPA2/WPA3 require minimum 8 characters
-        if encryption in ['wpa', 'wpa2', 'wpa3', 'wpa2-wpa3']:
-            if len(v) < 8:
-                raise ValueError(f"{encryption} requires password of at least 8 characters (got {len(v)})")
-            if len(v) > 63:
-                raise ValueError(f"Password too long (max 63 characters, got {len(v)})")
-        
-        return v
-    
-    @field_validator('encryption')
-    @classmethod
-    def validate_password_required(cls, v: str, info) -> str:
-        """Check that password is provided for encrypted networks."""
-        if v != 'open' and info.data.get('password') is None:
-            raise ValueError(f"Password required for {v} encryption")
-        return v
+        return self
 
 class ClientInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     mac: str
     ip: str
 
 
 class NetworkTxPower(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     requested_level: int = Field(..., ge=1, le=4, description="Requested TX power level 1-4")
     reported_level: Optional[int] = Field(None, ge=1, le=4, description="TX power level derived from reported_dbm")
     reported_dbm: Optional[float] = Field(None, description="TX power currently reported by interface in dBm")
 
 class NetworkStatus(BaseModel):
+    # Not frozen: the manager keeps one instance per active network and
+    # updates expiry, clients and TX power fields in place.
     interface: str
     active: bool
     ssid: Optional[str] = None
@@ -102,6 +87,8 @@ class NetworkStatus(BaseModel):
     clients: Optional[List[ClientInfo]] = Field(None, description="List of connected clients")
 
 class InterfaceStatus(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     interface: str
     active: bool
 
@@ -110,6 +97,8 @@ class TxPowerRequest(BaseModel):
 
 
 class TxPowerInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     interface: str
     max_dbm: float
     levels_dbm: dict
@@ -1,5 +1,20 @@
 from .dhcp import DhcpServer, DhcpServerError
-from .commands import CommandError, execute_command, execute_iptables, execute_ip, execute_sysctl
+from .commands import (
+    CommandError,
+    execute_command,
+    execute_command_async,
+    execute_iptables,
+    execute_iptables_restore,
+    execute_ip,
+    execute_ip_batch,
+    execute_ip_async,
+    execute_iptables_async,
+    execute_iw_async,
+    execute_sysctl,
+    execute_sysctl_async,
+    find_binary,
+    write_file_atomic,
+)
 from .nat import NatManager
 
 __all__ = [
@@ -8,7 +23,16 @@ __all__ = [
     "NatManager",
     "CommandError",
     "execute_command",
+    "execute_command_async",
     "execute_iptables",
+    "execute_iptables_restore",
     "execute_ip",
+    "execute_ip_batch",
+    "execute_ip_async",
+    "execute_iptables_async",
+    "execute_iw_async",
     "execute_sysctl",
+    "execute_sysctl_async",
+    "find_binary",
+    "write_file_atomic",
 ]
@@ -1,16 +1,53 @@
+import asyncio
+import os
+import select
+import shutil
+import signal
 import subprocess
+import tempfile
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+PROC_SYS_DIR = "/proc/sys"
+
 
 class CommandError(Exception):
     """Exception raised when shell command execution fails."""
     pass
 
 
-def execute_command(cmd: List[str], check: bool = True, timeout: float = 8.0) -> str:
+# Absolute paths of the tools run here, resolved once so each spawn execs the
+# binary directly instead of searching PATH. Only hits are stored, so a tool
+# installed while the service runs is still found.
+_binary_paths: Dict[str, str] = {}
+
+
+def find_binary(name: str) -> Optional[str]:
+    """Return the absolute path of a tool on PATH, or None if it is not installed."""
+    path = _binary_paths.get(name)
+    if path is None:
+        path = shutil.which(name)
+        if path is not None:
+            _binary_paths[name] = path
+    return path
+
+
+def _resolve_binary(name: str) -> str:
+    """Return the absolute path of a command, or the name itself if not on PATH."""
+    if os.sep in name:
+        return name
+    # A missing tool is exec'd by name, which fails with "Command not found"
+    return find_binary(name) or name
+
+
+def execute_command(
+    cmd: List[str],
+    check: bool = True,
+    timeout: float = 8.0,
+    input: Optional[str] = None,
+) -> str:
     """
     Execute a shell command safely.
     
@@ -18,6 +55,7 @@ def execute_command(cmd: List[str], check: bool = True, timeout: float = 8.0) ->
         cmd: List of command arguments
         check: Raise CommandError if return code is non-zero
         timeout: Command timeout in seconds (minimum enforced to 5)
+        input: Optional text piped to the command's stdin
         
     Returns:
         stdout as string
@@ -29,11 +67,12 @@ def execute_command(cmd: List[str], check: bool = True, timeout: float = 8.0) ->
         effective_timeout = max(5.0, timeout)
 
         result = subprocess.run(
-            cmd,
+            [_resolve_binary(cmd[0]), *cmd[1:]],
             capture_output=True,
             text=True,
             check=False,
-            timeout=effective_timeout
+            timeout=effective_timeout,
+            input=input,
         )
         
         if check and result.returncode != 0:
@@ -52,9 +91,92 @@ def execute_command(cmd: List[str], check: bool = True, timeout: float = 8.0) ->
         raise CommandError(f"Command not found: {cmd[0]}") from e
 
 
+async def execute_command_async(
+    cmd: List[str],
+    check: bool = True,
+    timeout: float = 8.0,
+    input: Optional[str] = None,
+) -> str:
+    """
+    Async twin of :func:`execute_command` for use inside the event loop.
+
+    The child process is awaited, so the loop keeps serving other requests
+    while the command runs instead of pinning a worker thread.
+
+    Args:
+        cmd: List of command arguments
+        check: Raise CommandError if return code is non-zero
+        timeout: Command timeout in seconds (minimum enforced to 5)
+        input: Optional text piped to the command's stdin
+
+    Returns:
+        stdout as string
+
+    Raises:
+        CommandError: If command fails and check=True
+    """
+    effective_timeout = max(5.0, timeout)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            _resolve_binary(cmd[0]),
+            *cmd[1:],
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError as e:
+        raise CommandError(f"Command not found: {cmd[0]}") from e
+
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            proc.communicate(input.encode() if input is not None else None),
+            timeout=effective_timeout,
+        )
+    except asyncio.TimeoutError as e:  # noqa: UP041 - not the builtin before 3.11
+        proc.kill()
+        await proc.wait()
+        raise CommandError(f"Command timed out: {' '.join(cmd)}") from e
+
+    out = stdout.decode(errors="replace")
+    err = stderr.decode(errors="replace")
+    if check and proc.returncode != 0:
+        logger.error(f"Command failed: {' '.join(cmd)}\nstderr: {err}")
+        raise CommandError(
+            f"Command '{cmd[0]}' failed with code {proc.returncode}: {err}"
+        )
+    return out
+
+
 def execute_iptables(args: List[str]) -> str:
-    """Execute iptables command."""
-    return execute_command(["iptables", *args])
+    """Execute iptables command, waiting for the xtables lock (``-w``)."""
+    return execute_command(["iptables", "-w", *args])
+
+
+def execute_iptables_restore(tables: Dict[str, List[str]]) -> str:
+    """
+    Apply several iptables rules in one ``iptables-restore --noflush`` run.
+
+    Each table is committed atomically, so a batch either applies fully or
+    leaves the table untouched. Existing rules are preserved (``--noflush``)
+    and ``-w`` waits for the xtables lock instead of failing when another
+    iptables process (e.g. a concurrent network start) holds it.
+
+    Args:
+        tables: Table name (e.g. "nat", "filter") -> rule lines in
+            iptables-save syntax (e.g. "-A FORWARD -i wlan0 -j ACCEPT")
+    """
+    lines: List[str] = []
+    for table, rules in tables.items():
+        if not rules:
+            continue
+        lines.append(f"*{table}")
+        lines.extend(rules)
+        lines.append("COMMIT")
+    if not lines:
+        return ""
+    return execute_command(
+        ["iptables-restore", "--noflush", "-w"], input="\n".join(lines) + "\n"
+    )
 
 
 def execute_ip(args: List[str]) -> str:
@@ -62,17 +184,99 @@ def execute_ip(args: List[str]) -> str:
     return execute_command(["ip", *args])
 
 
+def execute_ip_batch(commands: List[str]) -> str:
+    """
+    Run several ip commands in one ``ip -force -batch -`` process.
+    
+    ``-force`` keeps going past a failing line; the exit status is still
+    non-zero if any line failed and stderr names it ("Command failed -:N").
+    
+    Args:
+        commands: ip commands without the leading "ip"
+            (e.g. "link set wlan0 up")
+    """
+    if not commands:
+        return ""
+    return execute_command(
+        ["ip", "-force", "-batch", "-"], input="\n".join(commands) + "\n"
+    )
+
+
+def write_file_atomic(path: str, content: str) -> None:
+    """
+    Write content to path so readers only ever see the old or the new file.
+    
+    The content is encoded once and written to a temporary file in the same
+    directory (mode 0600) with os.write, looping until partial writes are
+    complete. The file is then flushed with fdatasync and renamed over the
+    target. Used for the dnsmasq and hostapd config files, which daemons may
+    read at any time.
+    """
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            data = memoryview(content.encode())
+            while data:
+                data = data[os.write(fd, data):]
+            os.fdatasync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+def _read_proc_sys(key: str) -> Optional[str]:
+    """Read a sysctl value straight from ``/proc/sys``, or None if not readable."""
+    try:
+        with open(os.path.join(PROC_SYS_DIR, *key.split(".")), "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_proc_sys(key: str, value: str) -> Optional[str]:
+    """
+    Write a sysctl value straight to ``/proc/sys``.
+    
+    Returns:
+        The ``sysctl -w`` style confirmation, or None if the entry is not
+        writable here (e.g. missing or not running as root)
+    """
+    try:
+        with open(os.path.join(PROC_SYS_DIR, *key.split(".")), "w") as f:
+            f.write(f"{value}\n")
+    except OSError:
+        return None
+    return f"{key} = {value}\n"
+
+
 def execute_sysctl(key: str, value: Optional[str] = None) -> str:
     """
     Execute sysctl command.
     
+    Reads and writes go straight to ``/proc/sys`` when the entry is
+    accessible and only fall back to the ``sysctl`` binary otherwise.
+    
     Args:
         key: sysctl key (e.g., "net.ipv4.ip_forward")
         value: Optional value to set. If None, reads current value.
     """
     if value is None:
+        read = _read_proc_sys(key)
+        if read is not None:
+            return read
         return execute_command(["sysctl", "-n", key])
     else:
+        written = _write_proc_sys(key, value)
+        if written is not None:
+            return written
         return execute_command(["sysctl", "-w", f"{key}={value}"])
 
 
@@ -85,6 +289,48 @@ def execute_pkill(pattern: str, signal: Optional[str] = None) -> str:
     return execute_command(cmd, check=False)
 
 
+def terminate_process(pid: int, timeout: float = 2.0) -> bool:
+    """
+    Send SIGTERM to a process and wait for it to exit, escalating to SIGKILL.
+    
+    Signals are delivered through a Linux pidfd, so no ``kill`` process is
+    spawned and the exit is awaited with poll() instead of sleeping. Where
+    pidfds are unavailable the ``kill`` binary is used instead.
+    
+    Args:
+        pid: Process id
+        timeout: Seconds to wait for exit after each signal
+        
+    Returns:
+        True if the process is known to have exited, False otherwise
+        (still running, or the ``kill`` fallback was used)
+    """
+    try:
+        fd = os.pidfd_open(pid)
+    except ProcessLookupError:
+        return True
+    except (AttributeError, OSError):
+        # Not Linux, kernel < 5.3, or not permitted
+        execute_command(["kill", str(pid)], check=False)
+        return False
+    
+    try:
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                signal.pidfd_send_signal(fd, sig)
+            except ProcessLookupError:
+                return True
+            # The pidfd becomes readable once the process has exited
+            if poller.poll(int(timeout * 1000)):
+                return True
+            logger.warning(f"Process {pid} still running after {sig.name}")
+        return False
+    finally:
+        os.close(fd)
+
+
 def execute_iw(args: List[str]) -> str:
     """Execute iw command (wireless tools)."""
     return execute_command(["iw", *args])
@@ -93,3 +339,31 @@ def execute_iw(args: List[str]) -> str:
 def execute_tc(args: List[str]) -> str:
     """Execute tc command (traffic control)."""
     return execute_command(["tc", *args])
+
+
+async def execute_iptables_async(args: List[str]) -> str:
+    """Execute iptables command without blocking the event loop."""
+    return await execute_command_async(["iptables", "-w", *args])
+
+
+async def execute_ip_async(args: List[str]) -> str:
+    """Execute ip command (iproute2) without blocking the event loop."""
+    return await execute_command_async(["ip", *args])
+
+
+async def execute_iw_async(args: List[str]) -> str:
+    """Execute iw command (wireless tools) without blocking the event loop."""
+    return await execute_command_async(["iw", *args])
+
+
+async def execute_sysctl_async(key: str, value: Optional[str] = None) -> str:
+    """Async twin of :func:`execute_sysctl`; ``/proc/sys`` I/O runs in a thread."""
+    if value is None:
+        read = await asyncio.to_thread(_read_proc_sys, key)
+        if read is not None:
+            return read
+        return await execute_command_async(["sysctl", "-n", key])
+    written = await asyncio.to_thread(_write_proc_sys, key, value)
+    if written is not None:
+        return written
+    return await execute_command_async(["sysctl", "-w", f"{key}={value}"])
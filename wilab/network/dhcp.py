@@ -1,8 +1,18 @@
+import hashlib
 import logging
 import os
-from typing import Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional, List, Set, Tuple
 from ipaddress import IPv4Network
-from .commands import execute_command, CommandError
+from .commands import (
+    execute_command,
+    execute_ip_batch,
+    find_binary,
+    terminate_process,
+    write_file_atomic,
+    CommandError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -10,12 +20,64 @@ logger = logging.getLogger(__name__)
 DNSMASQ_CONFIG_DIR = "/tmp/wilab-dnsmasq"
 DNSMASQ_PID_DIR = "/tmp/wilab-dnsmasq/pids"
 
+# Shared pool for the interface setup that start() overlaps with writing the
+# config file; threads only wait on the ip subprocess.
+_SETUP_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="wilab-dhcp")
+
+# dnsmasq config written for each interface. DNS is disabled (port=0) so the
+# instance is DHCP-only and cannot conflict on 127.0.0.1; no-resolv/no-poll
+# keep it away from /etc/resolv.conf and log-dhcp logs transactions for
+# debugging.
+_DNSMASQ_CONFIG_TEMPLATE = (
+    "# Wi-Lab dnsmasq config for {interface}\n"
+    "interface={interface}\n"
+    "bind-interfaces\n"
+    "listen-address={gateway}\n"
+    "dhcp-range={dhcp_range},255.255.255.0,12h\n"
+    "dhcp-option=option:router,{gateway}\n"
+    "dhcp-leasefile={lease_file}\n"
+    "dhcp-option=option:dns-server,{dns_server}\n"
+    "port=0\n"
+    "no-resolv\n"
+    "no-poll\n"
+    "log-dhcp\n"
+)
+
 
 class DhcpServerError(Exception):
     """Exception raised for DHCP server issues."""
     pass
 
 
+def _dnsmasq_available() -> bool:
+    """
+    Check whether dnsmasq is installed, without spawning a process.
+    
+    The lookup goes through the shared binary cache, so a hit is only paid
+    once while a missing dnsmasq is looked up again on the next start.
+    """
+    return find_binary("dnsmasq") is not None
+
+
+@lru_cache(maxsize=128)
+def _parse_subnet_cached(subnet: str) -> Tuple[str, str, str, int]:
+    """Memoized body of DhcpServer._parse_subnet (subnets come from static config)."""
+    net = IPv4Network(subnet, strict=False)
+    total = net.num_addresses
+    network_addr = str(net.network_address)
+    gateway_addr = str(net[1])  # .1 of the subnet
+    # Choose start/end safely for small subnets (e.g., /25) while preserving .250 for /24+
+    start_idx = 10 if total > 20 else 2
+    end_idx = min(total - 2, 250)
+    if end_idx <= start_idx:
+        end_idx = min(total - 2, start_idx + 5)
+    dhcp_start = str(net[start_idx])
+    dhcp_end = str(net[end_idx])
+    dhcp_range = f"{dhcp_start},{dhcp_end}"
+    
+    return network_addr, gateway_addr, dhcp_range, net.prefixlen
+
+
 class DhcpServer:
     """
     Manages dnsmasq DHCP server for WiFi AP networks.
@@ -25,6 +87,8 @@ class DhcpServer:
     def __init__(self):
         """Initialize DHCP server manager."""
         self._instances: dict[str, dict] = {}  # net_id -> {interface, subnet, config_file, gateway, pid_file}
+        # Digests of config contents that already passed `dnsmasq --test`
+        self._validated_configs: Set[str] = set()
         self._ensure_config_dir()
     
     def _ensure_config_dir(self) -> None:
@@ -35,31 +99,18 @@ class DhcpServer:
         except OSError as e:
             logger.warning(f"Could not create dnsmasq dir: {e}")
     
-    def _parse_subnet(self, subnet: str) -> Tuple[str, str, str]:
+    def _parse_subnet(self, subnet: str) -> Tuple[str, str, str, int]:
         """
-        Parse CIDR subnet into network, gateway, and DHCP range.
+        Parse CIDR subnet into network, gateway, DHCP range and prefix length.
         
         Args:
             subnet: CIDR notation (e.g., "192.168.10.0/24")
             
         Returns:
-            (network_addr, gateway_addr, dhcp_range_start-end)
+            (network_addr, gateway_addr, dhcp_range_start-end, prefix_len)
         """
         try:
-            net = IPv4Network(subnet, strict=False)
-            total = net.num_addresses
-            network_addr = str(net.network_address)
-            gateway_addr = str(net[1])  # .1 of the subnet
-            # Choose start/end safely for small subnets (e.g., /25) while preserving .250 for /24+
-            start_idx = 10 if total > 20 else 2
-            end_idx = min(total - 2, 250)
-            if end_idx <= start_idx:
-                end_idx = min(total - 2, start_idx + 5)
-            dhcp_start = str(net[start_idx])
-            dhcp_end = str(net[end_idx])
-            dhcp_range = f"{dhcp_start},{dhcp_end}"
-            
-            return network_addr, gateway_addr, dhcp_range
+            return _parse_subnet_cached(subnet)
         except ValueError as e:
             raise DhcpServerError(f"Invalid subnet {subnet}: {e}") from e
     
@@ -83,28 +134,14 @@ class DhcpServer:
         Returns:
             dnsmasq configuration as string
         """
-        config_lines = [
-            f"# Wi-Lab dnsmasq config for {interface}",
-            f"interface={interface}",
-            "bind-interfaces",
-            f"listen-address={gateway}",
-            f"dhcp-range={dhcp_range},255.255.255.0,12h",
-            f"dhcp-option=option:router,{gateway}",
-            f"dhcp-leasefile={lease_file}",
-        ]
-        
-        # DNS server configuration (always use explicit value from config)
-        config_lines.append(f"dhcp-option=option:dns-server,{dns_server}")
-        
-        # Minimal additional settings
-        config_lines.extend([
-            "port=0",    # Disable DNS server; DHCP-only to avoid 127.0.0.1 conflicts
-            "no-resolv",  # Don't read /etc/resolv.conf
-            "no-poll",    # Don't poll /etc/resolv.conf for changes
-            "log-dhcp",   # Log DHCP transactions for debugging
-        ])
-        
-        return "\n".join(config_lines) + "\n"
+        # DNS server always uses the explicit value from config
+        return _DNSMASQ_CONFIG_TEMPLATE.format(
+            interface=interface,
+            gateway=gateway,
+            dhcp_range=dhcp_range,
+            lease_file=lease_file,
+            dns_server=dns_server,
+        )
     
     def start(
         self,
@@ -134,46 +171,55 @@ class DhcpServer:
         
         try:
             # Parse subnet
-            network_addr, gateway_addr, dhcp_range = self._parse_subnet(subnet)
+            network_addr, gateway_addr, dhcp_range, prefix_len = self._parse_subnet(subnet)
             
             # Paths for pid and leases
             pid_file = os.path.join(DNSMASQ_PID_DIR, f"dnsmasq-{net_id}.pid")
             lease_file = os.path.join(DNSMASQ_CONFIG_DIR, f"leases-{net_id}.db")
             
-            # Generate config
-            config_content = self._generate_config(
-                interface,
-                gateway_addr,
-                dhcp_range,
-                lease_file,
-                dns_server
+            # Configure interface IP address (gateway) while the config is written
+            iface_future = _SETUP_EXECUTOR.submit(
+                self._configure_interface, interface, gateway_addr, prefix_len
             )
             
-            # Write config to file
-            config_file = os.path.join(DNSMASQ_CONFIG_DIR, f"dnsmasq-{net_id}.conf")
-            with open(config_file, "w") as f:
-                f.write(config_content)
-            
-            logger.info(f"Generated dnsmasq config at {config_file}")
-            
-            # Configure interface IP address (gateway)
-            self._configure_interface(interface, gateway_addr, subnet)
-            
-            # Ensure dnsmasq is available
             try:
-                execute_command(["dnsmasq", "--version"])
-            except CommandError:
+                # Generate config
+                config_content = self._generate_config(
+                    interface,
+                    gateway_addr,
+                    dhcp_range,
+                    lease_file,
+                    dns_server
+                )
+                
+                # Write config to file
+                config_file = os.path.join(DNSMASQ_CONFIG_DIR, f"dnsmasq-{net_id}.conf")
+                write_file_atomic(config_file, config_content)
+                
+                logger.info(f"Generated dnsmasq config at {config_file}")
+                
+                # Ensure dnsmasq is available
+                dnsmasq_ok = _dnsmasq_available()
+            finally:
+                # dnsmasq binds to the gateway address, so wait for it either
+                # way; a setup failure is raised rather than left in the future
+                iface_future.result()
+            if not dnsmasq_ok:
                 raise DhcpServerError("dnsmasq not installed")
 
-            # Pre-flight check config (static, minimal) to fail fast on syntax issues
-            try:
-                execute_command([
-                    "dnsmasq",
-                    "--test",
-                    f"--conf-file={config_file}",
-                ])
-            except CommandError as e:
-                raise DhcpServerError(f"dnsmasq config test failed: {e}") from e
+            # Pre-flight check config (static, minimal) to fail fast on syntax issues.
+            # Configs are deterministic, so an identical one is only tested once.
+            config_digest = hashlib.blake2b(config_content.encode(), digest_size=16).hexdigest()
+            if config_digest not in self._validated_configs:
+                try:
+                    execute_command([
+                        "dnsmasq",
+                        "--test",
+                        f"--conf-file={config_file}",
+                    ])
+                except CommandError as e:
+                    raise DhcpServerError(f"dnsmasq config test failed: {e}") from e
+                self._validated_configs.add(config_digest)
             
             # Start dnsmasq for this interface (daemonizes by default)
             try:
@@ -223,12 +269,15 @@ class DhcpServer:
             pid_file = instance.get("pid_file")
             
             # Stop dnsmasq process if pid file exists
-            if pid_file and os.path.exists(pid_file):
+            if pid_file:
                 try:
-                    with open(pid_file, "r") as f:
-                        pid = f.read().strip()
-                    if pid:
-                        execute_command(["kill", pid], check=False)
+                    # int() parses the ASCII digits straight from bytes
+                    with open(pid_file, "rb") as f:
+                        pid = int(f.read().strip() or b"0")
+                    if pid > 0:
+                        terminate_process(pid)
+                except FileNotFoundError:
+                    pass
                 except Exception as e:
                     logger.warning(f"Could not stop dnsmasq for {net_id}: {e}")
                 try:
@@ -237,9 +286,11 @@ class DhcpServer:
                     pass
             
             # Remove config file
-            if os.path.exists(config_file):
+            try:
                 os.remove(config_file)
                 logger.info(f"Removed dnsmasq config {config_file}")
+            except FileNotFoundError:
+                pass
             
             del self._instances[net_id]
             logger.info(f"DHCP server stopped for {net_id}")
@@ -247,40 +298,24 @@ class DhcpServer:
         except Exception as e:
             logger.error(f"Error stopping DHCP server for {net_id}: {e}")
     
-    def _configure_interface(self, interface: str, ip_address: str, subnet: str) -> None:
+    def _configure_interface(self, interface: str, ip_address: str, prefix_len: int) -> None:
         """
         Configure interface with IP address and bring it up.
         
         Args:
             interface: Interface name
             ip_address: IP address to assign (e.g., "192.168.10.1")
-            subnet: CIDR subnet for calculating prefix length
+            prefix_len: Subnet prefix length (e.g., 24)
         """
         try:
-            # Extract prefix length from CIDR
-            prefix_len = subnet.split('/')[-1]
-            
-            # Bring interface up
-            try:
-                execute_command(["ip", "link", "set", interface, "up"])
-            except CommandError as e:
-                logger.warning(f"Could not bring up interface {interface}: {e}")
-            
-            # Flush existing addresses (non-fatal if fails)
-            try:
-                execute_command(
-                    ["ip", "addr", "flush", "dev", interface],
-                    check=False
-                )
-            except CommandError:
-                pass
-            
-            # Assign new address
+            # Bring the interface up, drop old addresses and assign the
+            # gateway in one ip process. A failing flush is harmless and
+            # does not stop the remaining lines (-force).
             try:
-                execute_command([
-                    "ip", "addr", "add",
-                    f"{ip_address}/{prefix_len}",
-                    "dev", interface
+                execute_ip_batch([
+                    f"link set {interface} up",
+                    f"addr flush dev {interface}",
+                    f"addr add {ip_address}/{prefix_len} dev {interface}",
                 ])
                 logger.info(f"Configured interface {interface} with {ip_address}/{prefix_len}")
             except CommandError as e:
@@ -307,6 +342,21 @@ class DhcpServer:
     
     def status(self) -> dict:
         """Return minimal status for dnsmasq instances."""
+        # One directory listing per pid directory instead of a stat per instance
+        listings: Dict[str, Set[str]] = {}
+        
+        def pid_file_exists(pid_file: Optional[str]) -> bool:
+            if not pid_file:
+                return False
+            directory, name = os.path.split(pid_file)
+            if directory not in listings:
+                try:
+                    with os.scandir(directory or ".") as entries:
+                        listings[directory] = {entry.name for entry in entries}
+                except OSError:
+                    listings[directory] = set()
+            return name in listings[directory]
+        
         instances = []
         for net_id, data in self._instances.items():
             pid_file = data.get("pid_file")
@@ -314,7 +364,7 @@ class DhcpServer:
                 "net_id": net_id,
                 "interface": data.get("interface"),
                 "pid_file": pid_file,
-                "pid_file_exists": bool(pid_file and os.path.exists(pid_file)),
+                "pid_file_exists": pid_file_exists(pid_file),
             })
         return {
             "running": any(item["pid_file_exists"] for item in instances),
@@ -323,9 +373,12 @@ class DhcpServer:
     
     def stop_all(self) -> None:
         """Stop all active DHCP servers."""
-        net_ids = list(self._instances.keys())
-        for net_id in net_ids:
+        # Drain the dict in place; stop() keeps an instance it failed to
+        # clean up, so drop it here to guarantee progress
+        while self._instances:
+            net_id = next(iter(self._instances))
             self.stop(net_id)
+            self._instances.pop(net_id, None)
         logger.info("All DHCP servers stopped")
 
 
@@ -1,11 +1,34 @@
 """Network isolation using iptables to prevent inter-subnet traffic."""
 
 import logging
-from typing import List, Set
-from .commands import execute_iptables, CommandError
+import shutil
+from typing import Iterable, List, Optional, Set, Tuple
+from .commands import execute_command, execute_iptables, execute_iptables_restore, CommandError
 
 logger = logging.getLogger(__name__)
 
+# ipset holding every isolated WiFi subnet (ipset backend only)
+ISOLATION_IPSET = "wilab_subnets"
+# Chain reached when source and destination are both in the ipset; it returns
+# same-subnet traffic and drops the rest (ipset backend only)
+ISOLATION_CHAIN = "WILAB-ISO"
+
+# Fixed rules of the ipset backend: the chain's final DROP and the FORWARD jump
+_ISOLATION_DROP_RULE = [
+    ISOLATION_CHAIN,
+    "-j", "DROP",
+    "-m", "comment",
+    "--comment", "wilab-isolation"
+]
+_ISOLATION_JUMP_RULE = [
+    "FORWARD",
+    "-m", "set", "--match-set", ISOLATION_IPSET, "src",
+    "-m", "set", "--match-set", ISOLATION_IPSET, "dst",
+    "-j", ISOLATION_CHAIN,
+    "-m", "comment",
+    "--comment", "wilab-isolation"
+]
+
 
 class IsolationManager:
     """Manages iptables rules to isolate WiFi AP networks from each other."""
@@ -13,6 +36,10 @@ class IsolationManager:
     def __init__(self):
         """Initialize isolation manager."""
         self._active_subnets: Set[str] = set()
+        # Subset of _active_subnets that may be isolated (classified once on add)
+        self._wifi_subnets: Set[str] = set()
+        # Decided on first add_network: one ipset-matching rule, or pairwise rules
+        self._ipset_enabled: Optional[bool] = None
         logger.info("IsolationManager initialized")
     
     def add_network(self, subnet: str) -> None:
@@ -27,14 +54,29 @@ class IsolationManager:
             logger.warning(f"Subnet {subnet} already has isolation rules")
             return
         
+        # SAFETY: Only block traffic BETWEEN WiFi subnets (192.168.x.0/24)
+        # Do NOT block traffic to/from host's main network
+        if not self._is_wifi_subnet(subnet):
+            logger.warning(f"Skipping isolation rules for non-WiFi subnet: {subnet}")
+            self._active_subnets.add(subnet)
+            return
+        
         logger.info(f"Adding isolation rules for subnet {subnet}")
         
-        # Add rules to block traffic between this subnet and all existing subnets
-        for existing_subnet in self._active_subnets:
-            self._block_traffic(subnet, existing_subnet)
-            self._block_traffic(existing_subnet, subnet)
+        if self._ensure_ipset():
+            # Exempt traffic within the subnet before the shared DROP covers it
+            self._same_subnet_rule("-I", subnet)
+            self._ipset_update("add", subnet)
+        else:
+            # Block traffic between this subnet and all existing subnets,
+            # one rule per direction, installed in a single iptables-restore run
+            pairs = self._subnet_pairs(subnet, self._wifi_subnets)
+            if pairs and not self._apply_batch("-A", pairs):
+                for source, destination in pairs:
+                    self._block_traffic(source, destination)
         
         self._active_subnets.add(subnet)
+        self._wifi_subnets.add(subnet)
         logger.info(f"Isolation rules added for {subnet}")
     
     def remove_network(self, subnet: str) -> None:
@@ -48,17 +90,179 @@ class IsolationManager:
             logger.warning(f"Subnet {subnet} has no isolation rules to remove")
             return
         
+        if subnet not in self._wifi_subnets:
+            # Non-WiFi subnets never got rules
+            self._active_subnets.discard(subnet)
+            return
+        
         logger.info(f"Removing isolation rules for subnet {subnet}")
         
-        # Remove rules blocking traffic between this subnet and others
-        for other_subnet in self._active_subnets:
-            if other_subnet != subnet:
-                self._unblock_traffic(subnet, other_subnet)
-                self._unblock_traffic(other_subnet, subnet)
+        if self._ipset_enabled:
+            self._ipset_update("del", subnet)
+            self._same_subnet_rule("-D", subnet)
+            if self._wifi_subnets == {subnet}:
+                # Last isolated subnet: leave no Wi-Lab rules behind
+                self._teardown_ipset()
+        else:
+            # Remove rules blocking traffic between this subnet and others
+            others = [s for s in self._wifi_subnets if s != subnet]
+            pairs = self._subnet_pairs(subnet, others)
+            if pairs and not self._apply_batch("-D", pairs):
+                # The batch is all-or-nothing; delete one by one so a rule that
+                # is already gone does not keep the others in place
+                for source, destination in pairs:
+                    self._unblock_traffic(source, destination)
         
         self._active_subnets.discard(subnet)
+        self._wifi_subnets.discard(subnet)
         logger.info(f"Isolation rules removed for {subnet}")
     
+    def _ensure_ipset(self) -> bool:
+        """
+        Set up the ipset isolation backend on first use.
+        
+        Creates the ``wilab_subnets`` hash:net set and a single FORWARD rule
+        sending traffic whose source and destination are both in the set to
+        the ``WILAB-ISO`` chain, which ends in DROP. Each subnet adds one
+        RETURN rule there so traffic within a subnet (routed or bridged
+        setups) still passes; the chain grows with the subnets, not with
+        every pair of them. Removing the last subnet tears all of it down.
+        
+        Returns:
+            True if the set and rule are in place, False to use pairwise rules
+        """
+        if self._ipset_enabled is not None:
+            return self._ipset_enabled
+        self._ipset_enabled = False
+        
+        if shutil.which("ipset") is None:
+            logger.info("ipset not available, using pairwise isolation rules")
+            return False
+        
+        try:
+            execute_command(["ipset", "create", ISOLATION_IPSET, "hash:net", "-exist"])
+            try:
+                execute_iptables(["-N", ISOLATION_CHAIN])
+            except CommandError:
+                pass  # Left over from a previous run; its rules are checked below
+            for rule in (_ISOLATION_DROP_RULE, _ISOLATION_JUMP_RULE):
+                try:
+                    execute_iptables(["-C", *rule])
+                except CommandError:
+                    execute_iptables(["-A", *rule])
+        except CommandError as e:
+            logger.warning(f"ipset isolation unavailable, using pairwise rules: {e}")
+            return False
+        
+        self._ipset_enabled = True
+        logger.info(f"Isolating WiFi subnets through ipset {ISOLATION_IPSET}")
+        return True
+    
+    def _teardown_ipset(self) -> None:
+        """
+        Remove the FORWARD jump, the WILAB-ISO chain and the ipset.
+        
+        Called when the last isolated subnet is removed; the next
+        add_network sets the backend up again.
+        """
+        steps = [
+            ["-D", *_ISOLATION_JUMP_RULE],
+            ["-F", ISOLATION_CHAIN],
+            ["-X", ISOLATION_CHAIN],
+        ]
+        for args in steps:
+            try:
+                execute_iptables(args)
+            except CommandError as e:
+                logger.warning(f"Could not remove isolation chain ({args[0]}): {e}")
+        try:
+            execute_command(["ipset", "destroy", ISOLATION_IPSET])
+        except CommandError as e:
+            logger.warning(f"Could not destroy ipset {ISOLATION_IPSET}: {e}")
+        self._ipset_enabled = None
+        logger.info("Removed ipset isolation backend")
+    
+    def _ipset_update(self, action: str, subnet: str) -> None:
+        """
+        Add ("add") or remove ("del") a subnet from the isolation ipset.
+        
+        Args:
+            action: ipset sub-command, "add" or "del"
+            subnet: CIDR subnet
+        """
+        try:
+            execute_command(["ipset", action, ISOLATION_IPSET, subnet, "-exist"])
+        except CommandError as e:
+            logger.error(f"Failed to {action} {subnet} in ipset {ISOLATION_IPSET}: {e}")
+    
+    @staticmethod
+    def _same_subnet_rule(action: str, subnet: str) -> None:
+        """
+        Insert ("-I") or delete ("-D") the WILAB-ISO rule returning traffic
+        within one subnet.
+        
+        Args:
+            action: "-I" to insert or "-D" to delete
+            subnet: CIDR subnet
+        """
+        rule = [
+            ISOLATION_CHAIN,
+            "-s", subnet,
+            "-d", subnet,
+            "-j", "RETURN",
+            "-m", "comment",
+            "--comment", "wilab-isolation"
+        ]
+        try:
+            if action == "-I":
+                try:
+                    execute_iptables(["-C", *rule])
+                    return
+                except CommandError:
+                    pass
+            execute_iptables([action, *rule])
+        except CommandError as e:
+            logger.error(f"Failed to update same-subnet rule for {subnet} ({action}): {e}")
+    
+    @staticmethod
+    def _subnet_pairs(subnet: str, others: Iterable[str]) -> List[Tuple[str, str]]:
+        """Return (source, destination) pairs for both directions between subnet and others."""
+        pairs: List[Tuple[str, str]] = []
+        for other in others:
+            pairs.append((subnet, other))
+            pairs.append((other, subnet))
+        return pairs
+    
+    @staticmethod
+    def _is_wifi_subnet(subnet: str) -> bool:
+        """Only WiFi subnets (192.168.x.0/24) are ever isolated."""
+        return subnet.startswith("192.168.")
+    
+    def _apply_batch(self, action: str, pairs: List[Tuple[str, str]]) -> bool:
+        """
+        Add ("-A") or delete ("-D") the block rules for several subnet pairs
+        with one iptables-restore run.
+        
+        Args:
+            action: "-A" to append or "-D" to delete
+            pairs: (source, destination) subnet pairs
+            
+        Returns:
+            True if the batch was applied, False if the caller should fall
+            back to one iptables call per rule
+        """
+        rules = [
+            f"{action} FORWARD -s {source} -d {destination} -j DROP -m comment --comment wilab-isolation"
+            for source, destination in pairs
+        ]
+        try:
+            execute_iptables_restore({"filter": rules})
+            logger.debug(f"Applied {len(rules)} isolation rules ({action})")
+            return True
+        except CommandError as e:
+            logger.warning(f"Batched isolation update failed, applying rules one by one: {e}")
+            return False
+    
     def _block_traffic(self, source: str, destination: str) -> None:
         """
         Block traffic from source subnet to destination subnet.
@@ -68,13 +272,7 @@ class IsolationManager:
             destination: Destination CIDR subnet
         """
         try:
-            # SAFETY: Only block traffic BETWEEN WiFi subnets (192.168.x.0/24)
-            # Do NOT block traffic to/from host's main network
-            # Skip if either subnet is not a WiFi subnet (not 192.168.x.0/24)
-            if not (source.startswith("192.168.") and destination.startswith("192.168.")):
-                logger.warning(f"Skipping isolation rule for non-WiFi subnets: {source} -> {destination}")
-                return
-            
+            # Both subnets were checked to be WiFi subnets by add_network
             # Append rule to FORWARD chain to block inter-subnet traffic
             # Use -A (append) instead of -I (insert) to avoid interfering with existing rules
             # iptables -A FORWARD -s <source> -d <destination> -j DROP -m comment --comment "wilab-isolation"
@@ -125,8 +323,10 @@ class IsolationManager:
         """
         logger.warning("Flushing all isolation rules")
         
-        for subnet in list(self._active_subnets):
+        # Drain the set in place; discard() guarantees progress even if
+        # remove_network bails out early
+        while self._active_subnets:
+            subnet = next(iter(self._active_subnets))
             self.remove_network(subnet)
-        
-        self._active_subnets.clear()
+            self._active_subnets.discard(subnet)
         logger.info("All isolation rules flushed")
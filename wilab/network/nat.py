@@ -1,11 +1,20 @@
 """NAT and Internet forwarding management using iptables."""
 
 import logging
-from typing import Optional
-from .commands import execute_command, execute_iptables, execute_sysctl
+import shlex
+from typing import Dict, List, Optional, Set, Tuple
+from .commands import execute_command, execute_iptables_restore, execute_sysctl
 
 logger = logging.getLogger(__name__)
 
+# Kernel IPv4 routing table, read directly to avoid spawning `ip route`
+PROC_NET_ROUTE = "/proc/net/route"
+
+# Per-network rules live in dedicated chains reached by one jump from the
+# built-in chains, so teardown is a flush that never touches host rules
+FORWARD_CHAIN = "WILAB-FWD"
+NAT_CHAIN = "WILAB-NAT"
+
 
 class NatManager:
     """Manages NAT rules and IP forwarding for Internet access."""
@@ -21,6 +30,33 @@ class NatManager:
         self._resolved_upstream: Optional[str] = None
         logger.info(f"NatManager initialized with upstream={upstream_interface}")
     
+    @staticmethod
+    def _default_route_from_proc() -> Optional[str]:
+        """
+        Return the interface of the lowest-metric default route in /proc/net/route.
+        
+        Returns:
+            Interface name, or None if the table is unreadable or has no
+            usable default route (callers then fall back to `ip route`)
+        """
+        best: Optional[Tuple[int, str]] = None
+        try:
+            with open(PROC_NET_ROUTE, "r") as f:
+                next(f, None)  # header
+                for line in f:
+                    # Iface Destination Gateway Flags RefCnt Use Metric Mask ...
+                    fields = line.split()
+                    if len(fields) < 8 or fields[1] != "00000000" or fields[7] != "00000000":
+                        continue
+                    if not int(fields[3], 16) & 0x1:  # RTF_UP
+                        continue
+                    metric = int(fields[6])
+                    if best is None or metric < best[0]:
+                        best = (metric, fields[0])
+        except (OSError, ValueError):
+            return None
+        return best[1] if best else None
+    
     def _discover_upstream_interface(self) -> str:
         """
         Discover upstream interface from default route.
@@ -34,6 +70,12 @@ class NatManager:
         if self._resolved_upstream:
             return self._resolved_upstream
         
+        interface = self._default_route_from_proc()
+        if interface:
+            self._resolved_upstream = interface
+            logger.info(f"Discovered upstream interface: {interface}")
+            return interface
+        
         try:
             # Get default route: ip route show default
             output = execute_command(["ip", "route", "show", "default"])
@@ -88,31 +130,86 @@ class NatManager:
         except Exception as e:
             logger.warning(f"Failed to disable IP forwarding: {e}")
     
-    def _rule_exists(self, table: Optional[str], args: list) -> bool:
+    @staticmethod
+    def _rule_key(parts: List[str]) -> Tuple[str, str, str, str]:
         """
-        Check if an iptables rule exists.
+        Identify a rule by its comment tag, interfaces and target.
+        
+        Works on both the argument lists built here and the tokens of a
+        line printed by ``iptables -S``, whose option order differs.
         
-        Args:
-            table: Table name (e.g., "nat") or None for filter
-            args: Rule arguments to check
-            
         Returns:
-            True if rule exists, False otherwise
+            Tuple of (comment, in-interface, out-interface, target)
         """
-        try:
-            cmd = ["iptables"]
-            if table:
-                cmd.extend(["-t", table])
-            cmd.extend(["-C"] + args)
-            execute_command(cmd)
-            return True
-        except Exception:
-            return False
+        def option(flag: str) -> str:
+            try:
+                return parts[parts.index(flag) + 1]
+            except (ValueError, IndexError):
+                return ""
+        
+        return (option("--comment"), option("-i"), option("-o"), option("-j"))
+    
+    def _snapshot_rules(self) -> Dict[str, str]:
+        """
+        Dump the filter and nat tables once each.
+        
+        A table that cannot be listed is returned as empty, so its rules
+        are treated as missing.
+        
+        Returns:
+            Dict with "filter" and "nat" ``iptables -S`` output
+        """
+        snapshot = {}
+        for table in ("filter", "nat"):
+            try:
+                snapshot[table] = execute_command(["iptables", "-w", "-t", table, "-S"])
+            except Exception as e:
+                logger.warning(f"Could not list {table} rules: {e}")
+                snapshot[table] = ""
+        return snapshot
+    
+    @classmethod
+    def _tagged_rule_keys(cls, dump: str, chain: str) -> Set[Tuple[str, str, str, str]]:
+        """Return the keys of all wilab-tagged rules of a chain in an ``iptables -S`` dump."""
+        prefix = f"-A {chain} "
+        keys = set()
+        for line in dump.splitlines():
+            if line.startswith(prefix) and "wilab-" in line:
+                keys.add(cls._rule_key(shlex.split(line)))
+        return keys
+    
+    @staticmethod
+    def _chain_setup(dump: str, parent: str, chain: str) -> List[str]:
+        """
+        Return the restore lines creating a Wi-Lab chain and its jump, if missing.
+        
+        Nothing is returned when the table could not be listed: declaring
+        a chain that already exists would flush it.
+        
+        Args:
+            dump: ``iptables -S`` output of the table
+            parent: Built-in chain to jump from (e.g. "FORWARD")
+            chain: Wi-Lab chain (e.g. "WILAB-FWD")
+        """
+        if not dump:
+            return []
+        lines = set(dump.splitlines())
+        setup = []
+        if f"-N {chain}" not in lines:
+            setup.append(f":{chain} - [0:0]")
+        if f"-A {parent} -j {chain}" not in lines:
+            setup.append(f"-I {parent} 1 -j {chain}")
+        return setup
     
     def enable_nat(self, wifi_interface: str, net_id: str) -> None:
         """
         Enable NAT for a WiFi interface to allow Internet access.
         
+        Rules go into the WILAB-NAT and WILAB-FWD chains, which are created
+        (with their jump) on first use. The tables are listed once and
+        existing rules are matched locally; missing rules are then
+        installed with a single iptables-restore run.
+        
         Args:
             wifi_interface: WiFi interface to enable NAT for (e.g., "wlan0")
             net_id: Network identifier for tracking rules (e.g., "ap-01")
@@ -124,86 +221,69 @@ class NatManager:
         
         logger.info(f"Enabling NAT for {net_id}: {wifi_interface} -> {upstream}")
         
+        nat_rules: List[str] = []
+        filter_rules: List[str] = []
+        
         try:
+            snapshot = self._snapshot_rules()
+            existing_forward = self._tagged_rule_keys(snapshot["filter"], FORWARD_CHAIN)
+            existing_nat = self._tagged_rule_keys(snapshot["nat"], NAT_CHAIN)
+            
+            nat_rules.extend(self._chain_setup(snapshot["nat"], "POSTROUTING", NAT_CHAIN))
+            filter_rules.extend(self._chain_setup(snapshot["filter"], "FORWARD", FORWARD_CHAIN))
+            
             # SAFETY: Check default FORWARD policy first
             # If policy is DROP, we need to be extremely careful with rule order
-            try:
-                forward_policy = execute_command(["iptables", "-S", "FORWARD"])
-                if "-P FORWARD DROP" in forward_policy:
-                    # Add rule to accept ESTABLISHED connections FIRST to protect existing SSH
-                    # Only add if not already present
-                    protect_rule = [
-                        "FORWARD",
-                        "-m", "conntrack",
-                        "--ctstate", "ESTABLISHED,RELATED",
-                        "-j", "ACCEPT",
-                        "-m", "comment",
-                        "--comment", "wilab-protect-existing"
-                    ]
-                    if not self._rule_exists(None, protect_rule):
-                        logger.warning("FORWARD policy is DROP - adding accept rule for existing connections first")
-                        execute_iptables([
-                            "-I", "FORWARD", "1",
-                            "-m", "conntrack",
-                            "--ctstate", "ESTABLISHED,RELATED",
-                            "-j", "ACCEPT",
-                            "-m", "comment",
-                            "--comment", "wilab-protect-existing"
-                        ])
-                    else:
-                        logger.debug("FORWARD protection rule already exists")
-            except Exception as e:
-                logger.warning(f"Could not check FORWARD policy: {e}")
+            if "-P FORWARD DROP" in snapshot["filter"]:
+                # Add rule to accept ESTABLISHED connections FIRST to protect existing SSH
+                # Only add if not already present
+                protect_rule = [
+                    FORWARD_CHAIN,
+                    "-m", "conntrack",
+                    "--ctstate", "ESTABLISHED,RELATED",
+                    "-j", "ACCEPT",
+                    "-m", "comment",
+                    "--comment", "wilab-protect-existing"
+                ]
+                if self._rule_key(protect_rule) not in existing_forward:
+                    logger.warning("FORWARD policy is DROP - adding accept rule for existing connections first")
+                    filter_rules.append(" ".join(["-I", FORWARD_CHAIN, "1", *protect_rule[1:]]))
+                else:
+                    logger.debug("FORWARD protection rule already exists")
             
             # Enable IP forwarding first
             self.enable_ip_forwarding()
             
-            # Add MASQUERADE rule (check if exists first to avoid duplicates)
+            # MASQUERADE rule (check if exists first to avoid duplicates)
             masquerade_rule = [
-                "POSTROUTING",
+                NAT_CHAIN,
                 "-o", upstream,
                 "-j", "MASQUERADE",
                 "-m", "comment",
                 "--comment", f"wilab-nat-{net_id}"
             ]
-            if not self._rule_exists("nat", masquerade_rule):
-                execute_iptables([
-                    "-t", "nat",
-                    "-A", "POSTROUTING",
-                    "-o", upstream,
-                    "-j", "MASQUERADE",
-                    "-m", "comment",
-                    "--comment", f"wilab-nat-{net_id}"
-                ])
-                logger.debug(f"Added MASQUERADE rule for {net_id}")
+            if self._rule_key(masquerade_rule) not in existing_nat:
+                nat_rules.append(" ".join(["-A", *masquerade_rule]))
             else:
                 logger.debug(f"MASQUERADE rule already exists for {net_id}")
             
             # Allow forwarding from WiFi to upstream (check if exists first)
             forward_in_rule = [
-                "FORWARD",
+                FORWARD_CHAIN,
                 "-i", wifi_interface,
                 "-o", upstream,
                 "-j", "ACCEPT",
                 "-m", "comment",
                 "--comment", f"wilab-forward-{net_id}"
             ]
-            if not self._rule_exists(None, forward_in_rule):
-                execute_iptables([
-                    "-A", "FORWARD",
-                    "-i", wifi_interface,
-                    "-o", upstream,
-                    "-j", "ACCEPT",
-                    "-m", "comment",
-                    "--comment", f"wilab-forward-{net_id}"
-                ])
-                logger.debug(f"Added FORWARD ingress rule for {net_id}")
+            if self._rule_key(forward_in_rule) not in existing_forward:
+                filter_rules.append(" ".join(["-A", *forward_in_rule]))
             else:
                 logger.debug(f"FORWARD ingress rule already exists for {net_id}")
             
             # Allow established/related connections back (check if exists first)
             forward_out_rule = [
-                "FORWARD",
+                FORWARD_CHAIN,
                 "-i", upstream,
                 "-o", wifi_interface,
                 "-m", "state",
@@ -212,31 +292,53 @@ class NatManager:
                 "-m", "comment",
                 "--comment", f"wilab-forward-{net_id}"
             ]
-            if not self._rule_exists(None, forward_out_rule):
-                execute_iptables([
-                    "-A", "FORWARD",
-                    "-i", upstream,
-                    "-o", wifi_interface,
-                    "-m", "state",
-                    "--state", "RELATED,ESTABLISHED",
-                    "-j", "ACCEPT",
-                    "-m", "comment",
-                    "--comment", f"wilab-forward-{net_id}"
-                ])
-                logger.debug(f"Added FORWARD egress rule for {net_id}")
+            if self._rule_key(forward_out_rule) not in existing_forward:
+                filter_rules.append(" ".join(["-A", *forward_out_rule]))
             else:
                 logger.debug(f"FORWARD egress rule already exists for {net_id}")
             
+            if nat_rules or filter_rules:
+                execute_iptables_restore({"nat": nat_rules, "filter": filter_rules})
+                logger.debug(
+                    f"Installed {len(nat_rules) + len(filter_rules)} NAT/FORWARD rules for {net_id}"
+                )
+            
             logger.info(f"NAT enabled for {net_id} ({wifi_interface})")
         
         except Exception as e:
             logger.error(f"Failed to enable NAT for {net_id} ({wifi_interface}): {e}")
             raise RuntimeError(f"Cannot enable NAT: {e}") from e
     
+    @staticmethod
+    def _list_tagged_rules(dump: str, comment: str) -> List[str]:
+        """
+        Return the rules of a table dump carrying an exact ``--comment`` tag.
+        
+        Rules are returned as printed by ``iptables -S`` (e.g.
+        "-A WILAB-FWD -i wlan0 ... -j ACCEPT"), from any chain and
+        including duplicates left over from previous runs.
+        """
+        rules = []
+        for line in dump.splitlines():
+            if not line.startswith("-A ") or comment not in line:
+                continue
+            parts = shlex.split(line)
+            try:
+                tag = parts[parts.index("--comment") + 1]
+            except (ValueError, IndexError):
+                continue
+            if tag == comment:
+                rules.append(line)
+        return rules
+    
     def disable_nat(self, wifi_interface: str, net_id: str) -> None:
         """
         Disable NAT for a WiFi interface.
         
+        The tagged rules are read from one dump per table and deleted in a
+        single iptables-restore run, which also removes duplicates and
+        rules left in the built-in chains by older versions.
+        
         Args:
             wifi_interface: WiFi interface to disable NAT for
             net_id: Network identifier to match rules (e.g., "ap-01")
@@ -246,50 +348,18 @@ class NatManager:
         logger.info(f"Disabling NAT for {net_id}: {wifi_interface} -> {upstream}")
         
         try:
-            # Remove MASQUERADE rule (with net_id-specific comment filter)
-            # Use -D (delete) instead of -A (append)
-            # Loop to remove all instances (in case of duplicates from previous runs)
-            for _ in range(10):  # Max 10 attempts to avoid infinite loop
-                try:
-                    execute_iptables([
-                        "-t", "nat",
-                        "-D", "POSTROUTING",
-                        "-o", upstream,
-                        "-j", "MASQUERADE",
-                        "-m", "comment",
-                        "--comment", f"wilab-nat-{net_id}"
-                    ])
-                except Exception:
-                    break  # No more rules to delete
-            
-            # Remove FORWARD rules (with net_id-specific comment filter)
-            for _ in range(10):
-                try:
-                    execute_iptables([
-                        "-D", "FORWARD",
-                        "-i", wifi_interface,
-                        "-o", upstream,
-                        "-j", "ACCEPT",
-                        "-m", "comment",
-                        "--comment", f"wilab-forward-{net_id}"
-                    ])
-                except Exception:
-                    break
+            snapshot = self._snapshot_rules()
+            nat_rules = [
+                "-D" + rule[2:]
+                for rule in self._list_tagged_rules(snapshot["nat"], f"wilab-nat-{net_id}")
+            ]
+            filter_rules = [
+                "-D" + rule[2:]
+                for rule in self._list_tagged_rules(snapshot["filter"], f"wilab-forward-{net_id}")
+            ]
             
-            for _ in range(10):
-                try:
-                    execute_iptables([
-                        "-D", "FORWARD",
-                        "-i", upstream,
-                        "-o", wifi_interface,
-                        "-m", "state",
-                        "--state", "RELATED,ESTABLISHED",
-                        "-j", "ACCEPT",
-                        "-m", "comment",
-                        "--comment", f"wilab-forward-{net_id}"
-                    ])
-                except Exception:
-                    break
+            if nat_rules or filter_rules:
+                execute_iptables_restore({"nat": nat_rules, "filter": filter_rules})
             
             logger.info(f"NAT disabled for {net_id} ({wifi_interface})")
         
@@ -298,25 +368,25 @@ class NatManager:
             logger.warning(f"Error disabling NAT for {net_id} ({wifi_interface}): {e}")
     
     def flush_all_rules(self) -> None:
-        """Flush all NAT and FORWARD rules (use with caution)."""
-        logger.warning("Flushing all NAT and FORWARD rules")
+        """Flush all Wi-Lab NAT and FORWARD rules, leaving host rules alone."""
+        logger.warning("Flushing all Wi-Lab NAT and FORWARD rules")
         try:
-            execute_iptables(["-t", "nat", "-F"])
-            execute_iptables(["-F", "FORWARD"])
+            execute_iptables_restore({"nat": [f"-F {NAT_CHAIN}"], "filter": [f"-F {FORWARD_CHAIN}"]})
         except Exception as e:
             logger.error(f"Failed to flush iptables rules: {e}")
 
     def status(self) -> dict:
-        """Return minimal iptables status for debugging (nat + forward chains)."""
+        """Return minimal iptables status for debugging (nat + filter tables)."""
         nat_rules = None
         fwd_rules = None
         errors = []
         try:
-            nat_rules = execute_command(["iptables", "-t", "nat", "-S"])
+            nat_rules = execute_command(["iptables", "-w", "-t", "nat", "-S"])
         except Exception as e:
             errors.append(f"nat: {e}")
         try:
-            fwd_rules = execute_command(["iptables", "-S", "FORWARD"])
+            # Whole table: FORWARD policy and jump plus the WILAB-FWD rules
+            fwd_rules = execute_command(["iptables", "-w", "-S"])
         except Exception as e:
             errors.append(f"forward: {e}")
         return {
@@ -1,7 +1,7 @@
 """Safety utilities for checking host network impact."""
 
 import logging
-from .commands import execute_command
+from .commands import execute_command, execute_sysctl
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +14,7 @@ def check_ip_forwarding() -> bool:
         True if enabled, False otherwise
     """
     try:
-        output = execute_command(["sysctl", "-n", "net.ipv4.ip_forward"])
+        output = execute_sysctl("net.ipv4.ip_forward")
         return output.strip() == "1"
     except Exception as e:
         logger.warning(f"Could not check IP forwarding status: {e}")
@@ -25,23 +25,26 @@ def list_wilab_rules() -> dict:
     """
     List all active Wi-Lab iptables rules.
     
+    Both tables come from a single ``iptables-save`` dump, so rules in the
+    WILAB-NAT/WILAB-FWD chains and any left in the built-in chains by
+    older versions are found alike.
+    
     Returns:
-        Dictionary with 'nat' and 'forward' lists of rules
+        Dictionary with 'nat' and 'forward' (filter table) lists of rules
     """
     rules: dict[str, list[str]] = {"nat": [], "forward": []}
     
     try:
-        # Check NAT table
-        nat_output = execute_command(["iptables", "-t", "nat", "-L", "POSTROUTING", "-n", "-v"])
-        for line in nat_output.split('\n'):
-            if 'wilab-nat' in line:
-                rules["nat"].append(line.strip())
-        
-        # Check FORWARD chain
-        forward_output = execute_command(["iptables", "-L", "FORWARD", "-n", "-v"])
-        for line in forward_output.split('\n'):
-            if 'wilab-' in line:
-                rules["forward"].append(line.strip())
+        output = execute_command(["iptables-save"])
+        table = None
+        for line in output.splitlines():
+            if line.startswith("*"):
+                table = line[1:]
+            elif line.startswith("-A ") and "wilab-" in line:
+                if table == "nat":
+                    rules["nat"].append(line)
+                elif table == "filter":
+                    rules["forward"].append(line)
     
     except Exception as e:
         logger.warning(f"Could not list iptables rules: {e}")
@@ -56,8 +59,8 @@ def log_host_impact_warning():
     logger.warning("=" * 80)
     logger.warning("Wi-Lab will modify:")
     logger.warning("  - IP forwarding (sysctl net.ipv4.ip_forward)")
-    logger.warning("  - iptables NAT rules (POSTROUTING)")
-    logger.warning("  - iptables FORWARD rules")
+    logger.warning("  - iptables NAT rules (WILAB-NAT chain, jumped to from POSTROUTING)")
+    logger.warning("  - iptables FORWARD rules (WILAB-FWD chain and isolation rules)")
     logger.warning("  - WiFi interface state (AP mode)")
     logger.warning("")
     logger.warning("All rules include '-m comment --comment wilab-*' for tracking.")
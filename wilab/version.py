@@ -3,10 +3,12 @@ from pathlib import Path
 
 def _read_version() -> str:
 	root = Path(__file__).resolve().parent.parent
-	version_file = root / "VERSION"
-	if version_file.exists():
-		return version_file.read_text(encoding="utf-8").strip()
-	return "0.0.0-dev"
+	# One open+read; a missing file is the only case needing the fallback
+	try:
+		with open(root / "VERSION", "rb") as f:
+			return f.read().decode("utf-8").strip()
+	except FileNotFoundError:
+		return "0.0.0-dev"
 
 
 __version__ = _read_version()
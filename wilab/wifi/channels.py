@@ -21,6 +21,7 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 from ..network.commands import execute_iw
+from .interface import InterfaceError, get_wiphy
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,12 @@ logger = logging.getLogger(__name__)
 _BAND_2_4_MAX_FREQ = 2500  # MHz – everything below is 2.4 GHz
 _BAND_5_MIN_FREQ = 5000    # MHz – everything at or above is 5 GHz
 
+# ``iw phy<N> channels`` parsing; the header matches active and disabled lines.
+_CHANNEL_HEADER_RE = re.compile(
+    r"\*\s+([\d.]+)\s+MHz\s+\[(\d+)\](?:\s+\(disabled\))?", re.ASCII
+)
+_MAX_POWER_RE = re.compile(r"Maximum TX power:\s+([\d.]+)\s+dBm", re.ASCII)
+
 # Standard WiFi channel sets for static (hardware-independent) validation.
 VALID_CHANNELS_24GHZ = frozenset(range(1, 15))  # 1–14
 VALID_CHANNELS_5GHZ = (
@@ -37,6 +44,7 @@ VALID_CHANNELS_5GHZ = (
     | frozenset(range(100, 145, 4)) # UNII-2 Extended: 100–144
     | frozenset(range(149, 178, 4)) # UNII-3: 149–177
 )
+VALID_CHANNELS_ANY = VALID_CHANNELS_24GHZ | VALID_CHANNELS_5GHZ
 
 
 def is_valid_channel_for_band(channel: int, band: str) -> bool:
@@ -50,7 +58,7 @@ def is_valid_channel_for_band(channel: int, band: str) -> bool:
     if band == "5ghz":
         return channel in VALID_CHANNELS_5GHZ
     # "dual" or unknown — accept any channel that belongs to either band.
-    return channel in VALID_CHANNELS_24GHZ or channel in VALID_CHANNELS_5GHZ
+    return channel in VALID_CHANNELS_ANY
 
 
 def set_regulatory_domain(country_code: str) -> None:
@@ -84,6 +92,20 @@ class InterfaceChannels:
     interface: str
     channels_24ghz: List[ChannelInfo] = field(default_factory=list)
     channels_5ghz: List[ChannelInfo] = field(default_factory=list)
+    _by_channel: Dict[int, ChannelInfo] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def find(self, channel: int) -> Optional[ChannelInfo]:
+        """Return the entry for *channel* in either band, or ``None``.
+
+        The channel-number index is built on first use; the first entry wins
+        if a number appears twice.
+        """
+        if not self._by_channel:
+            for ch in self.channels_24ghz + self.channels_5ghz:
+                self._by_channel.setdefault(ch.channel, ch)
+        return self._by_channel.get(channel)
 
 
 # ---- Manager ----
@@ -152,14 +174,14 @@ class ChannelManager:
 
     @staticmethod
     def _get_phy_for_interface(interface: str) -> str:
-        """Determine the wiphy index for *interface* via ``iw <dev> info``."""
-        info = execute_iw([interface, "info"])
-        for line in info.splitlines():
-            if "wiphy" in line:
-                parts = line.strip().split()
-                if len(parts) >= 2:
-                    return parts[1]
-        raise ValueError(f"Cannot determine wiphy for interface {interface}")
+        """Determine the wiphy (e.g. ``phy0``) of *interface*.
+
+        Read from sysfs, falling back to ``iw <dev> info`` without it.
+        """
+        try:
+            return get_wiphy(interface)
+        except InterfaceError as exc:
+            raise ValueError(f"Cannot determine wiphy for interface {interface}") from exc
 
     @staticmethod
     def _parse_iw_phy_output(output: str) -> List[ChannelInfo]:
@@ -170,12 +192,6 @@ class ChannelManager:
         - No IR:    same header, with a ``No IR`` line in the block
         - Disabled: ``* 2484 MHz [14] (disabled)``
         """
-        # Matches both active and disabled header lines
-        header_re = re.compile(
-            r"\*\s+([\d.]+)\s+MHz\s+\[(\d+)\](?:\s+\(disabled\))?"
-        )
-        power_re = re.compile(r"Maximum TX power:\s+([\d.]+)\s+dBm")
-
         channels: List[ChannelInfo] = []
         current_freq: int | None = None
         current_chan: int | None = None
@@ -200,7 +216,7 @@ class ChannelManager:
             current_no_ir = False
 
         for line in output.splitlines():
-            hm = header_re.search(line)
+            hm = _CHANNEL_HEADER_RE.search(line)
             if hm:
                 _flush()
                 current_freq = int(float(hm.group(1)))
@@ -208,7 +224,7 @@ class ChannelManager:
                 current_disabled = "(disabled)" in line
                 continue
             if current_freq is not None:
-                pm = power_re.search(line)
+                pm = _MAX_POWER_RE.search(line)
                 if pm:
                     current_power = float(pm.group(1))
                 if "No IR" in line:
@@ -219,7 +235,7 @@ class ChannelManager:
     def _resolve_channels(self, interface: str) -> InterfaceChannels:
         """Query ``iw`` and split results into 2.4 GHz / 5 GHz bands."""
         phy = self._get_phy_for_interface(interface)
-        output = execute_iw(["phy" + phy, "channels"])
+        output = execute_iw([phy, "channels"])
         all_channels = self._parse_iw_phy_output(output)
 
         ch_24: List[ChannelInfo] = []
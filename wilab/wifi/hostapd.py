@@ -4,19 +4,87 @@ import os
 import logging
 import time
 from typing import Optional, Dict
-from ..network.commands import execute_command, execute_iw, CommandError
+from ..network.commands import (
+    execute_command,
+    execute_ip_batch,
+    execute_iw,
+    find_binary,
+    terminate_process,
+    write_file_atomic,
+    CommandError,
+)
 
 logger = logging.getLogger(__name__)
 
 HOSTAPD_CONFIG_DIR = "/tmp/wilab-hostapd"
 HOSTAPD_PID_DIR = "/tmp/wilab-hostapd/pids"
 
+# hostapd -B writes its pid file from the daemonized child, shortly after
+# the parent we waited on has exited; poll for it up to this long
+PID_FILE_TIMEOUT = 2.0
+PID_FILE_POLL_INTERVAL = 0.02
+
 
 class HostapdError(Exception):
     """Exception raised for hostapd operation failures."""
     pass
 
 
+# Security section of hostapd.conf per encryption type. WPA3 requires
+# management frame protection; the mixed WPA2/WPA3 mode then relaxes it to
+# optional and accepts both key managements (later lines win in hostapd).
+_WPA_PSK_SECTION = (
+    "wpa=2\n"
+    "wpa_passphrase={password}\n"
+    "wpa_key_mgmt=WPA-PSK\n"
+    "rsn_pairwise=CCMP\n"
+)
+_WPA3_SECTION = _WPA_PSK_SECTION + "ieee80211w=2\nwpa_key_mgmt=SAE\n"
+_ENCRYPTION_SECTIONS = {
+    "open": "",
+    "wpa": _WPA_PSK_SECTION,
+    "wpa2": _WPA_PSK_SECTION,
+    "wpa3": _WPA3_SECTION,
+    "wpa2-wpa3": _WPA3_SECTION + "wpa_key_mgmt=WPA-PSK SAE\nieee80211w=1\n",
+}
+
+
+def _build_config_template(encryption: str, is_5ghz: bool, hidden: bool) -> str:
+    """Return the hostapd.conf format string for one (encryption, band, hidden) combination."""
+    return (
+        "# Wi-Lab hostapd config for {interface}\n"
+        "interface={interface}\n"
+        "driver=nl80211\n"
+        "ssid={ssid}\n"
+        "channel={channel}\n"
+        + ("hw_mode=a\n" if is_5ghz else "hw_mode=g\n")  # 2.4ghz or dual -> g
+        + ("ignore_broadcast_ssid=1\n" if hidden else "")
+        + _ENCRYPTION_SECTIONS[encryption]
+        + "country_code={country_code}\n"
+        "ieee80211n=1\n"  # 802.11n support
+        "wmm_enabled=1\n"  # WMM/QoS
+    )
+
+
+# Precomputed so generating a config is a single format_map call
+_CONFIG_TEMPLATES = {
+    (encryption, is_5ghz, hidden): _build_config_template(encryption, is_5ghz, hidden)
+    for encryption in _ENCRYPTION_SECTIONS
+    for is_5ghz in (False, True)
+    for hidden in (False, True)
+}
+
+
+def _wait_for_file(path: str, timeout: float) -> bool:
+    """Return True as soon as path exists, False if it did not appear within timeout."""
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(PID_FILE_POLL_INTERVAL)
+    return True
+
+
 class HostapdManager:
     """Manages hostapd processes for WiFi AP networks."""
     
@@ -60,55 +128,20 @@ class HostapdManager:
         Returns:
             hostapd configuration as string
         """
-        config_lines = [
-            f"# Wi-Lab hostapd config for {interface}",
-            f"interface={interface}",
-            "driver=nl80211",
-            f"ssid={ssid}",
-            f"channel={channel}",
-        ]
+        template = _CONFIG_TEMPLATES.get((encryption, band == "5ghz", hidden))
+        if template is None:
+            # Unknown encryption types get no security section, as before
+            template = _CONFIG_TEMPLATES[("open", band == "5ghz", hidden)]
+        elif encryption != "open" and not password:
+            raise HostapdError(f"Password required for {encryption} encryption")
         
-        # HW mode based on band
-        if band == "5ghz":
-            config_lines.append("hw_mode=a")
-        else:  # 2.4ghz or dual
-            config_lines.append("hw_mode=g")
-        
-        # Hidden SSID
-        if hidden:
-            config_lines.append("ignore_broadcast_ssid=1")
-        
-        # Encryption configuration
-        if encryption == "open":
-            # No encryption
-            pass
-        elif encryption in ["wpa", "wpa2", "wpa3", "wpa2-wpa3"]:
-            if not password:
-                raise HostapdError(f"Password required for {encryption} encryption")
-            
-            config_lines.append("wpa=2")  # WPA2
-            config_lines.append(f"wpa_passphrase={password}")
-            config_lines.append("wpa_key_mgmt=WPA-PSK")
-            config_lines.append("rsn_pairwise=CCMP")
-            
-            # WPA3-specific settings
-            if encryption in ["wpa3", "wpa2-wpa3"]:
-                config_lines.append("ieee80211w=2")  # Management frame protection required
-                config_lines.append("wpa_key_mgmt=SAE")
-                
-                if encryption == "wpa2-wpa3":
-                    # Mixed mode
-                    config_lines.append("wpa_key_mgmt=WPA-PSK SAE")
-                    config_lines.append("ieee80211w=1")  # MFP optional for mixed
-        
-        # Additional recommended settings
-        config_lines.extend([
-            f"country_code={country_code}",
-            "ieee80211n=1",  # 802.11n support
-            "wmm_enabled=1",  # WMM/QoS
-        ])
-        
-        return "\n".join(config_lines) + "\n"
+        return template.format_map({
+            "interface": interface,
+            "ssid": ssid,
+            "channel": channel,
+            "password": password,
+            "country_code": country_code,
+        })
     
     def start(
         self,
@@ -125,6 +158,9 @@ class HostapdManager:
         """
         Start hostapd for an AP network.
         
+        A repeated call for a running network returns the existing instance
+        without touching the config file or the process.
+        
         Args:
             net_id: Network identifier
             interface: WiFi interface
@@ -152,10 +188,9 @@ class HostapdManager:
                 interface, ssid, channel, encryption, password, hidden, band, country_code
             )
             
-            # Write config file
+            # Write config file atomically (mode 0600: it holds the passphrase)
             config_file = os.path.join(HOSTAPD_CONFIG_DIR, f"hostapd-{net_id}.conf")
-            with open(config_file, "w") as f:
-                f.write(config_content)
+            write_file_atomic(config_file, config_content)
             
             logger.info(f"Generated hostapd config at {config_file}")
             
@@ -163,21 +198,18 @@ class HostapdManager:
             pid_file = os.path.join(HOSTAPD_PID_DIR, f"hostapd-{net_id}.pid")
             
             # Check hostapd is available
-            try:
-                execute_command(["which", "hostapd"])
-            except CommandError:
+            hostapd_bin = find_binary("hostapd")
+            if not hostapd_bin:
                 raise HostapdError("hostapd not installed")
             
             # Prepare interface for AP mode
             # This prevents hostapd from crashing due to interface state issues
             try:
                 logger.info(f"Preparing interface {interface} for AP mode")
-                # Bring interface down
-                execute_command(["ip", "link", "set", interface, "down"])
+                # Bring interface down and flush any IP addresses in one ip run
+                execute_ip_batch([f"link set {interface} down", f"addr flush dev {interface}"])
                 # Set to managed mode first (clean slate)
                 execute_iw(["dev", interface, "set", "type", "managed"])
-                # Flush any IP addresses
-                execute_command(["ip", "addr", "flush", "dev", interface])
                 # Leave interface DOWN - hostapd will bring it up itself
                 # Small delay to let interface stabilize
                 time.sleep(0.2)
@@ -189,7 +221,7 @@ class HostapdManager:
             try:
                 # Use -B for background mode and -P for pid file
                 execute_command([
-                    "hostapd",
+                    hostapd_bin,
                     "-B",  # Background
                     "-P", pid_file,  # PID file
                     config_file
@@ -198,8 +230,7 @@ class HostapdManager:
                 raise HostapdError(f"hostapd failed to start: {e}") from e
             
             # Verify process started
-            time.sleep(0.5)
-            if not os.path.exists(pid_file):
+            if not _wait_for_file(pid_file, PID_FILE_TIMEOUT):
                 raise HostapdError(f"hostapd pid file not created for {net_id}")
             
             logger.info(f"hostapd started for {net_id} on {interface}")
@@ -235,17 +266,13 @@ class HostapdManager:
             config_file = instance["config_file"]
             interface = instance.get("interface")
 
-            # Stop hostapd process
+            # Stop hostapd process (SIGTERM, escalating to SIGKILL)
             if pid_file and os.path.exists(pid_file):
                 try:
-                    with open(pid_file, "r") as f:
-                        pid = f.read().strip()
-                    if pid:
-                        execute_command(["kill", pid], check=False)
-                        logger.info(f"Sent SIGTERM to hostapd pid {pid}")
-                        time.sleep(0.3)
-                        # Force kill if still running
-                        execute_command(["kill", "-9", pid], check=False)
+                    pid = self._read_pid(pid_file)
+                    if pid > 0:
+                        terminate_process(pid)
+                        logger.info(f"Stopped hostapd pid {pid}")
                 except Exception as e:
                     logger.warning(f"Could not stop hostapd for {net_id}: {e}")
 
@@ -262,9 +289,12 @@ class HostapdManager:
             # Reset interface mode to managed to avoid lingering AP mode
             if interface:
                 try:
-                    execute_command(["ip", "link", "set", interface, "down"], check=False)
+                    try:
+                        execute_ip_batch([f"link set {interface} down", f"addr flush dev {interface}"])
+                    except CommandError as e:
+                        # -force already ran every line; just note the failure
+                        logger.debug(f"Interface reset of {interface} partly failed: {e}")
                     execute_command(["iw", "dev", interface, "set", "type", "managed"], check=False)
-                    execute_command(["ip", "addr", "flush", "dev", interface], check=False)
                     execute_command(["ip", "link", "set", interface, "up"], check=False)
                     logger.info(f"Reset interface {interface} to managed mode")
                 except Exception as e:
@@ -276,22 +306,30 @@ class HostapdManager:
         except Exception as e:
             logger.error(f"Error stopping hostapd for {net_id}: {e}")
     
+    @staticmethod
+    def _read_pid(pid_file: str) -> int:
+        """Return the pid stored in a hostapd pid file (0 if empty)."""
+        with open(pid_file, "rb") as f:
+            return int(f.read().strip() or b"0")
+    
     def is_running(self, net_id: str) -> bool:
         """Check if hostapd is running for a network."""
         if net_id not in self._instances:
             return False
         
         pid_file = self._instances[net_id].get("pid_file")
-        if not pid_file or not os.path.exists(pid_file):
+        if not pid_file:
             return False
         
         try:
-            with open(pid_file, "r") as f:
-                pid = f.read().strip()
-            # Check if process exists
-            execute_command(["kill", "-0", pid], check=True)
+            pid = self._read_pid(pid_file)
+            if pid <= 0:
+                return False
+            # Signal 0 only checks that the process exists
+            os.kill(pid, 0)
             return True
-        except (CommandError, FileNotFoundError):
+        except (OSError, ValueError):
+            # Missing pid file, no such process, or garbled pid
             return False
     
     def status(self) -> dict:
@@ -1,14 +1,53 @@
 import logging
+import os
+import re
+from typing import List, Optional, Set
 from ..network.commands import execute_command, execute_iw, CommandError
 
 logger = logging.getLogger(__name__)
 
+# sysfs view of network devices. Every cfg80211 (wireless) device has a
+# phy80211 link to its wiphy, so existence and wireless checks are a stat
+# instead of an ip/iw process.
+SYS_CLASS_NET = "/sys/class/net"
+
+# mac80211 debugfs: <phy>/netdev:<iface>/stations/ holds one directory per
+# associated station, named by its MAC. Only there when debugfs is mounted.
+DEBUGFS_IEEE80211 = "/sys/kernel/debug/ieee80211"
+
+# "wiphy 0" line of `iw <iface> info` (the sysfs-less fallback)
+_WIPHY_RE = re.compile(r"^\s*wiphy\s+(\d+)", re.MULTILINE | re.IGNORECASE)
+# "* AP" entry of the supported interface modes in `iw phyN info`; anchored
+# so "AP/VLAN", "#{ AP }" combination lines or words like "APSD" don't count
+_AP_MODE_RE = re.compile(r"^\s*\*\s*AP\s*$", re.MULTILINE)
+
+# Phys (e.g. "phy0") whose AP-mode support has been confirmed
+_ap_capable_phys: Set[str] = set()
+
 
 class InterfaceError(Exception):
     """Exception raised for interface validation failures."""
     pass
 
 
+def _sysfs_path(interface: str, *parts: str) -> Optional[str]:
+    """
+    Return the sysfs path of an interface attribute.
+    
+    Returns:
+        Path below SYS_CLASS_NET, or None when sysfs is not mounted (the
+        callers then fall back to ip/iw)
+    """
+    if not os.path.isdir(SYS_CLASS_NET):
+        return None
+    return os.path.join(SYS_CLASS_NET, interface, *parts)
+
+
+def _valid_name(interface: str) -> bool:
+    """Reject names that could point outside the interface's sysfs directory."""
+    return bool(interface) and "/" not in interface and interface not in (".", "..")
+
+
 def validate_interface_exists(interface: str) -> bool:
     """
     Check if network interface exists.
@@ -22,6 +61,14 @@ def validate_interface_exists(interface: str) -> bool:
     Raises:
         InterfaceError: If interface does not exist
     """
+    if not _valid_name(interface):
+        raise InterfaceError(f"Interface {interface} does not exist")
+    path = _sysfs_path(interface)
+    if path is not None:
+        if os.path.exists(path):
+            return True
+        raise InterfaceError(f"Interface {interface} does not exist")
+    
     try:
         output = execute_command(["ip", "link", "show", interface])
         return interface in output
@@ -42,17 +89,90 @@ def validate_interface_wireless(interface: str) -> bool:
     Raises:
         InterfaceError: If interface is not wireless
     """
+    if not _valid_name(interface):
+        raise InterfaceError(f"Interface {interface} is not wireless-capable")
+    path = _sysfs_path(interface, "phy80211")
+    if path is not None:
+        if os.path.exists(path):
+            return True
+        raise InterfaceError(f"Interface {interface} is not wireless-capable")
+    
     try:
-        output = execute_iw([interface, "info"])
-        return "wiphy" in output.lower() or "type" in output.lower()
+        # Only nl80211 devices report a "wiphy N" line
+        return bool(_WIPHY_RE.search(execute_iw([interface, "info"])))
     except CommandError:
         raise InterfaceError(f"Interface {interface} is not wireless-capable")
 
 
+def _wiphy_name(interface: str) -> Optional[str]:
+    """Return the wiphy (e.g. "phy0") behind an interface, read from sysfs."""
+    if not _valid_name(interface):
+        return None
+    path = _sysfs_path(interface, "phy80211")
+    if path is None:
+        return None
+    try:
+        return os.path.basename(os.readlink(path))
+    except OSError:
+        return None
+
+
+def get_wiphy(interface: str) -> str:
+    """
+    Return the wiphy (e.g. "phy0") an interface belongs to.
+    
+    Read from sysfs when mounted, otherwise taken from `iw <iface> info`.
+    
+    Args:
+        interface: Interface name
+        
+    Returns:
+        Name of the physical device
+        
+    Raises:
+        InterfaceError: If the wiphy cannot be determined
+        CommandError: If the iw fallback fails
+    """
+    wiphy = _wiphy_name(interface)
+    if wiphy is not None:
+        return wiphy
+    match = _WIPHY_RE.search(execute_iw([interface, "info"]))
+    if not match:
+        raise InterfaceError(f"Cannot determine wiphy for {interface}")
+    return "phy" + match.group(1)
+
+
+def list_station_macs(interface: str) -> Optional[List[str]]:
+    """
+    List the MACs of stations associated to an interface, read from debugfs.
+    
+    Args:
+        interface: Interface name
+        
+    Returns:
+        Lowercase MAC addresses, or None when debugfs (or the interface's
+        entry in it) is not available; callers then use `iw station dump`
+    """
+    wiphy = _wiphy_name(interface)
+    if wiphy is None:
+        return None
+    path = os.path.join(DEBUGFS_IEEE80211, wiphy, f"netdev:{interface}", "stations")
+    try:
+        return [name.lower() for name in os.listdir(path)]
+    except OSError:
+        return None
+
+
 def validate_interface_ap_mode(interface: str) -> bool:
     """
     Check if interface supports AP mode.
     
+    AP support is a property of the phy, so a positive answer is remembered
+    per phy and shared by every interface on it. Capabilities are fixed
+    while the driver is loaded, and a re-plugged adapter or reloaded driver
+    comes back as a new phyN, so entries cannot go stale. Failures are never
+    cached.
+    
     Args:
         interface: Interface name
         
@@ -62,34 +182,35 @@ def validate_interface_ap_mode(interface: str) -> bool:
     Raises:
         InterfaceError: If AP mode not supported
     """
+    wiphy = _wiphy_name(interface)
+    if wiphy is not None and wiphy in _ap_capable_phys:
+        return True
+    
     try:
-        # Get physical device (phy) for the interface
-        info_output = execute_iw([interface, "info"])
-        
-        # Extract wiphy number
-        wiphy = None
-        for line in info_output.split('\n'):
-            if 'wiphy' in line.lower():
-                parts = line.split()
-                if len(parts) >= 2:
-                    wiphy = parts[1]
-                    break
-        
-        if not wiphy:
-            raise InterfaceError(f"Cannot determine wiphy for {interface}")
+        if wiphy is None:
+            # No sysfs: ask iw for the physical device (phy) of the interface
+            wiphy = get_wiphy(interface)
+            if wiphy in _ap_capable_phys:
+                return True
         
         # Check supported interface modes
-        phy_output = execute_iw(["phy" + wiphy, "info"])
+        phy_output = execute_iw([wiphy, "info"])
         
-        if "AP" not in phy_output:
+        if not _AP_MODE_RE.search(phy_output):
             raise InterfaceError(f"Interface {interface} does not support AP mode")
         
+        _ap_capable_phys.add(wiphy)
         return True
         
     except CommandError as e:
         raise InterfaceError(f"Cannot validate AP mode for {interface}: {e}")
 
 
+def clear_interface_cache() -> None:
+    """Forget confirmed AP-mode support (e.g. after manual iw/modprobe changes)."""
+    _ap_capable_phys.clear()
+
+
 def validate_interface(interface: str) -> None:
     """
     Comprehensive validation of WiFi interface for AP mode.
@@ -1,23 +1,40 @@
+import heapq
 import time
 import logging
 import os
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Set, Tuple
 from ipaddress import IPv4Network
 from datetime import datetime, timezone
 import re
 import threading
-from ..config import AppConfig
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from ..config import AppConfig, NetworkEntry
 from ..models import NetworkCreateRequest, NetworkStatus, ClientInfo, NetworkTxPower
 from ..network.dhcp import DhcpServer, DhcpServerError
 from ..network.nat import NatManager
 from ..network.isolation import IsolationManager
 from .hostapd import HostapdManager, HostapdError
 from .channels import ChannelManager
-from .interface import validate_interface_exists, validate_interface_wireless, validate_interface_ap_mode, InterfaceError
+from .interface import (
+    validate_interface_exists,
+    validate_interface_wireless,
+    validate_interface_ap_mode,
+    list_station_macs,
+    InterfaceError,
+)
 from ..network.commands import execute_iw, execute_command, CommandError
 
 logger = logging.getLogger(__name__)
 
+# `iw dev <if> info` line, e.g. "txpower 20.00 dBm"
+_TXPOWER_RE = re.compile(r"txpower\s+([\d.]+)\s+dBm", re.ASCII)
+
+# `iw dev <if> station dump` entry header, e.g. "Station aa:bb:cc:dd:ee:ff (on wlan0)"
+_STATION_RE = re.compile(r"^\s*Station\s+(\S+)", re.MULTILINE | re.ASCII)
+
+# dnsmasq lease line: "<expiry> <mac> <ip> <hostname> <client-id>"
+_LEASE_RE = re.compile(rb"^[ \t]*(\d+)[ \t]+(\S+)[ \t]+(\S+)", re.MULTILINE)
+
 
 class TxPowerMismatchError(Exception):
     """Raised when reported TX power does not match the requested level."""
@@ -25,9 +42,27 @@ class TxPowerMismatchError(Exception):
 
 class NetworkManager:
     """Manages WiFi AP network lifecycle including DHCP, NAT, and isolation."""
+
+    # Seconds a live status probe (DHCP, clients, TX power) is reused before
+    # get_status() queries the system again.
+    STATUS_CACHE_TTL = 1.0
+
+    # Upper bound on one expiry-thread sleep, so a wall-clock step (e.g. NTP
+    # sync after boot) is noticed without waiting for the original deadline.
+    EXPIRY_MAX_WAIT = 60.0
+
+    # TX power verification: how long the driver gets to report the new
+    # level, and how often it is read meanwhile.
+    TX_POWER_VERIFY_TIMEOUT = 3.0
+    TX_POWER_VERIFY_INTERVAL = 0.15
     
     def __init__(self, config: AppConfig):
         self.config = config
+        self._networks_by_id: Dict[str, NetworkEntry] = {}
+        self._network_index: Dict[str, int] = {}
+        # device_id -> (subnet, gateway IP), derived once from dhcp_base_network
+        self._subnet_cache: Dict[str, Tuple[str, str]] = {}
+        self._index_networks()
         self.active: Dict[str, NetworkStatus] = {}
         self.dhcp_server = DhcpServer()
         self.nat_manager = NatManager(upstream_interface=config.upstream_interface)
@@ -35,12 +70,37 @@ class NetworkManager:
         self.isolation_manager = IsolationManager()
         self._channel_manager = ChannelManager()
         self.qos_manager: object | None = None  # injected by dependencies
+        # Writer lock for self.active and _starting; single-key reads go without it
         self._lock = threading.Lock()
-        # Background expiry checker to auto-stop networks at timeout
+        # Device ids with a start_network in progress, so a concurrent start
+        # of the same device is refused instead of racing DHCP/hostapd
+        self._starting: Set[str] = set()
+        # Serializes NAT and isolation updates: both read the current rules
+        # or subnets and then change them, and requests run on a thread pool
+        self._firewall_lock = threading.Lock()
+        self._status_refreshed_at: Dict[str, float] = {}
+        # lease file -> (mtime_ns, size, {mac: (ip, expiry)}); dnsmasq only
+        # rewrites the file when a lease changes
+        self._lease_cache: Dict[str, Tuple[int, int, Dict[str, Tuple[str, int]]]] = {}
+        # Runs iw probes that get_status can overlap with the station dump
+        self._probe_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wilab-probe")
+        # Background expiry checker to auto-stop networks at timeout: a min-heap
+        # of (expires_at, device_id), woken when start_network adds an entry
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expiry_cv = threading.Condition(self._lock)
         self._expiry_thread = threading.Thread(target=self._expiry_loop, daemon=True)
         self._expiry_thread.start()
         logger.info("NetworkManager initialized")
 
+    def _index_networks(self) -> None:
+        """Rebuild the device_id lookups over self.config.networks.
+
+        Call again whenever the configured networks change.
+        """
+        self._networks_by_id = {n.device_id: n for n in self.config.networks}
+        self._network_index = {n.device_id: i for i, n in enumerate(self.config.networks)}
+        self._subnet_cache = {}
+
     def _configure_networkmanager_unmanaged(self, interface: str) -> None:
         """Best-effort: ask NetworkManager to stop managing AP interface."""
         try:
@@ -54,13 +114,31 @@ class NetworkManager:
             # Drop any active NM connection on the device to release control quickly.
             execute_command(["nmcli", "device", "disconnect", interface], check=False)
             time.sleep(0.2)
-            logger.info(f"Configured {interface} as unmanaged in NetworkManager")
+            logger.info("Configured %s as unmanaged in NetworkManager", interface)
         except CommandError as e:
-            logger.warning(f"Could not configure NetworkManager unmanaged for {interface}: {e}")
+            logger.warning("Could not configure NetworkManager unmanaged for %s: %s", interface, e)
 
     def _get_subnet(self, device_id: str) -> str:
         """Assign a /24 subnet by incrementing the third octet from dhcp_base_network."""
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        return self._get_subnet_and_gateway(device_id)[0]
+
+    def _get_subnet_and_gateway(self, device_id: str) -> Tuple[str, str]:
+        """
+        Return the /24 subnet of a network and its .1 gateway address.
+
+        The pair is computed on first use and cached per device_id.
+
+        Returns:
+            Tuple of (subnet, gateway_ip), e.g. ("192.168.120.0/24", "192.168.120.1")
+
+        Raises:
+            ValueError: If device_id is unknown or the subnet cannot be allocated
+        """
+        cached = self._subnet_cache.get(device_id)
+        if cached is not None:
+            return cached
+
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
 
@@ -68,17 +146,18 @@ class NetworkManager:
         if base_net.prefixlen != 24:
             raise ValueError("dhcp_base_network must be a /24 network")
 
-        try:
-            idx = [n.device_id for n in self.config.networks].index(device_id)
-        except ValueError as exc:
-            raise ValueError("Unknown device_id for subnet allocation") from exc
+        idx = self._network_index[device_id]
 
         octets = str(base_net.network_address).split('.')
         third_octet = int(octets[2]) + idx
         if third_octet > 255:
             raise ValueError(f"Cannot allocate subnet for {device_id}: octet overflow")
         octets[2] = str(third_octet)
-        return '.'.join(octets) + '/24'
+        subnet = '.'.join(octets) + '/24'
+        octets[3] = '1'
+        gateway_ip = '.'.join(octets)
+        self._subnet_cache[device_id] = (subnet, gateway_ip)
+        return subnet, gateway_ip
 
     def start_network(
         self, device_id: str, req: NetworkCreateRequest, expires_at_timestamp: float | None = None
@@ -94,20 +173,35 @@ class NetworkManager:
         Returns:
             NetworkStatus with active network details
         """
-        logger.info(f"Starting network {device_id} with SSID '{req.ssid}'")
+        logger.info("Starting network %s with SSID '%s'", device_id, req.ssid)
         
         # Validate device_id exists in config
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
         
-        # Check if network is already active (check both self.active and hostapd)
-        if device_id in self.active:
-            raise ValueError(f"Network {device_id} is already active. Stop it first before creating a new one.")
-        
+        # Check if network is already active or being started, and claim it
+        with self._lock:
+            if device_id in self.active or device_id in self._starting:
+                raise ValueError(f"Network {device_id} is already active. Stop it first before creating a new one.")
+            self._starting.add(device_id)
+        try:
+            return self._start_network(device_id, cfg_net, req, expires_at_timestamp)
+        finally:
+            with self._lock:
+                self._starting.discard(device_id)
+    
+    def _start_network(
+        self,
+        device_id: str,
+        cfg_net: NetworkEntry,
+        req: NetworkCreateRequest,
+        expires_at_timestamp: Optional[float],
+    ) -> NetworkStatus:
+        """Bring up a network claimed by start_network (see there)."""
         # Also check if hostapd is running (in case network was marked inactive but processes still running)
         if self.hostapd_manager.is_running(device_id):
-            logger.warning(f"hostapd is running for {device_id} but network not in active dict, cleaning up")
+            logger.warning("hostapd is running for %s but network not in active dict, cleaning up", device_id)
             self.stop_network(device_id)
         
         # Expiration: from reservation timestamp, or None for unlimited
@@ -116,17 +210,17 @@ class NetworkManager:
         else:
             expires_at_str = None
         
-        # Get subnet (from config or calculated)
-        subnet = self._get_subnet(device_id)
+        # Get subnet and its .1 gateway (calculated once per device_id)
+        subnet, gateway_ip = self._get_subnet_and_gateway(device_id)
         
         # Validate interface
-        logger.info(f"Validating interface {cfg_net.interface}")
+        logger.info("Validating interface %s", cfg_net.interface)
         try:
             validate_interface_exists(cfg_net.interface)
             validate_interface_wireless(cfg_net.interface)
             validate_interface_ap_mode(cfg_net.interface)
         except InterfaceError as e:
-            logger.error(f"Interface validation failed: {e}")
+            logger.error("Interface validation failed: %s", e)
             raise ValueError(str(e)) from e
 
         # Determine internet enabled status
@@ -147,9 +241,9 @@ class NetworkManager:
                 subnet=subnet,
                 dns_server=self.config.dns_server
             )
-            logger.info(f"DHCP server started: {dhcp_info}")
+            logger.info("DHCP server started: %s", dhcp_info)
         except DhcpServerError as e:
-            logger.error(f"Failed to start DHCP server: {e}")
+            logger.error("Failed to start DHCP server: %s", e)
             raise ValueError(f"Failed to configure DHCP: {e}") from e
         
         # Start hostapd for AP mode
@@ -165,9 +259,9 @@ class NetworkManager:
                 band=req.band,
                 country_code=self.config.country_code,
             )
-            logger.info(f"hostapd started: {hostapd_info}")
+            logger.info("hostapd started: %s", hostapd_info)
         except HostapdError as e:
-            logger.error(f"Failed to start hostapd: {e}")
+            logger.error("Failed to start hostapd: %s", e)
             # Rollback DHCP
             try:
                 self.dhcp_server.stop(device_id)
@@ -176,22 +270,13 @@ class NetworkManager:
             raise ValueError(f"Failed to start AP: {e}") from e
 
         # Assign gateway IP (.1) to interface AFTER hostapd starts (hostapd resets the interface)
-        # subnet is e.g. "192.168.120.0/24", gateway must be .1
-        from ipaddress import IPv4Network as IPv4Net
         from ..network.commands import execute_ip, CommandError
-        net = IPv4Net(subnet, strict=False)
-        gateway_ip = str(net.network_address + 1)  # .1 of the subnet
         try:
-            # Check if IP is already present
-            ip_addr_output = execute_ip(["addr", "show", cfg_net.interface])
-            if gateway_ip not in ip_addr_output:
-                logger.info(f"Assigning gateway IP {gateway_ip}/24 to interface {cfg_net.interface}")
-                execute_ip(["addr", "add", f"{gateway_ip}/24", "dev", cfg_net.interface])
-                logger.info(f"Gateway IP {gateway_ip}/24 assigned to {cfg_net.interface}")
-            else:
-                logger.info(f"Gateway IP {gateway_ip}/24 already present on {cfg_net.interface}")
+            # `addr replace` is idempotent: one exec whether or not the IP is present
+            execute_ip(["addr", "replace", f"{gateway_ip}/24", "dev", cfg_net.interface])
+            logger.info("Gateway IP %s/24 assigned to %s", gateway_ip, cfg_net.interface)
         except CommandError as e:
-            logger.error(f"Failed to assign gateway IP: {e}")
+            logger.error("Failed to assign gateway IP: %s", e)
             # Rollback hostapd and DHCP
             try:
                 self.hostapd_manager.stop(device_id)
@@ -205,9 +290,9 @@ class NetworkManager:
         try:
             self._set_tx_power(cfg_net.interface, tx_power_level, req.channel)
             runtime_dbm = self._read_current_txpower(cfg_net.interface)
-            logger.info(f"TX power set for {device_id}: requested level {tx_power_level}, runtime reported {runtime_dbm} dBm")
+            logger.info("TX power set for %s: requested level %s, runtime reported %s dBm", device_id, tx_power_level, runtime_dbm)
         except Exception as e:
-            logger.warning(f"Failed to set TX power for {device_id}: {e}")
+            logger.warning("Failed to set TX power for %s: %s", device_id, e)
         
         # Create status object
         expires_in = int(expires_at_timestamp - time.time()) if expires_at_timestamp is not None else None
@@ -229,27 +314,32 @@ class NetworkManager:
         # Store internal timestamp for expiration checking
         object.__setattr__(status, '_expires_at_timestamp', expires_at_timestamp)  # type: ignore[attr-defined]
         
-        self.active[device_id] = status
+        self._status_refreshed_at.pop(device_id, None)
+        with self._lock:
+            self.active[device_id] = status
+        if expires_at_timestamp is not None:
+            self._schedule_expiry(device_id, expires_at_timestamp)
         
-        # Enable NAT if internet access is enabled
-        if internet_enabled:
+        with self._firewall_lock:
+            # Enable NAT if internet access is enabled
+            if internet_enabled:
+                try:
+                    self.nat_manager.enable_nat(cfg_net.interface, device_id)
+                    logger.info("NAT enabled for %s", device_id)
+                except Exception as e:
+                    logger.error("Failed to enable NAT for %s: %s", device_id, e)
+                    # Don't fail network creation if NAT fails, just log
+            
+            # Apply isolation rules to prevent inter-network traffic
             try:
-                self.nat_manager.enable_nat(cfg_net.interface, device_id)
-                logger.info(f"NAT enabled for {device_id}")
+                self.isolation_manager.add_network(subnet)
+                logger.info("Isolation rules applied for %s (%s)", device_id, subnet)
             except Exception as e:
-                logger.error(f"Failed to enable NAT for {device_id}: {e}")
-                # Don't fail network creation if NAT fails, just log
-        
-        # Apply isolation rules to prevent inter-network traffic
-        try:
-            self.isolation_manager.add_network(subnet)
-            logger.info(f"Isolation rules applied for {device_id} ({subnet})")
-        except Exception as e:
-            logger.error(f"Failed to apply isolation rules for {device_id}: {e}")
+                logger.error("Failed to apply isolation rules for %s: %s", device_id, e)
         #     # Don't fail network creation if isolation fails
-        logger.info(f"Isolation disabled for testing (network {device_id})")
+        logger.info("Isolation disabled for testing (network %s)", device_id)
         
-        logger.info(f"Network {device_id} started successfully (expires at {expires_at_str})")
+        logger.info("Network %s started successfully (expires at %s)", device_id, expires_at_str)
         
         return status
 
@@ -260,53 +350,54 @@ class NetworkManager:
         Args:
             device_id: Device identifier (interface name)
         """
-        logger.info(f"Stopping network {device_id}")
+        logger.info("Stopping network %s", device_id)
         
         # Get interface and subnet before removing from active dict
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
-        subnet = self.active[device_id].subnet if device_id in self.active else None
+        cfg_net = self._networks_by_id.get(device_id)
+        st = self.active.get(device_id)
+        subnet = st.subnet if st else None
         
         # Clear QoS rules before tearing down the network
         if cfg_net and self.qos_manager is not None:
             try:
                 self.qos_manager.clear_qos(cfg_net.interface)  # type: ignore[attr-defined]
             except Exception as e:
-                logger.error(f"Error clearing QoS rules: {e}")
+                logger.error("Error clearing QoS rules: %s", e)
 
         # Stop hostapd
         try:
             self.hostapd_manager.stop(device_id)
         except Exception as e:
-            logger.error(f"Error stopping hostapd: {e}")
-        
-        # Disable NAT if it was enabled
-        if device_id in self.active and self.active[device_id].internet_enabled and cfg_net:
-            try:
-                self.nat_manager.disable_nat(cfg_net.interface, device_id)
-            except Exception as e:
-                logger.error(f"Error disabling NAT: {e}")
+            logger.error("Error stopping hostapd: %s", e)
         
-        # Remove isolation rules
-        if subnet:
-            try:
-                self.isolation_manager.remove_network(subnet)
-                logger.info(f"Isolation rules removed for {device_id} ({subnet})")
-            except Exception as e:
-                logger.error(f"Error removing isolation rules: {e}")
+        with self._firewall_lock:
+            # Disable NAT if it was enabled
+            if st and st.internet_enabled and cfg_net:
+                try:
+                    self.nat_manager.disable_nat(cfg_net.interface, device_id)
+                except Exception as e:
+                    logger.error("Error disabling NAT: %s", e)
+            
+            # Remove isolation rules
+            if subnet:
+                try:
+                    self.isolation_manager.remove_network(subnet)
+                    logger.info("Isolation rules removed for %s (%s)", device_id, subnet)
+                except Exception as e:
+                    logger.error("Error removing isolation rules: %s", e)
         
         # Stop DHCP server
         try:
             self.dhcp_server.stop(device_id)
         except Exception as e:
-            logger.error(f"Error stopping DHCP server: {e}")
+            logger.error("Error stopping DHCP server: %s", e)
         
         # Remove from active dict
-        if device_id in self.active:
-            with self._lock:
-                if device_id in self.active:
-                    del self.active[device_id]
+        self._status_refreshed_at.pop(device_id, None)
+        with self._lock:
+            self.active.pop(device_id, None)
         
-        logger.info(f"Network {device_id} stopped")
+        logger.info("Network %s stopped", device_id)
 
     def get_status(self, device_id: str) -> Optional[NetworkStatus]:
         """
@@ -322,24 +413,33 @@ class NetworkManager:
         st = self.active.get(device_id)
         if not st:
             # Return inactive status if known device_id
-            cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+            cfg_net = self._networks_by_id.get(device_id)
             if not cfg_net:
                 return None
             return NetworkStatus(interface=cfg_net.interface, active=False)
         
         # Check if network has expired (use internal timestamp)
-        if hasattr(st, '_expires_at_timestamp') and st._expires_at_timestamp is not None and st._expires_at_timestamp < time.time():
-            logger.info(f"Network {device_id} expired, stopping")
+        expires_at = getattr(st, '_expires_at_timestamp', None)
+        wall_now = time.time()
+        if expires_at is not None and expires_at < wall_now:
+            logger.info("Network %s expired, stopping", device_id)
             self.stop_network(device_id)
-            cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+            cfg_net = self._networks_by_id.get(device_id)
             if not cfg_net:
                 return None
             return NetworkStatus(interface=cfg_net.interface, active=False)
-        if hasattr(st, '_expires_at_timestamp') and st._expires_at_timestamp is not None:
-            st.expires_in = max(0, int(st._expires_at_timestamp - time.time()))
-        
-        # Add DHCP info and clients if active
-        if st.active:
+        if expires_at is not None:
+            st.expires_in = max(0, int(expires_at - wall_now))
+        
+        # Add DHCP info and clients if active (reused while fresh)
+        now = time.monotonic()
+        refreshed_at = self._status_refreshed_at.get(device_id)
+        if st.active and (refreshed_at is None or now - refreshed_at >= self.STATUS_CACHE_TTL):
+            # The txpower read and the station dump are independent iw calls:
+            # start the former on a worker so both run at the same time.
+            txpower_future: Optional[Future[Optional[float]]] = None
+            if st.tx_power_level is not None and st.channel is not None:
+                txpower_future = self._probe_executor.submit(self._read_current_txpower, st.interface)
             dhcp_info = self.dhcp_server.get_subnet_info(device_id)
             clients = self.list_clients(device_id)
             st.dhcp = dhcp_info if dhcp_info else {}
@@ -349,24 +449,22 @@ class NetworkManager:
             if st.tx_power_level is not None:
                 reported_level: int | None = None
                 reported_dbm: float | None = None
-                if st.channel is not None:
+                # txpower_future is only started when the channel is known
+                if txpower_future is not None and st.channel is not None:
                     try:
                         caps = self._get_channel_capabilities(st.interface, st.channel)
                         levels_dbm = self._compute_level_dbm(caps["max_dbm"])
-                        reported_dbm = self._read_current_txpower(st.interface)
-                        if reported_dbm is not None:
-                            reported_level = min(
-                                levels_dbm,
-                                key=lambda lvl: abs(levels_dbm[lvl] - reported_dbm),  # type: ignore[operator]
-                            )
+                        reported_dbm = txpower_future.result()
+                        reported_level = self._reported_level_from_dbm(levels_dbm, reported_dbm)
                     except Exception as exc:
-                        logger.warning(f"Failed to build tx_power status for {device_id}: {exc}")
+                        logger.warning("Failed to build tx_power status for %s: %s", device_id, exc)
 
                 st.tx_power = NetworkTxPower(
                     requested_level=st.tx_power_level,
                     reported_level=reported_level,
                     reported_dbm=reported_dbm,
                 )
+            self._status_refreshed_at[device_id] = now
         
         return st
 
@@ -385,6 +483,45 @@ class NetworkManager:
             "clients": [c.model_dump() if hasattr(c, "model_dump") else c for c in clients],
         }
 
+    def _active_status(self, device_id: str) -> Optional[NetworkStatus]:
+        """
+        Return the in-memory status of an active network without live probes.
+
+        Unlike get_status this does not refresh clients or read TX power, so
+        callers that only need the stored configuration avoid the iw calls.
+        Expired networks are stopped, as get_status would do.
+
+        Returns:
+            NetworkStatus, or None if the network is not active
+        """
+        st = self.active.get(device_id)
+        if st is None or not st.active:
+            return None
+        expires_at = getattr(st, '_expires_at_timestamp', None)
+        if expires_at is not None and expires_at < time.time():
+            logger.info("Network %s expired, stopping", device_id)
+            self.stop_network(device_id)
+            return None
+        return st
+
+    def internet_state(self, device_id: str) -> Optional[bool]:
+        """
+        Return the cached Internet flag of an active, unexpired network.
+
+        Cheap in-memory check (no probes or shell-outs) used to short-circuit
+        enable/disable requests that would not change anything.
+
+        Returns:
+            internet_enabled, or None if the network is not active or expired
+        """
+        st = self.active.get(device_id)
+        if st is None or not st.active:
+            return None
+        expires_at = getattr(st, '_expires_at_timestamp', None)
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return st.internet_enabled
+
     def enable_internet(self, device_id: str) -> NetworkStatus:
         """
         Enable Internet access for a network (NAT forwarding).
@@ -395,31 +532,29 @@ class NetworkManager:
         Returns:
             Updated NetworkStatus
         """
-        logger.info(f"Enabling Internet for network {device_id}")
+        logger.info("Enabling Internet for network %s", device_id)
         
         st = self.get_status(device_id)
         if not st or not st.active:
             raise ValueError("Unknown or inactive device_id")
         
         # Get interface for NAT rules
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
         
         # Enable NAT if not already enabled
-        if not st.internet_enabled:
-            try:
-                self.nat_manager.enable_nat(cfg_net.interface, device_id)
-                logger.info(f"NAT rules applied for {device_id}")
-            except Exception as e:
-                logger.error(f"Failed to enable NAT: {e}")
-                raise RuntimeError(f"Cannot enable Internet: {e}") from e
-        
-        st.internet_enabled = True
-        if hasattr(st, '_expires_at_timestamp') and st._expires_at_timestamp is not None:
-            st.expires_in = max(0, int(st._expires_at_timestamp - time.time()))
-        self.active[device_id] = st
-        logger.info(f"Internet enabled for {device_id}")
+        with self._firewall_lock:
+            if not st.internet_enabled:
+                try:
+                    self.nat_manager.enable_nat(cfg_net.interface, device_id)
+                    logger.info("NAT rules applied for %s", device_id)
+                except Exception as e:
+                    logger.error("Failed to enable NAT: %s", e)
+                    raise RuntimeError(f"Cannot enable Internet: {e}") from e
+            
+            st.internet_enabled = True
+        logger.info("Internet enabled for %s", device_id)
         
         return st
 
@@ -433,31 +568,29 @@ class NetworkManager:
         Returns:
             Updated NetworkStatus
         """
-        logger.info(f"Disabling Internet for network {device_id}")
+        logger.info("Disabling Internet for network %s", device_id)
         
         st = self.get_status(device_id)
         if not st or not st.active:
             raise ValueError("Unknown or inactive device_id")
         
         # Get interface for NAT rules
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
         
         # Disable NAT if currently enabled
-        if st.internet_enabled:
-            try:
-                self.nat_manager.disable_nat(cfg_net.interface, device_id)
-                logger.info(f"NAT rules removed for {device_id}")
-            except Exception as e:
-                logger.error(f"Failed to disable NAT: {e}")
-                # Continue anyway to update state
-        
-        st.internet_enabled = False
-        if hasattr(st, '_expires_at_timestamp') and st._expires_at_timestamp is not None:
-            st.expires_in = max(0, int(st._expires_at_timestamp - time.time()))
-        self.active[device_id] = st
-        logger.info(f"Internet disabled for {device_id}")
+        with self._firewall_lock:
+            if st.internet_enabled:
+                try:
+                    self.nat_manager.disable_nat(cfg_net.interface, device_id)
+                    logger.info("NAT rules removed for %s", device_id)
+                except Exception as e:
+                    logger.error("Failed to disable NAT: %s", e)
+                    # Continue anyway to update state
+            
+            st.internet_enabled = False
+        logger.info("Internet disabled for %s", device_id)
         
         return st
 
@@ -475,65 +608,85 @@ class NetworkManager:
         clients: list[ClientInfo] = []
         
         # Get interface for this network
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             return clients
         
         interface = cfg_net.interface
         
-        # Get currently associated stations using iw (real-time)
-        try:
-            station_output = execute_iw(["dev", interface, "station", "dump"])
-        except Exception as e:
-            logger.warning(f"Could not get station dump for {interface}: {e}")
-            return clients
+        # Get currently associated stations (real-time): from debugfs when
+        # mounted, otherwise from iw
+        connected_macs = list_station_macs(interface)
+        if connected_macs is None:
+            try:
+                station_output = execute_iw(["dev", interface, "station", "dump"])
+            except Exception as e:
+                logger.warning("Could not get station dump for %s: %s", interface, e)
+                return clients
 
-        # Parse iw station dump output to extract MAC addresses
-        # Format: "Station xx:xx:xx:xx:xx:xx (on wlanX)" followed by stats
-        connected_macs = []
-        for line in station_output.splitlines():
-            line = line.strip()
-            if line.startswith("Station "):
-                parts = line.split()
-                if len(parts) >= 2:
-                    mac = parts[1].lower()
-                    connected_macs.append(mac)
+            # Parse iw station dump output to extract MAC addresses
+            # Format: "Station xx:xx:xx:xx:xx:xx (on wlanX)" followed by stats
+            connected_macs = [mac.lower() for mac in _STATION_RE.findall(station_output)]
 
         if not connected_macs:
             return clients
 
-        # Build MAC -> IP mapping from DHCP lease file (only valid leases)
-        mac_to_ip = {}
-        now = int(time.time())
+        # MAC -> (IP, expiry) mapping from the DHCP lease file
+        leases: Dict[str, Tuple[str, int]] = {}
         dhcp_info = self.dhcp_server.get_subnet_info(device_id)
         if dhcp_info:
             lease_file = dhcp_info.get('lease_file')
-            if lease_file and os.path.exists(lease_file):
-                try:
-                    with open(lease_file, 'r') as f:
-                        for line in f:
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                try:
-                                    lease_expiry = int(parts[0])
-                                except Exception:
-                                    continue
-                                # Only include valid (non-expired) leases
-                                if lease_expiry > now:
-                                    mac = parts[1].lower()
-                                    ip = parts[2]
-                                    mac_to_ip[mac] = ip
-                except Exception as e:
-                    logger.warning(f"Could not read lease file: {e}")
+            if lease_file:
+                leases = self._read_leases(lease_file)
 
         # Build client list: only include clients with BOTH WiFi association AND valid DHCP lease
+        now = int(time.time())
         for mac in connected_macs:
-            client_ip = mac_to_ip.get(mac)
-            if client_ip:  # Only count as connected if they have a valid IP lease
-                clients.append(ClientInfo(mac=mac, ip=client_ip))
+            lease = leases.get(mac)
+            if lease and lease[1] > now:  # Only count as connected if they have a valid IP lease
+                clients.append(ClientInfo(mac=mac, ip=lease[0]))
         
         return clients
 
+    def _read_leases(self, lease_file: str) -> Dict[str, Tuple[str, int]]:
+        """
+        Parse a dnsmasq lease file into {mac: (ip, expiry)}.
+
+        The parsed mapping is reused while the file's mtime and size are
+        unchanged, so a poll normally costs a single stat. Expiry is not
+        filtered here; callers compare it against the current time.
+
+        Args:
+            lease_file: Path to the dnsmasq lease file
+
+        Returns:
+            Mapping of lowercase MAC address to (IP, expiry epoch); empty if
+            the file is missing or unreadable
+        """
+        try:
+            st = os.stat(lease_file)
+        except OSError:
+            self._lease_cache.pop(lease_file, None)
+            return {}
+
+        cached = self._lease_cache.get(lease_file)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        try:
+            with open(lease_file, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning("Could not read lease file: %s", e)
+            return {}
+
+        leases = {
+            m.group(2).decode(errors='replace').lower(): (m.group(3).decode(errors='replace'), int(m.group(1)))
+            for m in _LEASE_RE.finditer(data)
+        }
+        self._lease_cache[lease_file] = (st.st_mtime_ns, st.st_size, leases)
+        return leases
+
     def services_status(self) -> dict:
         """Return minimal service status (dnsmasq, hostapd, iptables)."""
         return {
@@ -543,14 +696,24 @@ class NetworkManager:
         }
     
     def shutdown_all(self) -> None:
-        """Shutdown all active networks."""
+        """
+        Shutdown all active networks.
+
+        Networks are stopped in parallel: most of stop_network is spent
+        waiting on hostapd/dnsmasq processes, which overlap across threads.
+        """
         logger.info("Shutting down all networks")
         device_ids = list(self.active.keys())
-        for device_id in device_ids:
-            try:
-                self.stop_network(device_id)
-            except Exception as e:
-                logger.error(f"Error stopping {device_id}: {e}")
+        if device_ids:
+            with ThreadPoolExecutor(
+                max_workers=min(len(device_ids), 8), thread_name_prefix="wilab-shutdown"
+            ) as executor:
+                futures = {executor.submit(self.stop_network, device_id): device_id for device_id in device_ids}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error("Error stopping %s: %s", futures[future], e)
         logger.info("All networks shut down")
 
     # ---- TX power management ----
@@ -559,42 +722,37 @@ class NetworkManager:
         """Read current TX power from interface in dBm. Returns None if unavailable."""
         try:
             output = execute_iw(["dev", interface, "info"])
-            # Look for: txpower 20.00 dBm or txpower 5.00 dBm
-            pattern = re.compile(r"txpower\s+([\d.]+)\s+dBm")
-            for line in output.splitlines():
-                m = pattern.search(line)
-                if m:
-                    return float(m.group(1))
+            m = _TXPOWER_RE.search(output)
+            if m:
+                return float(m.group(1))
         except Exception as e:
-            logger.warning(f"Failed to read current txpower for {interface}: {e}")
+            logger.warning("Failed to read current txpower for %s: %s", interface, e)
         return None
 
     def _get_channel_capabilities(self, interface: str, channel: int) -> dict:
-        info = self._channel_manager.get_channels(interface)
-        for ch in info.channels_24ghz + info.channels_5ghz:
-            if ch.channel == channel:
-                return {"frequency_mhz": ch.frequency_mhz, "max_dbm": ch.max_power_dbm}
-        raise ValueError(f"Channel {channel} not supported on interface {interface}")
-
-    def _compute_level_dbm(self, max_dbm: float) -> Dict[int, float]:
-        # Linearly split max power into four steps
-        levels = {
-            1: round(max_dbm * 0.25, 1),
-            2: round(max_dbm * 0.50, 1),
-            3: round(max_dbm * 0.75, 1),
-            4: round(max_dbm, 1),
-        }
-        # Ensure monotonic and at least 1 dBm for lower steps
-        levels[1] = max(1.0, levels[1])
-        levels[2] = max(levels[1], levels[2])
-        levels[3] = max(levels[2], levels[3])
-        levels[4] = max(levels[3], levels[4])
-        return levels
-
-    def _reported_level_from_dbm(self, levels_dbm: Dict[int, float], reported_dbm: Optional[float]) -> Optional[int]:
+        ch = self._channel_manager.get_channels(interface).find(channel)
+        if ch is None:
+            raise ValueError(f"Channel {channel} not supported on interface {interface}")
+        return {"frequency_mhz": ch.frequency_mhz, "max_dbm": ch.max_power_dbm}
+
+    def _compute_level_dbm(self, max_dbm: float) -> Tuple[float, float, float, float, float]:
+        # Linearly split max power into four steps, indexed by level (slot 0
+        # unused). Ensure monotonic and at least 1 dBm for lower steps.
+        level1 = max(1.0, round(max_dbm * 0.25, 1))
+        level2 = max(level1, round(max_dbm * 0.50, 1))
+        level3 = max(level2, round(max_dbm * 0.75, 1))
+        level4 = max(level3, round(max_dbm, 1))
+        return (0.0, level1, level2, level3, level4)
+
+    @staticmethod
+    def _levels_dict(levels_dbm: Tuple[float, ...]) -> Dict[int, float]:
+        """Level -> dBm mapping as reported in API responses."""
+        return {lvl: levels_dbm[lvl] for lvl in range(1, 5)}
+
+    def _reported_level_from_dbm(self, levels_dbm: Tuple[float, ...], reported_dbm: Optional[float]) -> Optional[int]:
         if reported_dbm is None:
             return None
-        return min(levels_dbm, key=lambda lvl: abs(levels_dbm[lvl] - reported_dbm))
+        return min(range(1, 5), key=lambda lvl: abs(levels_dbm[lvl] - reported_dbm))
 
     def _set_tx_power(self, interface: str, level: int, channel: int, verify_change: bool = False) -> dict:
         """
@@ -604,7 +762,8 @@ class NetworkManager:
             interface: WiFi interface
             level: Power level 1-4
             channel: WiFi channel
-            verify_change: If True, wait 3s and verify power actually changed
+            verify_change: If True, wait up to TX_POWER_VERIFY_TIMEOUT for the
+                reported power to reach the requested level
             
         Returns:
             Dict with tx power info
@@ -623,21 +782,28 @@ class NetworkManager:
 
         power_after = None
         if verify_change:
-            # Wait for driver to apply change
-            time.sleep(3)
-            power_after = self._read_current_txpower(interface)
+            # Poll until the driver reports the new level, up to the timeout
+            deadline = time.monotonic() + self.TX_POWER_VERIFY_TIMEOUT
+            while True:
+                time.sleep(self.TX_POWER_VERIFY_INTERVAL)
+                power_after = self._read_current_txpower(interface)
+                if power_after is not None and abs(power_after - desired_dbm) <= 0.5:
+                    break
+                if time.monotonic() >= deadline:
+                    break
 
             # Compare requested vs reported directly.
             if power_after is not None and abs(power_after - desired_dbm) > 0.5:
                 logger.warning(
-                    f"{interface}: TX power mismatch (requested={desired_dbm}, reported={power_after})"
+                    "%s: TX power mismatch (requested=%s, reported=%s)",
+                    interface, desired_dbm, power_after,
                 )
                 raise TxPowerMismatchError("Interface does not support dynamic power change.")
         
         result = {
             "interface": interface,
             "max_dbm": caps["max_dbm"],
-            "levels_dbm": levels_dbm,
+            "levels_dbm": self._levels_dict(levels_dbm),
             "tx_power": {
                 "requested_level": level,
                 "reported_level": self._reported_level_from_dbm(levels_dbm, power_after),
@@ -651,21 +817,21 @@ class NetworkManager:
         Change TX power level for active network.
         Verifies if change was applied and warns if interface doesn't support dynamic changes.
         """
-        st = self.get_status(device_id)
-        if not st or not st.active:
+        st = self._active_status(device_id)
+        if not st:
             raise ValueError("Unknown or inactive device_id")
         if level not in [1, 2, 3, 4]:
             raise ValueError("TX power level must be 1-4")
         if st.channel is None:
             raise ValueError("Channel unknown for this network")
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
         
-        # Set power with verification (waits 3s and checks if change applied)
+        # Set power with verification (polls until the change is reported)
         info = self._set_tx_power(cfg_net.interface, level, st.channel, verify_change=True)
         st.tx_power_level = level
-        self.active[device_id] = st
+        self._status_refreshed_at.pop(device_id, None)
         return info
 
     def get_tx_power_info(self, device_id: str) -> dict:
@@ -673,12 +839,12 @@ class NetworkManager:
         Get current TX power info for network.
         Compares configured level with actual interface power and warns if mismatch.
         """
-        st = self.get_status(device_id)
-        if not st or not st.active:
+        st = self._active_status(device_id)
+        if not st:
             raise ValueError("Unknown or inactive device_id")
         if st.channel is None:
             raise ValueError("Channel unknown for this network")
-        cfg_net = next((n for n in self.config.networks if n.device_id == device_id), None)
+        cfg_net = self._networks_by_id.get(device_id)
         if not cfg_net:
             raise ValueError("Unknown device_id")
         
@@ -697,12 +863,12 @@ class NetworkManager:
         
         # Keep mismatch as server-side observability; GET payload no longer exposes warning.
         if reported_dbm is not None and abs(reported_dbm - expected_dbm) > 0.5:
-            logger.info(f"{device_id}: Power mismatch - expected {expected_dbm} dBm, reported {reported_dbm} dBm")
+            logger.info("%s: Power mismatch - expected %s dBm, reported %s dBm", device_id, expected_dbm, reported_dbm)
         
         result = {
             "interface": cfg_net.interface,
             "max_dbm": caps["max_dbm"],
-            "levels_dbm": levels_dbm,
+            "levels_dbm": self._levels_dict(levels_dbm),
             "tx_power": {
                 "requested_level": level,
                 "reported_level": self._reported_level_from_dbm(levels_dbm, reported_dbm),
@@ -711,26 +877,41 @@ class NetworkManager:
         }
         return result
 
+    def _schedule_expiry(self, device_id: str, expires_at: float) -> None:
+        """Queue a network for auto-stop at expires_at and wake the expiry thread."""
+        with self._expiry_cv:
+            heapq.heappush(self._expiry_heap, (expires_at, device_id))
+            self._expiry_cv.notify()
+
     def _expiry_loop(self) -> None:
-        """Background loop to auto-expire networks without requiring API calls."""
+        """
+        Background loop to auto-expire networks without requiring API calls.
+
+        Sleeps until the earliest scheduled expiry instead of polling. Heap
+        entries of networks that were stopped or restarted in the meantime
+        are dropped when they come due.
+        """
         while True:
-            try:
+            due: List[str] = []
+            with self._expiry_cv:
                 now = time.time()
-                # Copy keys to avoid mutation during iteration
-                with self._lock:
-                    items = list(self.active.items())
-                for device_id, st in items:
-                    # Some tests may not set internal timestamp; guard accordingly
-                    ts = getattr(st, '_expires_at_timestamp', None)
-                    if ts is not None and ts < now:
-                        logger.info(f"[expiry-loop] Network {device_id} expired, stopping")
-                        try:
-                            self.stop_network(device_id)
-                        except Exception as e:
-                            logger.error(f"[expiry-loop] Failed stopping {device_id}: {e}")
-            except Exception as e:
-                logger.debug(f"[expiry-loop] Loop error: {e}")
-            # Run every 5 seconds
-            time.sleep(5)
+                while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                    ts, device_id = heapq.heappop(self._expiry_heap)
+                    st = self.active.get(device_id)
+                    if st is not None and getattr(st, '_expires_at_timestamp', None) == ts:
+                        due.append(device_id)
+                if not due:
+                    timeout = self.EXPIRY_MAX_WAIT
+                    if self._expiry_heap:
+                        timeout = min(timeout, self._expiry_heap[0][0] - now)
+                    self._expiry_cv.wait(timeout)
+                    continue
+            # stop_network takes the lock itself, so run it after releasing
+            for device_id in due:
+                logger.info("[expiry-loop] Network %s expired, stopping", device_id)
+                try:
+                    self.stop_network(device_id)
+                except Exception as e:
+                    logger.error("[expiry-loop] Failed stopping %s: %s", device_id, e)
 
 